@@ -0,0 +1,142 @@
+"""
+Benchmark: LLM classification cost with the old verbose prompt and free JSON
+output (one call per message) vs the compact prefix-cached prompt with
+schema-constrained output, num_predict cap and micro-batching.
+
+Usage:
+    python -m bench.bench_classification [--messages 64] [--concurrency 16] [--fakes]
+
+Messages are replayed from the example log (or a built-in sample). Both
+variants run the same messages at the same concurrency against Ollama
+(OLLAMA_HOST), or with --fakes against the local fake Ollama in
+bench/fakes.py. Reports LLM calls, tokens in/out per message as counted by
+Ollama (prompt_eval_count / eval_count) and per-message latency.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from src.core import config
+from bench.fakes import FakeServices, FakeSettings
+
+SAMPLE_MESSAGES = [
+    "BTC?", "eth now", "tell me about solana", "قیمت", "doge to the moon?", "what about ton",
+    "اتریوم خوبه؟", "xrp vs ada", "بیت کوین", "is it a good time for shib", "bnb", "تتر چند",
+]
+
+
+def old_classification_prompt(text: str) -> str:
+    """The pre-compaction prompt, kept verbatim for comparison."""
+    return f"""
+    Analyze the user query below. Classify its intent ('price' or 'research') AND identify its primary language ('en' for English, 'fa' for Farsi, or 'other').
+
+    'price': Use this if the user is explicitly asking for the current market value, cost, or price of a specific cryptocurrency (e.g., "how much is BTC?", "قیمت اتریوم؟").
+    'research': Use this for all other questions, including general crypto questions, news, historical data, or definitions (e.g., "what is Solana?", "NFT چیست؟").
+
+    Your response MUST be a single, valid JSON object in the format:
+    {{"intent": "...", "language": "..."}}
+
+    User Query: "{text}"
+
+    Response:
+    """
+
+
+def load_messages(count: int) -> list[str]:
+    from src.utils.example_log import read_examples
+    messages = [e["query_text"] for e in read_examples() if e.get("query_text")] or SAMPLE_MESSAGES
+    return [messages[i % len(messages)] for i in range(count)]
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+
+async def run_old(messages: list[str], concurrency: int) -> dict:
+    from src.services import llm_service
+    from src.services.llm_scheduler import llm_slot, PRIORITY_HIGH
+
+    client = llm_service.get_async_ollama_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, tokens_in, tokens_out = [], 0, 0
+
+    async def one(text: str):
+        nonlocal tokens_in, tokens_out
+        async with semaphore:
+            started = time.monotonic()
+            async with llm_slot(config.LLM_MODEL1, PRIORITY_HIGH):
+                response = await client.generate(model=config.LLM_MODEL1, prompt=old_classification_prompt(text),
+                                                 format="json", options={"temperature": 0.0})
+            latencies.append(time.monotonic() - started)
+            tokens_in += response.get("prompt_eval_count") or 0
+            tokens_out += response.get("eval_count") or 0
+
+    started = time.monotonic()
+    await asyncio.gather(*(one(text) for text in messages))
+    return {"calls": len(messages), "tokens_in": tokens_in, "tokens_out": tokens_out,
+            "latencies": latencies, "wall": time.monotonic() - started}
+
+
+async def run_new(messages: list[str], concurrency: int) -> dict:
+    from src.services import llm_service
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    before = llm_service.get_classification_stats()
+
+    async def one(text: str):
+        async with semaphore:
+            started = time.monotonic()
+            await llm_service.decide_query_type_async(text)
+            latencies.append(time.monotonic() - started)
+
+    started = time.monotonic()
+    await asyncio.gather(*(one(text) for text in messages))
+    wall = time.monotonic() - started
+    after = llm_service.get_classification_stats()
+    return {"calls": after["calls"] - before["calls"], "tokens_in": after["tokens_in"] - before["tokens_in"],
+            "tokens_out": after["tokens_out"] - before["tokens_out"], "latencies": latencies, "wall": wall}
+
+
+def report(name: str, result: dict, messages: int):
+    latencies = result["latencies"]
+    print(f"{name:8} {result['calls']:6} {result['tokens_in'] / messages:10.1f} {result['tokens_out'] / messages:10.1f} "
+          f"{percentile(latencies, 50) * 1000:9.1f} {percentile(latencies, 95) * 1000:9.1f} {result['wall']:8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--fakes", action="store_true", help="Use the local fake Ollama instead of OLLAMA_HOST")
+    args = parser.parse_args()
+
+    fakes = None
+    if args.fakes:
+        fakes = FakeServices(FakeSettings()).start()
+        config.OLLAMA_HOST = fakes.base_url  # before llm_service copies it at import
+
+    from src.services import llm_service
+    if not llm_service.check_ollama():
+        sys.exit(f"Ollama is not reachable at {config.OLLAMA_HOST}; run with --fakes.")
+
+    messages = load_messages(args.messages)
+
+    async def run_both():
+        return await run_old(messages, args.concurrency), await run_new(messages, args.concurrency)
+
+    old, new = asyncio.run(run_both())
+    if fakes:
+        fakes.stop()
+
+    print(f"{len(messages)} messages, concurrency {args.concurrency}, batch window "
+          f"{config.CLASSIFICATION_BATCH_WINDOW * 1000:g} ms (max {config.CLASSIFICATION_MAX_BATCH})\n")
+    print(f"{'variant':8} {'calls':>6} {'in/msg':>10} {'out/msg':>10} {'p50 ms':>9} {'p95 ms':>9} {'wall s':>8}")
+    report("old", old, len(messages))
+    report("new", new, len(messages))
+
+
+if __name__ == "__main__":
+    main()
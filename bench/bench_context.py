@@ -0,0 +1,108 @@
+"""
+Benchmark: synthesis prompt size (and optionally latency) with the old
+"first 2000 chars of every page" context vs the BM25 passage-packed context.
+
+Usage:
+    python -m bench.bench_context --pages saved_pages/ [--query "what is solana?"] [--synthesize]
+    python -m bench.bench_context --from-cache [--synthesize]
+
+--pages reads recorded pages (*.html) from a directory; --from-cache uses page
+texts already stored in the search cache. Without --query, the research queries
+from the example log are used. --synthesize also runs gemma2:9b on both prompts
+and reports Ollama's prompt token count and wall-clock latency.
+"""
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import time
+
+from src.core.config import LLM_MODEL2, SEARCH_CACHE_FILE
+from src.services import context_builder, llm_service
+from src.services.search_service import _extract_page_text
+from src.utils.example_log import read_examples
+from src.utils.templates import get_template
+
+
+def old_context(pages: list[tuple[str, str]]) -> str:
+    """The pre-context-builder behaviour: whitespace-collapsed page text truncated at 2000 chars."""
+    snippets = []
+    for label, text in pages:
+        text = re.sub(r'\s+', ' ', text).strip()
+        if len(text) > 2000:
+            text = text[:2000] + "..."
+        snippets.append(f"{label}: {text}")
+    return "\n\n".join(snippets)
+
+
+def load_pages(args) -> list[tuple[str, str]]:
+    if args.pages:
+        pages = []
+        for i, path in enumerate(sorted(glob.glob(os.path.join(args.pages, "*.htm*")))):
+            with open(path, "r", encoding='utf-8', errors='replace') as f:
+                pages.append((f"Source {i + 1} ({os.path.basename(path)})", _extract_page_text(f.read())))
+        return pages
+
+    with sqlite3.connect(SEARCH_CACHE_FILE) as conn:
+        rows = conn.execute("SELECT key, value FROM page_texts ORDER BY accessed DESC").fetchall()
+    return [(f"Source {i + 1} ({url})", text) for i, (url, text) in enumerate(rows)]
+
+
+def synthesize(query: str, context: str) -> tuple[int, float]:
+    """Returns (prompt tokens reported by Ollama, seconds)."""
+    prompt = llm_service._build_synthesis_prompt(query, context, get_template('en'))
+    started = time.perf_counter()
+    response = llm_service.get_ollama_client().generate(model=LLM_MODEL2, prompt=prompt)
+    return response.get("prompt_eval_count") or 0, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pages", help="Directory of recorded *.html pages")
+    source.add_argument("--from-cache", action="store_true", help="Use page texts from the search cache")
+    parser.add_argument("--query", action="append", help="Query to build context for (repeatable)")
+    parser.add_argument("--pages-per-query", type=int, default=3)
+    parser.add_argument("--synthesize", action="store_true", help="Also time gemma2:9b synthesis")
+    args = parser.parse_args()
+
+    pages = load_pages(args)
+    if not pages:
+        sys.exit("No recorded pages found.")
+    queries = args.query or [e["query_text"] for e in read_examples() if e.get("decision", "").startswith("research")]
+    if args.synthesize and not llm_service.check_ollama():
+        sys.exit("Ollama is not reachable; run without --synthesize.")
+
+    rows = []
+    for n, query in enumerate(queries):
+        # Rotate through the recorded pages so each query gets a different set
+        start = (n * args.pages_per_query) % len(pages)
+        query_pages = (pages[start:] + pages[:start])[:args.pages_per_query]
+
+        started = time.perf_counter()
+        new = context_builder.build_context(query, query_pages)
+        build_seconds = time.perf_counter() - started
+        old = old_context(query_pages)
+
+        row = {
+            "old_tokens": context_builder.estimate_tokens(old),
+            "new_tokens": context_builder.estimate_tokens(new),
+            "build_ms": build_seconds * 1000,
+        }
+        if args.synthesize:
+            row["old_prompt"], row["old_s"] = synthesize(query, old)
+            row["new_prompt"], row["new_s"] = synthesize(query, new)
+        rows.append(row)
+        print(f"{query[:50]:50}  " + "  ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}"
+                                               for k, v in row.items()))
+
+    print("\nmedians:")
+    for key in rows[0]:
+        print(f"  {key:12} {statistics.median(r[key] for r in rows):10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark: old sorted linear-scan extract_symbol vs the compiled SymbolMatcher.
+
+Usage:
+    python -m bench.bench_extract_symbol [--markets saved_markets.json] [--queries 5000]
+
+Without --markets the real key set is downloaded from the Wallex API.
+Queries are replayed (with light variations) from the example log.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from src.services import market_snapshot, pricing_service
+from src.utils.example_log import read_examples
+from src.utils.symbol_matcher import SymbolMatcher, normalize_text
+
+
+def old_extract_symbol(text: str, coin_map: dict[str, str]) -> str | None:
+    """The pre-matcher implementation, kept verbatim for comparison."""
+    text_lower = text.lower()
+    text_lower = text_lower.replace(' ', '').replace('‌', '')
+
+    sorted_coin_keys = sorted(coin_map.keys(), key=len, reverse=True)
+
+    for coin_name in sorted_coin_keys:
+        if coin_name in coin_map and coin_name in text_lower:
+            return coin_map[coin_name]
+    return None
+
+
+def load_markets(path: str | None) -> list[dict]:
+    if path:
+        with open(path, "r", encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get("result", {}).get("markets", []) if isinstance(data, dict) else data
+
+    if not market_snapshot.refresh_snapshot():
+        sys.exit("Could not download Wallex markets; pass --markets with a saved payload.")
+    return market_snapshot.get_snapshot().markets
+
+
+def load_queries(count: int) -> list[str]:
+    base_queries = [entry["query_text"] for entry in read_examples()]
+
+    rng = random.Random(42)
+    suffixes = ["", "?", " please", " right now", " امروز", " لطفا"]
+    return [rng.choice(base_queries) + rng.choice(suffixes) for _ in range(count)]
+
+
+def timed(fn, queries: list[str]) -> tuple[float, list]:
+    started = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return time.perf_counter() - started, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--markets", help="Path to a saved Wallex /markets JSON payload")
+    parser.add_argument("--queries", type=int, default=5000)
+    args = parser.parse_args()
+
+    coin_map = pricing_service._build_coin_map(load_markets(args.markets))
+    queries = load_queries(args.queries)
+
+    started = time.perf_counter()
+    matcher = SymbolMatcher(coin_map)
+    build_time = time.perf_counter() - started
+
+    def new_extract(q):
+        match = matcher.find(normalize_text(q))
+        return match[1] if match else None
+
+    old_time, old_results = timed(lambda q: old_extract_symbol(q, coin_map), queries)
+    new_time, new_results = timed(new_extract, queries)
+
+    mismatches = sum(1 for a, b in zip(old_results, new_results) if a != b)
+
+    print(f"keys: {len(coin_map)}  queries: {len(queries)}")
+    print(f"matcher build:  {build_time * 1000:8.2f} ms (once per COIN_MAP refresh)")
+    print(f"old linear scan: {old_time * 1000:8.2f} ms total, {old_time / len(queries) * 1e6:8.1f} us/query")
+    print(f"new automaton:   {new_time * 1000:8.2f} ms total, {new_time / len(queries) * 1e6:8.1f} us/query")
+    print(f"speedup: {old_time / new_time:.1f}x  mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
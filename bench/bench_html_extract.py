@@ -0,0 +1,62 @@
+"""
+Benchmark: <p>-text extraction cost per HTML extractor over a saved page corpus.
+
+Usage:
+    python -m bench.bench_html_extract --pages saved_pages/ [--repeat 5]
+
+Each *.html file in the directory is parsed --repeat times by every installed
+extractor (selectolax, lxml, bs4), both on the full body and on the first
+SEARCH_PAGE_MAX_BYTES bytes that the scraper now downloads at most.
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+from src.core.config import SEARCH_PAGE_MAX_BYTES
+from src.services.search_service import HTML_EXTRACTORS
+
+
+def time_extractor(extract, bodies: list[bytes], repeat: int) -> tuple[list[float], int]:
+    """Returns (per-page best-of-repeat milliseconds, total extracted chars)."""
+    timings = []
+    chars = 0
+    for body in bodies:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            paragraphs = extract(body)
+            best = min(best, time.perf_counter() - started)
+        timings.append(best * 1000)
+        chars += sum(len(p) for p in paragraphs)
+    return timings, chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", required=True, help="Directory of saved *.html pages")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    bodies = []
+    for path in sorted(glob.glob(os.path.join(args.pages, "*.htm*"))):
+        with open(path, "rb") as f:
+            bodies.append(f.read())
+    if not bodies:
+        sys.exit("No saved pages found.")
+
+    total_kb = sum(len(b) for b in bodies) / 1024
+    print(f"pages: {len(bodies)}  total: {total_kb:.0f} KiB  byte cap: {SEARCH_PAGE_MAX_BYTES}\n")
+    print(f"{'extractor':12} {'body':8} {'median ms':>10} {'p95 ms':>10} {'total ms':>10} {'chars':>10}")
+
+    for label, corpus in (("full", bodies), ("capped", [b[:SEARCH_PAGE_MAX_BYTES] for b in bodies])):
+        for name, extract in HTML_EXTRACTORS.items():
+            timings, chars = time_extractor(extract, corpus, args.repeat)
+            p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+            print(f"{name:12} {label:8} {statistics.median(timings):10.2f} {p95:10.2f} {sum(timings):10.1f} {chars:10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: logging overhead per request with the old synchronous handlers
+(FileHandler + StreamHandler on the root logger) vs the queue-based setup in
+src/core/logging_config.py, without and with INFO sampling.
+
+Usage:
+    python -m bench.bench_logging [--requests 4000] [--threads 8] [--lines 8] [--rate 0] [--sample-above 200]
+
+Each simulated request opens a trace and spans like generate_reply_async and
+logs --lines INFO lines (the first carries the user query) plus an occasional
+warning, from --threads threads at once, as fast as possible or at --rate
+requests per second in total. The console stream goes to os.devnull
+and the log files to a temporary directory. Reports the time the logging calls
+cost the requests, the time until everything is on disk, lines written and
+lines dropped (sampled out, or the queue was full: the queue never blocks).
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from src.core import logging_config, tracing
+
+QUERY = "how much did ETH change in the last hour and what is the price of BTC in TMN?"
+
+
+def old_setup_logging(directory: str, stream):
+    """The pre-queue setup, kept for comparison: synchronous handlers on the root logger."""
+    log_formatter = logging.Formatter(logging_config.TEXT_FORMAT)
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    file_handler = logging.FileHandler(os.path.join(directory, "bot.log"), encoding='utf-8')
+    file_handler.setFormatter(log_formatter)
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(log_formatter)
+    logger.handlers = [file_handler, stream_handler]
+
+
+def one_request(log: logging.Logger, number: int, lines: int) -> float:
+    """Logs like one request does; returns the seconds spent in logging calls."""
+    request_id = f"User:{number}_bench"
+    spent = 0.0
+    with tracing.trace_request(request_id):
+        for line in range(lines):
+            with tracing.span(("classify", "extract_symbol", "wallex", "history")[line % 4]):
+                started = time.perf_counter()
+                if line == 0:
+                    log.info(f"[{request_id}] Processing new query. Content: '{QUERY}'")
+                else:
+                    log.info(f"[{request_id}] (lang=en) - stage {line} done, {line * 3} items.")
+                if number % 50 == 0 and line == lines - 1:
+                    log.warning(f"[{request_id}] Something worth a warning.")
+                spent += time.perf_counter() - started
+    return spent
+
+
+def run(variant: str, args, directory: str) -> dict:
+    devnull = open(os.devnull, "w", encoding="utf-8")
+    logging_config.LOG_FILE = os.path.join(directory, "bot.log")
+    logging_config.SLOW_REQUEST_LOG_FILE = os.path.join(directory, "slow_requests.log")
+    logging_config.LOG_SAMPLE_ABOVE_PER_SECOND = args.sample_above if variant == "queue+sampling" else sys.maxsize
+    if variant == "sync":
+        old_setup_logging(directory, devnull)
+    else:
+        logging_config.setup_logging(stream=devnull)
+
+    log = logging.getLogger("bench")
+    stats = logging_config.get_logging_stats()
+    dropped_before = stats["sampled_out"] + stats["queue_full"]
+    per_request: list[float] = []
+    lock = threading.Lock()
+
+    def worker(first: int, count: int):
+        spent = []
+        for i, number in enumerate(range(first, first + count)):
+            if args.rate:
+                time.sleep(max(0.0, started + i * args.threads / args.rate - time.perf_counter()))
+            spent.append(one_request(log, number, args.lines))
+        with lock:
+            per_request.extend(spent)
+
+    share = args.requests // args.threads
+    threads = [threading.Thread(target=worker, args=(i * share, share)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    logged = time.perf_counter() - started
+    stats = logging_config.get_logging_stats()
+    dropped = stats["sampled_out"] + stats["queue_full"] - dropped_before
+
+    # Everything on disk
+    if variant == "sync":
+        for handler in logging.getLogger().handlers:
+            handler.close()
+    else:
+        logging_config.stop_logging()
+    drained = time.perf_counter() - started
+    logging.getLogger().handlers = []
+    devnull.close()
+
+    with open(os.path.join(directory, "bot.log"), encoding="utf-8") as f:
+        written = sum(1 for _ in f)
+    return {"per_request": per_request, "logged": logged, "drained": drained, "written": written, "dropped": dropped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--lines", type=int, default=8, help="INFO lines per request")
+    parser.add_argument("--rate", type=float, default=0, help="Requests per second in total (0: unpaced)")
+    parser.add_argument("--sample-above", type=int, default=200, help="LOG_SAMPLE_ABOVE_PER_SECOND when sampling")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests x {args.lines} lines from {args.threads} threads "
+          f"({f'{args.rate:g} req/s' if args.rate else 'unpaced'}), "
+          f"sampling rate {logging_config.LOG_INFO_SAMPLE_RATE} above {args.sample_above} lines/s\n")
+    print(f"{'variant':16} {'us/request':>11} {'p99 us':>9} {'logged s':>9} {'on disk s':>10} {'lines':>8} {'dropped':>8}")
+    for variant in ("sync", "queue", "queue+sampling"):
+        result = run(variant, args, tempfile.mkdtemp(prefix="bench-logging-"))
+        ordered = sorted(result["per_request"])
+        print(f"{variant:16} {statistics.mean(ordered) * 1e6:11.1f} {ordered[int(len(ordered) * 0.99)] * 1e6:9.1f} "
+              f"{result['logged']:9.2f} {result['drained']:10.2f} {result['written']:8} {result['dropped']:8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark: price history store (src/services/price_history.py) vs a naive
+per-market deque of (timestamp, price) tuples reduced in Python.
+
+Usage:
+    python -m bench.bench_price_history [--markets 3000] [--slots 1440] [--queries 200] [--mmap]
+
+Fills a full ring (--slots samples of --markets synthetic markets, one minute
+apart), then times one more append of every market, stats() of single markets
+over 1h and 24h windows, and the % change of every market at once. --mmap
+backs the store with memory-mapped files in a temporary directory.
+"""
+import argparse
+import math
+import random
+import statistics
+import tempfile
+import time
+from collections import deque
+
+from src.services.price_history import PriceHistory
+
+HOUR, DAY = 3600, 86400
+
+
+class NaiveHistory:
+    """The straightforward alternative: one deque of (timestamp, price) per market."""
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.series: dict[str, deque] = {}
+
+    def append(self, timestamp: float, markets: list[dict]):
+        for market in markets:
+            self.series.setdefault(market["symbol"], deque(maxlen=self.slots)).append(
+                (timestamp, float(market["price"])))
+
+    def stats(self, symbol: str, seconds: float, now: float) -> dict | None:
+        values = [price for t, price in self.series.get(symbol, ()) if t >= now - seconds]
+        if len(values) < 2:
+            return None
+        return {"change_pct": (values[-1] - values[0]) / values[0] * 100, "min": min(values), "max": max(values),
+                "sma": sum(values) / len(values)}
+
+    def changes(self, seconds: float, now: float) -> dict[str, float]:
+        result = {}
+        for symbol in self.series:
+            stats = self.stats(symbol, seconds, now)
+            if stats:
+                result[symbol] = stats["change_pct"]
+        return result
+
+
+def synthetic_markets(count: int) -> list[dict]:
+    return [{"symbol": f"C{i}USDT", "base_asset": f"C{i}", "quote_asset": "USDT", "price": random.uniform(0.01, 1e5)}
+            for i in range(count)]
+
+
+def walk(markets: list[dict]):
+    for market in markets:
+        market["price"] *= math.exp(random.gauss(0, 0.001))
+
+
+def timed(function, repeat: int) -> float:
+    """Median seconds of `repeat` calls."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--markets", type=int, default=3000)
+    parser.add_argument("--slots", type=int, default=1440)
+    parser.add_argument("--queries", type=int, default=200, help="Single-market stats() calls per window")
+    parser.add_argument("--mmap", action="store_true", help="Back the store with memory-mapped files")
+    args = parser.parse_args()
+
+    random.seed(1)
+    markets = synthetic_markets(args.markets)
+    store = PriceHistory(args.slots, args.markets, tempfile.mkdtemp(prefix="bench-history-") if args.mmap else None)
+    naive = NaiveHistory(args.slots)
+
+    now = time.time() - args.slots * 60
+    fill_started = time.perf_counter()
+    for _ in range(args.slots):
+        now += 60
+        walk(markets)
+        store.append(now, markets)
+        naive.append(now, markets)
+    print(f"{args.markets} markets x {args.slots} samples filled in {time.perf_counter() - fill_started:.1f}s "
+          f"({'memory-mapped' if args.mmap else 'in memory'})\n")
+
+    symbols = [random.choice(markets)["symbol"] for _ in range(args.queries)]
+    query_at = now + 1
+
+    def appender(history):
+        clock = [now]
+
+        def append():
+            clock[0] += 60
+            history.append(clock[0], markets)
+        return append
+
+    rows = [("append (all markets)", timed(appender(store), 20), timed(appender(naive), 20))]
+    for label, window in (("1h", HOUR), ("24h", DAY)):
+        rows.append((f"stats() one market, {label}",
+                     timed(lambda: [store.stats(s, window, query_at) for s in symbols], 5) / args.queries,
+                     timed(lambda: [naive.stats(s, window, query_at) for s in symbols], 5) / args.queries))
+    for label, window in (("1h", HOUR), ("24h", DAY)):
+        rows.append((f"changes() all markets, {label}",
+                     timed(lambda: store.changes(window, query_at), 5),
+                     timed(lambda: naive.changes(window, query_at), 3)))
+
+    print(f"{'operation':32} {'store ms':>10} {'naive ms':>10} {'speedup':>8}")
+    for label, store_seconds, naive_seconds in rows:
+        print(f"{label:32} {store_seconds * 1000:10.3f} {naive_seconds * 1000:10.3f} "
+              f"{naive_seconds / store_seconds:7.1f}x")
+
+    # Same answers from both
+    for symbol in symbols[:20]:
+        a, b = store.stats(symbol, HOUR, query_at), naive.stats(symbol, HOUR, query_at)
+        assert math.isclose(a["change_pct"], b["change_pct"], rel_tol=1e-9, abs_tol=1e-9), symbol
+    print(f"\nstore size: {args.slots * args.markets * 8 / 2 ** 20:.1f} MiB (float64)")
+
+
+if __name__ == "__main__":
+    main()
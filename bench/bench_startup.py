@@ -0,0 +1,108 @@
+"""
+Benchmark: startup cost. Measures the import time of the bot's modules (each in
+a fresh interpreter, with no bot token set and Ollama pointed at the local
+fakes, counting any upstream call made during import), then time-to-first-reply:
+the startup sequence of main.py against the fakes, with "BTC price" asked every
+--poll seconds until it is answered with a real price.
+
+Usage:
+    python -m bench.bench_startup [--repeat 5] [--wallex-latency 0.05] [--model-load 0]
+
+Readiness milestones (coin map, each model, see src/core/readiness.py) are
+reported alongside.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.fakes import FakeServices, FakeSettings
+from bench.load_test import point_config_at_fakes
+
+MODULES = ["src.core.config", "src.services.llm_service", "src.services.search_service", "src.bot.handlers", "main"]
+
+_IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def time_import(module: str, fakes: FakeServices, repeat: int) -> tuple[float, int]:
+    """Returns (median seconds, upstream calls during the imports) over `repeat` fresh interpreters."""
+    env = {k: v for k, v in os.environ.items() if k not in ("TELEGRAM_BOT_TOKEN", "SERPAPI_KEY")}
+    env["OLLAMA_HOST"] = fakes.base_url
+    calls_before = sum(fakes.counts.values())
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", _IMPORT_SNIPPET.format(module=module)],
+                                env=env, capture_output=True, text=True, cwd=os.getcwd())
+        if result.returncode != 0:
+            sys.exit(f"Importing {module} failed:\n{result.stderr}")
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples), sum(fakes.counts.values()) - calls_before
+
+
+async def first_reply(base_url: str, poll: float, timeout: float) -> dict:
+    from src.bot import logic
+    from src.core import readiness
+    from src.services import llm_service, market_snapshot, pricing_service, search_service
+    from src.utils.templates import get_template
+
+    search_service.SERPAPI_SEARCH_URL = f"{base_url}/serpapi/search"
+    warming_up = get_template('en')['price_warming_up']
+    started = time.monotonic()
+
+    # The same sequence as main.main(), minus Telegram
+    pricing_service.warm_coin_map()
+    market_snapshot.start_refresher(refresh_now=True)
+    llm_service.start_model_manager()
+
+    first_any = first_priced = None
+    while time.monotonic() - started < timeout:
+        reply = await logic.generate_reply_async("BTC price")
+        now = time.monotonic() - started
+        if first_any is None:
+            first_any = now
+        if reply != warming_up:
+            first_priced = now
+            break
+        await asyncio.sleep(poll)
+
+    market_snapshot.stop_refresher()
+    llm_service.stop_model_manager()
+    return {"first_reply": first_any, "first_priced_reply": first_priced, "readiness": readiness.get_readiness()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module import")
+    parser.add_argument("--wallex-latency", type=float, default=0.05)
+    parser.add_argument("--model-load", type=float, default=0.0, help="Cold-load time of each fake Ollama model")
+    parser.add_argument("--poll", type=float, default=0.05, help="Seconds between 'BTC price' attempts")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    fakes = FakeServices(FakeSettings(wallex=args.wallex_latency, model_load=args.model_load, jitter=0)).start()
+
+    print(f"{'module':32} {'import ms':>10} {'upstream calls':>15}")
+    for module in MODULES:
+        seconds, calls = time_import(module, fakes, args.repeat)
+        print(f"{module:32} {seconds * 1000:10.1f} {calls:15}")
+
+    point_config_at_fakes(fakes.base_url, tempfile.mkdtemp(prefix="bench-startup-"))
+    result = asyncio.run(first_reply(fakes.base_url, args.poll, args.timeout))
+    fakes.stop()
+
+    print(f"\nfirst reply:        {result['first_reply']:.3f}s")
+    priced = result["first_priced_reply"]
+    print(f"first priced reply: {f'{priced:.3f}s' if priced is not None else f'none within {args.timeout}s'}")
+    print("\nmilestones (seconds since the readiness module was imported):")
+    for name, seconds in sorted(result["readiness"]["startup"].items(), key=lambda item: item[1]):
+        print(f"  {name:32} {seconds:8.3f}")
+    print(f"ready: {result['readiness']['ready']} "
+          f"{ {name: c['ready'] for name, c in result['readiness']['components'].items()} }")
+
+
+if __name__ == "__main__":
+    main()
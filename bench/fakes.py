@@ -0,0 +1,316 @@
+"""
+Local stand-ins for the bot's external services, used by bench.load_test.
+
+One threaded HTTP server answers for Wallex (/wallex/markets), SerpApi
+(/serpapi/search), the scraped pages (/pages/...) and Ollama (/api/tags,
+/api/ps, /api/generate with optional NDJSON streaming, /api/embed), each with
+its own configurable latency. The first call to an Ollama model also pays
+model_load seconds, like a cold model. Telegram is replaced in-process by
+FakeMessage/FakeBot.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+# (symbol, English name, Farsi name, USDT price)
+COINS = [
+    ("BTC", "Bitcoin", "بیت کوین", 104250.5),
+    ("ETH", "Ethereum", "اتریوم", 3400.2),
+    ("USDT", "Tether", "تتر", 1.0),
+    ("DOGE", "Dogecoin", "دوج کوین", 0.17),
+    ("SOL", "Solana", "سولانا", 160.4),
+    ("XRP", "Ripple", "ریپل", 2.31),
+    ("ADA", "Cardano", "کاردانو", 0.57),
+    ("TRX", "Tron", "ترون", 0.29),
+    ("SHIB", "Shiba Inu", "شیبا", 0.0000102),
+    ("TON", "Toncoin", "تون کوین", 2.2),
+    ("BNB", "BNB", "بایننس کوین", 980.0),
+    ("LTC", "Litecoin", "لایت کوین", 99.1),
+]
+USDT_TMN = 108000
+
+_WORDS = ("blockchain network token consensus validator market liquidity price volatility protocol "
+          "ledger wallet exchange staking yield supply demand adoption regulation security fee").split()
+
+
+def build_markets() -> list[dict]:
+    markets = []
+    for symbol, en_name, fa_name, usdt_price in COINS:
+        for quote, price in (("TMN", usdt_price * USDT_TMN), ("USDT", usdt_price)):
+            if symbol == quote:
+                continue
+            markets.append({
+                "symbol": f"{symbol}{quote}",
+                "base_asset": symbol,
+                "quote_asset": quote,
+                "en_base_asset": en_name,
+                "fa_base_asset": fa_name,
+                "price": f"{price:.8g}",
+            })
+    return markets
+
+
+class FakeSettings:
+    """Latencies (seconds) of every fake endpoint; jitter scales each by a random factor in [1-j, 1+j]."""
+
+    def __init__(self, wallex=0.05, serpapi=0.3, page=0.2, llm=0.4, token=0.01, answer_tokens=60,
+                 embed=0.03, telegram=0.05, model_load=0.0, jitter=0.5, seed=1):
+        self.wallex = wallex
+        self.serpapi = serpapi
+        self.page = page
+        self.llm = llm
+        self.token = token
+        self.answer_tokens = answer_tokens
+        self.embed = embed
+        self.telegram = telegram
+        self.model_load = model_load
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def delay(self, seconds: float) -> float:
+        with self._random_lock:
+            return seconds * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def as_dict(self) -> dict:
+        return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+
+def _page_html(page_id: str) -> str:
+    rng = random.Random(page_id)
+    paragraphs = "".join(
+        "<p>" + " ".join(rng.choice(_WORDS) for _ in range(rng.randint(30, 90))) + ".</p>"
+        for _ in range(rng.randint(15, 40))
+    )
+    return f"<html><head><title>{page_id}</title></head><body><nav>menu</nav>{paragraphs}</body></html>"
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _embedding(text: str, dims: int = 256) -> list[float]:
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dims)]
+    norm = sum(v * v for v in vector) ** 0.5
+    return [v / norm for v in vector]
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeServices"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _sleep(self, seconds: float):
+        time.sleep(self.server.settings.delay(seconds))
+
+    def _send_json(self, payload, status: int = 200, headers: dict | None = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self, name: str):
+        with self.server.counts_lock:
+            self.server.counts[name] = self.server.counts.get(name, 0) + 1
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        settings = self.server.settings
+
+        if url.path == "/wallex/markets":
+            self._count("wallex")
+            self._sleep(settings.wallex)
+            if self.headers.get("If-None-Match") == self.server.markets_etag:
+                self.send_response(304)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._send_json({"result": {"markets": self.server.markets}}, headers={"ETag": self.server.markets_etag})
+
+        elif url.path == "/serpapi/search":
+            self._count("serpapi")
+            self._sleep(settings.serpapi)
+            query = parse_qs(url.query).get("q", [""])[0]
+            page_id = hashlib.sha1(query.encode("utf-8")).hexdigest()[:10]
+            base = f"http://127.0.0.1:{self.server.server_port}/pages"
+            self._send_json({"organic_results": [
+                {"title": f"Result {i + 1} for {query}", "link": f"{base}/{page_id}-{i}", "snippet": f"Snippet {i + 1}."}
+                for i in range(8)
+            ]})
+
+        elif url.path.startswith("/pages/"):
+            self._count("page")
+            self._sleep(settings.page)
+            body = _page_html(url.path.rsplit("/", 1)[-1]).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        elif url.path == "/api/tags":
+            self._count("ollama_list")
+            self._send_json({"models": []})
+
+        elif url.path == "/api/ps":
+            self._count("ollama_ps")
+            with self.server.counts_lock:
+                loaded = sorted(self.server.loaded_models)
+            self._send_json({"models": [{"name": name, "model": name} for name in loaded]})
+
+        else:
+            self.send_error(404)
+
+    def _load_model(self, model: str):
+        """Pays the model_load delay on the first call to a model."""
+        name = model if ":" in model else f"{model}:latest"
+        with self.server.model_lock:
+            if name not in self.server.loaded_models:
+                self._count("model_load")
+                time.sleep(self.server.settings.model_load)
+                with self.server.counts_lock:
+                    self.server.loaded_models.add(name)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        settings = self.server.settings
+        created_at = datetime.now(timezone.utc).isoformat()
+        if url.path in ("/api/embed", "/api/generate"):
+            self._load_model(request.get("model") or "")
+
+        if url.path == "/api/embed":
+            self._count("embed")
+            self._sleep(settings.embed)
+            inputs = request.get("input")
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            self._send_json({"model": request.get("model"), "embeddings": [_embedding(text) for text in inputs]})
+
+        elif url.path == "/api/generate":
+            model = request.get("model")
+            if not request.get("prompt"):
+                # An empty prompt only loads the model
+                self._send_json({"model": model, "created_at": created_at, "done": True, "response": ""})
+                return
+
+            if request.get("format"):
+                # Classification: one short JSON answer, or {"results": [...]} for a batch schema
+                self._count("generate_classify")
+                result = {"intent": "research", "language": "en"}
+                batch = (request["format"].get("properties", {}).get("results")
+                         if isinstance(request["format"], dict) else None)
+                answer = json.dumps({"results": [result] * batch["maxItems"]} if batch else result)
+                self._sleep(settings.llm / 4 + settings.token * _estimate_tokens(answer))
+                self._send_json({"model": model, "created_at": created_at, "done": True, "response": answer,
+                                 "prompt_eval_count": _estimate_tokens(request.get("prompt", "")),
+                                 "eval_count": _estimate_tokens(answer)})
+                return
+
+            self._count("generate")
+            tokens = [random.choice(_WORDS) + " " for _ in range(settings.answer_tokens)]
+            self._sleep(settings.llm)
+            if not request.get("stream", True):
+                time.sleep(settings.token * len(tokens))
+                self._send_json({"model": model, "created_at": created_at, "done": True, "response": "".join(tokens)})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, token in enumerate(tokens + [""]):
+                if token:
+                    time.sleep(settings.token)
+                line = json.dumps({"model": model, "created_at": created_at, "response": token,
+                                   "done": i == len(tokens)}).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        else:
+            self.send_error(404)
+
+
+class FakeServices(ThreadingHTTPServer):
+    """Runs every fake HTTP endpoint on one local port, in a daemon thread."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, settings: FakeSettings, port: int = 0):
+        super().__init__(("127.0.0.1", port), _FakeHandler)
+        self.settings = settings
+        self.markets = build_markets()
+        self.markets_etag = '"bench-markets-1"'
+        self.counts: dict[str, int] = {}
+        self.counts_lock = threading.Lock()
+        self.loaded_models: set[str] = set()
+        self.model_lock = threading.Lock()  # Ollama loads one model at a time
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self) -> "FakeServices":
+        threading.Thread(target=self.serve_forever, name="bench-fakes", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+# --- Telegram stand-ins (in-process; handle_message only needs these attributes) ---
+
+class FakeMessage:
+    """A sent or received Telegram message; replies and edits cost settings.telegram seconds each."""
+
+    def __init__(self, settings: FakeSettings, text: str = "", counts: dict | None = None):
+        self.text = text
+        self._settings = settings
+        self._counts = counts if counts is not None else {}
+
+    async def reply_text(self, text: str, **kwargs) -> "FakeMessage":
+        self._counts["telegram_send"] = self._counts.get("telegram_send", 0) + 1
+        await asyncio.sleep(self._settings.delay(self._settings.telegram))
+        return FakeMessage(self._settings, text, self._counts)
+
+    async def edit_text(self, text: str, **kwargs) -> "FakeMessage":
+        self._counts["telegram_edit"] = self._counts.get("telegram_edit", 0) + 1
+        await asyncio.sleep(self._settings.delay(self._settings.telegram))
+        self.text = text
+        return self
+
+
+class FakeBot:
+    def __init__(self, settings: FakeSettings):
+        self._settings = settings
+
+    async def send_chat_action(self, chat_id, action, **kwargs):
+        await asyncio.sleep(self._settings.delay(self._settings.telegram))
+
+
+def fake_update(settings: FakeSettings, text: str, user_id: int, counts: dict) -> SimpleNamespace:
+    message = FakeMessage(settings, text, counts)
+    return SimpleNamespace(
+        message=message,
+        effective_user=SimpleNamespace(id=user_id, first_name="Bench"),
+        effective_chat=SimpleNamespace(id=user_id),
+    )
+
+
+def fake_context(settings: FakeSettings) -> SimpleNamespace:
+    return SimpleNamespace(bot=FakeBot(settings))
@@ -0,0 +1,266 @@
+"""
+Load test: replays example queries through the full reply pipeline against
+local fake Wallex, SerpApi, web pages, Ollama and Telegram (bench/fakes.py).
+
+Usage:
+    python -m bench.load_test [--target reply|handler|sync] [--requests 200] [--concurrency 20]
+                              [--queries examples.json] [--unique]
+                              [--llm-latency 0.4] [--token-delay 0.01] [--page-latency 0.2] ...
+                              [--model-load 5 --model-manager]
+                              [--baseline bench/load_test_baseline.json] [--save-baseline PATH]
+
+Targets:
+    reply    logic.generate_reply_async on one event loop (default)
+    handler  handlers.handle_message with a fake Telegram Update/bot
+    sync     logic.generate_reply (the asyncio.run shim) from --concurrency threads
+
+Reports throughput and p50/p95/p99 of the whole request and of every traced
+stage (see src/core/tracing.py), then compares p95s and throughput with the
+baseline. The exit status is 1 if anything regressed by more than --tolerance.
+Caches and the example log go to a temporary directory, so every run starts cold.
+--unique makes every replayed query distinct, which defeats caching and
+request coalescing. --model-load makes the first call to each fake model slow,
+like a cold Ollama; --model-manager starts the warm-up manager alongside, so
+cold-start routing can be measured.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from src.core import config
+from bench.fakes import FakeServices, FakeSettings, fake_context, fake_update
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "load_test_baseline.json")
+
+
+def load_queries(path: str) -> list[str]:
+    """Reads query_text from an example log (JSON array or JSON Lines)."""
+    with open(path, "r", encoding='utf-8') as f:
+        content = f.read()
+    if content.lstrip().startswith("["):
+        entries = json.loads(content)
+    else:
+        entries = [json.loads(line) for line in content.splitlines() if line.strip()]
+    return [e["query_text"] for e in entries if e.get("query_text")]
+
+
+def point_config_at_fakes(base_url: str, workdir: str):
+    """Must run before any src.services module is imported: they copy these constants at import."""
+    config.WALLEX_API_URL = f"{base_url}/wallex/markets"
+    config.OLLAMA_HOST = base_url
+    config.SERPAPI_KEY = "bench"
+    config.SEARCH_CACHE_FILE = os.path.join(workdir, "search_cache.sqlite3")
+    config.EXAMPLE_LOG_FILE = os.path.join(workdir, "examples.jsonl")
+    config.LEGACY_EXAMPLE_LOG_FILE = os.path.join(workdir, "examples.json")
+    config.TRACE_SLOW_REQUEST_SECONDS = float("inf")
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(traces: list, wall_seconds: float) -> dict:
+    samples: dict[str, list[float]] = {"request": []}
+    for trace, seconds in traces:
+        samples["request"].append(seconds)
+        for span in trace.spans:
+            samples.setdefault(span["name"], []).append(span["seconds"])
+
+    return {
+        "requests": len(traces),
+        "throughput": len(traces) / wall_seconds if wall_seconds else 0.0,
+        "stages": {
+            name: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+            for name, values in samples.items()
+        },
+    }
+
+
+def print_summary(summary: dict):
+    print(f"\nrequests: {summary['requests']}  throughput: {summary['throughput']:.2f} req/s\n")
+    print(f"{'stage':16} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for name, stats in summary["stages"].items():
+        print(f"{name:16} {stats['count']:7} {stats['p50'] * 1000:10.1f} {stats['p95'] * 1000:10.1f} "
+              f"{stats['p99'] * 1000:10.1f}")
+
+
+def compare(summary: dict, baseline: dict, tolerance: float, floor_ms: float) -> list[str]:
+    """Returns one line per regression: a p95 (or throughput) worse than the baseline by more than tolerance."""
+    regressions = []
+    if summary["throughput"] < baseline["throughput"] * (1 - tolerance):
+        regressions.append(f"throughput {summary['throughput']:.2f} < baseline {baseline['throughput']:.2f} req/s")
+
+    for name, stats in summary["stages"].items():
+        base = baseline["stages"].get(name)
+        if base is None:
+            continue
+        limit = max(base["p95"] * (1 + tolerance), base["p95"] + floor_ms / 1000)
+        if stats["p95"] > limit:
+            regressions.append(f"{name} p95 {stats['p95'] * 1000:.1f}ms > baseline {base['p95'] * 1000:.1f}ms")
+    return regressions
+
+
+async def run_async_target(target: str, queries: list[str], args, settings: FakeSettings, counts: dict) -> list:
+    from src.bot import handlers, logic
+    from src.core import tracing
+    from src.core.http_client import close_async_http_client
+
+    results = []
+    next_index = 0
+
+    async def one(i: int):
+        query = queries[i % len(queries)]
+        if args.unique:
+            query = f"{query} ({i})"
+        # handle_message and generate_reply_async join this trace, so its spans are theirs
+        with tracing.trace_request(tracing.new_request_id(f"Bench:{i}")) as trace:
+            if target == "handler":
+                await handlers.handle_message(fake_update(settings, query, 1000 + i, counts), fake_context(settings))
+            else:
+                await logic.generate_reply_async(query, trace.request_id)
+        results.append((trace, time.monotonic() - trace.started))
+
+    async def worker():
+        nonlocal next_index
+        while next_index < args.requests:
+            i = next_index
+            next_index += 1
+            await one(i)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    finally:
+        await close_async_http_client()
+    return results
+
+
+def run_sync_target(queries: list[str], args) -> list:
+    from src.bot import logic
+    from src.core import tracing
+
+    def one(i: int):
+        query = queries[i % len(queries)]
+        if args.unique:
+            query = f"{query} ({i})"
+        # asyncio.run() copies this thread's context, so generate_reply_async joins the trace
+        with tracing.trace_request(tracing.new_request_id(f"Bench:{i}")) as trace:
+            logic.generate_reply(query, trace.request_id)
+        return trace, time.monotonic() - trace.started
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        return list(executor.map(one, range(args.requests)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("reply", "handler", "sync"), default="reply")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--queries", default="examples.json", help="Example log to replay queries from")
+    parser.add_argument("--unique", action="store_true", help="Make every query distinct (no cache hits/coalescing)")
+    parser.add_argument("--wallex-latency", type=float, default=0.05)
+    parser.add_argument("--serpapi-latency", type=float, default=0.3)
+    parser.add_argument("--page-latency", type=float, default=0.2)
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Time to first token of a synthesis")
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--embed-latency", type=float, default=0.03)
+    parser.add_argument("--telegram-latency", type=float, default=0.05)
+    parser.add_argument("--model-load", type=float, default=0.0, help="Cold-load time of each fake Ollama model")
+    parser.add_argument("--model-manager", action="store_true",
+                        help="Start the model warm-up manager with the run (pair with --model-load)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Relative latency jitter of every fake")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline to compare with (if it exists)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write this run's results as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed relative p95/throughput regression")
+    parser.add_argument("--floor-ms", type=float, default=5.0, help="Ignore p95 regressions smaller than this")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's INFO logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    queries = load_queries(args.queries)
+    if not queries:
+        sys.exit(f"No queries found in {args.queries}.")
+
+    settings = FakeSettings(wallex=args.wallex_latency, serpapi=args.serpapi_latency, page=args.page_latency,
+                            llm=args.llm_latency, token=args.token_delay, answer_tokens=args.answer_tokens,
+                            embed=args.embed_latency, telegram=args.telegram_latency, model_load=args.model_load,
+                            jitter=args.jitter, seed=args.seed)
+    fakes = FakeServices(settings).start()
+    workdir = tempfile.mkdtemp(prefix="bench-load-")
+    point_config_at_fakes(fakes.base_url, workdir)
+
+    from src.services import pricing_service, search_service
+    from src.utils import example_log, singleflight
+    search_service.SERPAPI_SEARCH_URL = f"{fakes.base_url}/serpapi/search"
+    if not pricing_service.initialize_coin_map():
+        sys.exit("Could not load markets from the fake Wallex server.")
+    if args.model_manager:
+        from src.services import llm_service
+        llm_service.start_model_manager()
+
+    run_settings = {"target": args.target, "requests": args.requests, "concurrency": args.concurrency,
+                    "unique": args.unique, "model_manager": args.model_manager, "queries": len(queries),
+                    **settings.as_dict()}
+    print(f"fakes on {fakes.base_url}, workdir {workdir}")
+    print("settings: " + ", ".join(f"{k}={v}" for k, v in run_settings.items()))
+
+    telegram_counts: dict[str, int] = {}
+    started = time.monotonic()
+    if args.target == "sync":
+        traces = run_sync_target(queries, args)
+    else:
+        traces = asyncio.run(run_async_target(args.target, queries, args, settings, telegram_counts))
+    wall_seconds = time.monotonic() - started
+
+    example_log.stop_writer()
+    fakes.stop()
+
+    summary = summarize(traces, wall_seconds)
+    print_summary(summary)
+    print(f"\nupstream calls: {dict(sorted({**fakes.counts, **telegram_counts}.items()))}")
+    print(f"coalesced: { {k: v['followers'] for k, v in singleflight.get_singleflight_stats().items() if v['followers']} }")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding='utf-8') as f:
+            json.dump({"settings": run_settings, **summary}, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}.")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+
+    with open(args.baseline, "r", encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != run_settings:
+        print("\nWarning: baseline was recorded with different settings; comparison may be meaningless.")
+
+    regressions = compare(summary, baseline, args.tolerance, args.floor_ms)
+    if regressions:
+        print("\nRegressions against baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions against baseline (tolerance {args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,54 @@
+from src.core import readiness  # Imported first: startup milestones are measured from here
 import logging
+import sys
+from src.core.config import TELEGRAM_BOT_TOKEN, SERPAPI_KEY
 from src.core.logging_config import setup_logging
+from src.core.metrics import start_metrics_server
 from src.bot.handlers import run_bot
-from src.services.pricing_service import initialize_coin_map
+from src.services.pricing_service import warm_coin_map
+from src.services.market_snapshot import start_refresher
+from src.services.llm_service import start_model_manager
+from src.services.alert_service import start_alert_engine
+from src.services.price_history import start_price_history
 
-# Set up logging as the first thing
-setup_logging()
 logger = logging.getLogger(__name__)
 
 
 def main():
     """Main entry point for the application."""
+    # Set up logging as the first thing
+    setup_logging()
     logger.info("Application starting...")
+    readiness.milestone("imported")
 
-    # Initialize the coin map on startup
-    if not initialize_coin_map():
-        logger.warning("Could not initialize coin price list. Price queries may fail.")
-    else:
-        # Accessing the map from its module to log length
-        from src.services.pricing_service import COIN_MAP
-        logger.info(f"Initialized {len(COIN_MAP)} coin lookup keys.")
+    if not TELEGRAM_BOT_TOKEN:
+        logger.critical("TELEGRAM_BOT_TOKEN not found in environment variables. Bot cannot start.")
+        sys.exit(1)
+    if not SERPAPI_KEY:
+        logger.warning("SERPAPI_KEY not found. Web search will fail.")
+
+    # Start serving right away: the first market snapshot is downloaded in the
+    # background and the coin map is built from it as soon as it arrives
+    warm_coin_map()
+
+    # Evaluate stored price alerts and record price history on every snapshot refresh
+    start_alert_engine()
+    start_price_history()
+
+    # Keep the Wallex market snapshot fresh in the background
+    start_refresher(refresh_now=True)
+
+    # Connect to Ollama, preload the models and keep them resident, all in the
+    # background; until a model is warm, classification uses the rules and
+    # synthesis the smaller model
+    start_model_manager()
+
+    # Local Prometheus-style metrics and the /ready endpoint
+    start_metrics_server()
 
     # Run the bot
     run_bot()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,15 +1,42 @@
-import logging
 import asyncio
-from datetime import datetime
-from telegram import Update
+import logging
+import time
+from datetime import timedelta
+from telegram import Message, Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-from telegram.constants import ChatAction
+from telegram.constants import ChatAction, MessageLimit
+from telegram.error import RetryAfter, TelegramError
 
-from src.core.config import TELEGRAM_BOT_TOKEN
-from src.bot.logic import generate_reply
+from src.core.config import (
+    TELEGRAM_BOT_TOKEN, TELEGRAM_CONCURRENT_UPDATES, TELEGRAM_STREAM_EDIT_INTERVAL, TELEGRAM_DRAIN_TIMEOUT,
+    TELEGRAM_MODE, TELEGRAM_WEBHOOK_URL, TELEGRAM_WEBHOOK_LISTEN, TELEGRAM_WEBHOOK_PORT, TELEGRAM_WEBHOOK_PATH,
+    TELEGRAM_WEBHOOK_SECRET, TELEGRAM_WEBHOOK_MAX_CONNECTIONS,
+    ALERT_DEFAULT_QUOTE, ALERT_MAX_PER_CHAT, ALERT_DISPATCH_INTERVAL, ALERT_NOTIFY_PER_SECOND
+)
+from src.core import metrics, readiness, tracing
+from src.core.http_client import close_async_http_client
+from src.bot.logic import generate_reply_async
+from src.services import alert_service, market_snapshot, pricing_service
+from src.services.classifier_service import detect_language
+from src.utils.amounts import format_amount
+from src.utils.helpers import extract_symbol
+from src.utils.rate_limiter import RateLimiter
+from src.utils.templates import get_template
 
 logger = logging.getLogger(__name__)
 
+# Per-user token buckets (USER_RATE_LIMIT_BURST / USER_RATE_LIMIT_PER_MINUTE)
+_user_rate_limiter = RateLimiter()
+
+# handle_message tasks still working on a reply, drained on shutdown
+_in_flight_replies: set[asyncio.Task] = set()
+
+metrics.describe("chatbot_rate_limited_total", "counter", "Messages refused by the per-user rate limit.")
+
+# True between the application's start (bot authenticated) and the beginning of its shutdown
+_telegram_running = False
+readiness.register("telegram", lambda: _telegram_running)
+
 
 # --- Command Handlers ---
 
@@ -18,13 +45,144 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     await update.message.reply_html(
         f"Hi {user.first_name}! I'm your Crypto Chatbot.\n\n"
-        f"Ask me for a coin price (e.g., 'price of BTC') or a research question (e.g., 'what is solana?').\n\n"
+        f"Ask me for a coin price (e.g., 'price of BTC') or a research question (e.g., 'what is solana?').\n"
+        f"To be told when a price moves, set an alert: /alert BTC > 110000 USDT\n\n"
         f"می‌توانید فارسی هم بپرسید (مثلا: «قیمت بیت کوین» یا «سولانا چیست؟»)",
     )
 
 
+def _command_language(update: Update) -> str:
+    """Farsi if the command text contains Farsi or the user's Telegram client is set to Farsi."""
+    lang, _ = detect_language(update.message.text or "")
+    if lang == "fa":
+        return "fa"
+    language_code = (update.effective_user.language_code or "") if update.effective_user else ""
+    return "fa" if language_code.startswith("fa") else "en"
+
+
+def _alert_fields(alert: dict, t: dict) -> dict:
+    return {
+        "id": alert.get("id"),
+        "base": alert["base"],
+        "quote": alert["quote"],
+        "op": t[f"alert_op_{alert['direction']}"],
+        "threshold": format_amount(alert["threshold"]),
+        "price": format_amount(alert.get("price")),
+    }
+
+
+async def alert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Subscribes the chat to a one-shot price alert: /alert BTC > 110000 USDT"""
+    lang = _command_language(update)
+    t = get_template(lang)
+
+    try:
+        coin, direction, threshold, quote = alert_service.parse_alert(" ".join(context.args or []))
+    except ValueError:
+        await update.message.reply_text(t['alert_usage'].format(quote=ALERT_DEFAULT_QUOTE))
+        return
+
+    if not pricing_service.is_coin_map_ready():
+        await update.message.reply_text(t['price_warming_up'])
+        return
+    base = extract_symbol(coin)
+    if not base:
+        await update.message.reply_text(t['alert_unknown_coin'].format(coin=coin))
+        return
+
+    snapshot = await market_snapshot.get_snapshot_async()
+    # The alert store writes to SQLite under a lock the snapshot refresher also takes: keep it off the event loop
+    status, alert = await asyncio.to_thread(alert_service.add_alert, snapshot, update.effective_chat.id, base,
+                                            direction, threshold, quote, lang)
+    await update.message.reply_text(t[f'alert_{status}'].format(**_alert_fields(alert, t), max=ALERT_MAX_PER_CHAT))
+
+
+async def alerts_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Lists the chat's active price alerts."""
+    t = get_template(_command_language(update))
+    alerts = await asyncio.to_thread(alert_service.list_alerts, update.effective_chat.id)
+    if not alerts:
+        await update.message.reply_text(t['alert_list_empty'])
+        return
+    lines = [t['alert_list_header']] + [t['alert_list_line'].format(**_alert_fields(a, t)) for a in alerts]
+    await update.message.reply_text("\n".join(lines))
+
+
+async def unalert_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Deletes one price alert (/unalert 12) or all of them (/unalert all)."""
+    t = get_template(_command_language(update))
+    arg = (context.args or [""])[0].lstrip("#")
+    if arg.lower() == "all":
+        count = await asyncio.to_thread(alert_service.remove_alerts, update.effective_chat.id)
+    elif arg.isdigit():
+        count = await asyncio.to_thread(alert_service.remove_alerts, update.effective_chat.id, int(arg))
+        if not count:
+            await update.message.reply_text(t['alert_not_found'].format(id=arg))
+            return
+    else:
+        await update.message.reply_text(t['alert_usage'].format(quote=ALERT_DEFAULT_QUOTE))
+        return
+    await update.message.reply_text(t['alert_deleted'].format(count=count))
+
+
 # --- Message Handlers ---
 
+def _retry_after_seconds(e: RetryAfter) -> float:
+    """The wait Telegram asked for; python-telegram-bot gives it as a timedelta or as seconds depending on version."""
+    retry_after = e.retry_after
+    return retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+
+
+class _ProgressiveReply:
+    """
+    Sends a reply as soon as the first part of an answer exists, then edits it
+    as more arrives, at most once every TELEGRAM_STREAM_EDIT_INTERVAL seconds.
+    """
+
+    def __init__(self, message: Message, request_id: str):
+        self._message = message
+        self._request_id = request_id
+        self._sent: Message | None = None
+        self._last_text = ""
+        self._last_edit = 0.0
+
+    async def update(self, text: str) -> None:
+        if not text.strip():
+            return
+        if time.monotonic() - self._last_edit < TELEGRAM_STREAM_EDIT_INTERVAL:
+            return
+        await self._show(text[:MessageLimit.MAX_TEXT_LENGTH - 2] + " …")
+
+    async def finish(self, text: str) -> None:
+        if self._sent is None:
+            await self._message.reply_text(text)
+        else:
+            await self._show(text, final=True)
+
+    async def _show(self, text: str, final: bool = False) -> None:
+        if text == self._last_text:
+            return
+        try:
+            if self._sent is None:
+                self._sent = await self._message.reply_text(text)
+            else:
+                await self._sent.edit_text(text)
+        except RetryAfter as e:
+            seconds = _retry_after_seconds(e)
+            if not final:
+                logger.warning(f"[{self._request_id}] Telegram rate limit hit, pausing edits for {seconds}s.")
+                self._last_edit = time.monotonic() + seconds
+                return
+            # The final text must land, so wait it out once
+            await asyncio.sleep(seconds)
+            await self._sent.edit_text(text)
+        except TelegramError as e:
+            # A failed intermediate edit must not abort the answer being generated
+            logger.warning(f"[{self._request_id}] Could not update streamed reply: {e}")
+        self._last_text = text
+        self._last_edit = time.monotonic()
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handles all non-command text messages."""
     if not update.message or not update.message.text:
@@ -32,29 +190,128 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     user_query = update.message.text
     user_id = update.effective_user.id
-    request_id = f"User:{user_id}_{datetime.now().strftime('%H%M%S')}"
+    request_id = tracing.new_request_id(f"User:{user_id}")
 
-    logger.info(f"[{request_id}] Processing new query. Content: '{user_query}'")
+    if not _user_rate_limiter.allow(user_id):
+        logger.warning(f"[{request_id}] User {user_id} is over the rate limit. Message not processed.")
+        metrics.increment("chatbot_rate_limited_total")
+        lang, _ = detect_language(user_query)
+        await update.message.reply_text(get_template(lang)['rate_limited'])
+        return
 
-    # Show "Typing..." action to the user
-    await context.bot.send_chat_action(
-        chat_id=update.effective_chat.id,
-        action=ChatAction.TYPING
-    )
+    logger.info(f"[{request_id}] Processing new query. Content: '{user_query}'")
 
-    # Run the blocking function in a separate thread
-    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    _in_flight_replies.add(task)
     try:
-        reply_text = await loop.run_in_executor(None, generate_reply, user_query, request_id)
-    except Exception as e:
-        logger.error(f"[{request_id}] Unhandled exception in generate_reply: {e}", exc_info=True)
-        reply_text = "Sorry, an unexpected error occurred. I've notified the developers."
+        await _reply(update, context, user_query, request_id)
+    finally:
+        _in_flight_replies.discard(task)
+
 
-    await update.message.reply_text(reply_text)
+async def _reply(update: Update, context: ContextTypes.DEFAULT_TYPE, user_query: str, request_id: str) -> None:
+    # The trace covers the Telegram round trips too, not just generate_reply_async
+    with tracing.trace_request(request_id):
+        # Show "Typing..." action to the user
+        with tracing.span("chat_action"):
+            await context.bot.send_chat_action(
+                chat_id=update.effective_chat.id,
+                action=ChatAction.TYPING
+            )
+
+        # The pipeline is async end-to-end, so no executor thread is tied up per message.
+        # Research answers are streamed into a message that is edited as tokens arrive.
+        progressive_reply = _ProgressiveReply(update.message, request_id)
+        try:
+            reply_text = await generate_reply_async(user_query, request_id, on_partial=progressive_reply.update)
+        except Exception as e:
+            logger.error(f"[{request_id}] Unhandled exception in generate_reply_async: {e}", exc_info=True)
+            reply_text = "Sorry, an unexpected error occurred. I've notified the developers."
+
+        with tracing.span("reply"):
+            await progressive_reply.finish(reply_text)
+        readiness.milestone("first_reply")
 
 
 # --- Bot Setup ---
 
+async def _drain_in_flight_replies(timeout: float) -> None:
+    """Waits up to timeout seconds for replies being generated, then cancels the rest."""
+    pending = {task for task in _in_flight_replies if not task.done()}
+    if not pending:
+        return
+
+    logger.info(f"Waiting up to {timeout}s for {len(pending)} in-flight replies to finish...")
+    _, pending = await asyncio.wait(pending, timeout=timeout)
+    if pending:
+        logger.warning(f"Cancelling {len(pending)} replies still running after {timeout}s.")
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+class _DrainingApplication(Application):
+    """
+    Application whose stop() bounds the wait for in-flight replies.
+    By the time stop() runs, run_polling/run_webhook have already stopped
+    receiving updates, so only replies already being generated are waited for.
+    """
+
+    async def stop(self) -> None:
+        global _telegram_running
+
+        _telegram_running = False  # Stop reporting ready as soon as shutdown begins
+        await _drain_in_flight_replies(TELEGRAM_DRAIN_TIMEOUT)
+        await super().stop()
+
+
+# Event-loop time before which no alert notifications are sent (after a Telegram RetryAfter)
+_alert_dispatch_paused_until = 0.0
+
+
+async def _dispatch_alert_notifications(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Job queue callback: sends triggered price alerts, one message per chat, to at
+    most ALERT_NOTIFY_PER_SECOND chats per second. On RetryAfter the unsent
+    notifications go back to the front of the queue and sending pauses.
+    """
+    global _alert_dispatch_paused_until
+
+    loop = asyncio.get_running_loop()
+    if loop.time() < _alert_dispatch_paused_until:
+        return
+
+    batch = alert_service.take_notifications(max(1, int(ALERT_NOTIFY_PER_SECOND * ALERT_DISPATCH_INTERVAL)))
+    for i, (chat_id, alerts) in enumerate(batch):
+        t = get_template(alerts[0]["lang"])
+        lines = [t['alert_triggered_header']] + [t['alert_triggered_line'].format(**_alert_fields(a, t)) for a in alerts]
+        try:
+            await context.bot.send_message(chat_id=chat_id, text="\n".join(lines))
+        except RetryAfter as e:
+            seconds = _retry_after_seconds(e)
+            logger.warning(f"Telegram rate limit hit, pausing alert notifications for {seconds}s "
+                           f"({len(batch) - i} chats requeued).")
+            alert_service.requeue_notifications(batch[i:])
+            _alert_dispatch_paused_until = loop.time() + seconds
+            return
+        except TelegramError as e:
+            # e.g. the user blocked the bot; the alert is spent either way
+            logger.error(f"Could not deliver price alert to chat {chat_id}: {e}")
+
+
+async def _post_init(application: Application) -> None:
+    """Runs once the bot has authenticated with Telegram, just before updates start arriving."""
+    global _telegram_running
+
+    _telegram_running = True
+    readiness.milestone("telegram_ready")
+
+
+async def _post_shutdown(application: Application) -> None:
+    """Closes the pooled async HTTP connections once the bot has stopped."""
+    await close_async_http_client()
+
+
 def run_bot() -> None:
     """Initializes and runs the Telegram bot."""
     if not TELEGRAM_BOT_TOKEN:
@@ -62,12 +319,49 @@ def run_bot() -> None:
         return
 
     logger.info("Building Telegram application...")
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .application_class(_DrainingApplication)
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(TELEGRAM_CONCURRENT_UPDATES)
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
 
     # Add handlers
     application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("alert", alert_command))
+    application.add_handler(CommandHandler("alerts", alerts_command))
+    application.add_handler(CommandHandler("unalert", unalert_command))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
+    # Triggered price alerts are sent from the job queue, in rate-limited batches
+    if application.job_queue is None:
+        logger.error("The job queue is unavailable (install python-telegram-bot[job-queue]). "
+                     "Price alerts will not be delivered.")
+    else:
+        application.job_queue.run_repeating(_dispatch_alert_notifications, interval=ALERT_DISPATCH_INTERVAL,
+                                            first=ALERT_DISPATCH_INTERVAL, name="alert-notifications")
+
+    if TELEGRAM_MODE == "webhook":
+        if not TELEGRAM_WEBHOOK_URL:
+            logger.critical("TELEGRAM_MODE is 'webhook' but TELEGRAM_WEBHOOK_URL is not set. Bot cannot start.")
+            return
+
+        webhook_url = f"{TELEGRAM_WEBHOOK_URL.rstrip('/')}/{TELEGRAM_WEBHOOK_PATH}"
+        logger.info(f"Starting Telegram webhook on {TELEGRAM_WEBHOOK_LISTEN}:{TELEGRAM_WEBHOOK_PORT} "
+                    f"for {webhook_url} ({TELEGRAM_CONCURRENT_UPDATES} concurrent updates)...")
+        application.run_webhook(
+            listen=TELEGRAM_WEBHOOK_LISTEN,
+            port=TELEGRAM_WEBHOOK_PORT,
+            url_path=TELEGRAM_WEBHOOK_PATH,
+            webhook_url=webhook_url,
+            secret_token=TELEGRAM_WEBHOOK_SECRET,
+            max_connections=TELEGRAM_WEBHOOK_MAX_CONNECTIONS,
+        )
+        return
+
     # Start polling
-    logger.info("Starting Telegram bot polling...")
+    logger.info(f"Starting Telegram bot polling ({TELEGRAM_CONCURRENT_UPDATES} concurrent updates)...")
     application.run_polling()
\ No newline at end of file
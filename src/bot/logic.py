@@ -1,57 +1,137 @@
+import asyncio
 import logging
+from src.core import tracing
+from src.core.config import LLM_SYNTH_FALLBACK_MODEL
+from src.core.http_client import close_async_http_client
 from src.utils.templates import get_template
-from src.utils.helpers import extract_symbol, log_example_run
-from src.services import llm_service, pricing_service, search_service
+from src.utils.helpers import extract_price_request, log_example_run
+from src.services import answer_cache, classifier_service, llm_service, price_history, pricing_service, search_service
+from src.services.llm_scheduler import LLMBusyError
 
 logger = logging.getLogger(__name__)
 
 
-def generate_reply(user_query: str, request_id: str = "Standalone") -> str:
+def _format_answer(answer: str, sources: list, t: dict) -> str:
+    source_links = [f"• {s['title']} ({s['link']})" for s in sources]
+    return f"{answer}{t['synth_sources_header']}" + "\n".join(source_links)
+
+
+async def generate_reply_async(user_query: str, request_id: str | None = None, on_partial=None) -> str:
     """
-    Orchestrates the full reply generation process.
+    Orchestrates the full reply generation process without blocking the event loop.
     1. Classifies query
-    2. Routes to pricing or research
+    2. Routes to pricing, local price history or research
     3. Returns final reply string
+    If on_partial is given, research answers are streamed to it while being synthesized.
+    Every stage is timed as a span of the request's trace (see core/tracing.py).
     """
+    request_id = request_id or tracing.new_request_id()
+    with tracing.trace_request(request_id):
+        return await _generate_reply_traced(user_query, request_id, on_partial)
+
 
-    # 1. Classify query
-    query_type, lang = llm_service.decide_query_type(user_query)
+async def _generate_reply_traced(user_query: str, request_id: str, on_partial) -> str:
+    # 1. Classify query (rules first, LLM only when unsure)
+    with tracing.span("classify"):
+        query_type, lang, tier = await classifier_service.classify_query_async(user_query)
+    tracing.set_label("tier", tier)
 
     log_prefix = f"[{request_id}] (lang={lang})"
-    logger.info(f"{log_prefix} - Decision: {query_type}")
+    logger.info(f"{log_prefix} - Decision: {query_type} (tier={tier})")
 
     t = get_template(lang)
     reply_text = ""
 
-    # 2. Route to "price" logic
+    # 2. Route to "history" logic: change/trend questions answered from the locally recorded prices
+    if query_type == "history":
+        with tracing.span("extract_symbol"):
+            holdings, quote = extract_price_request(user_query)
+        window = price_history.parse_window(user_query)
+        history_reply = None
+        if holdings and window:
+            with tracing.span("history"):
+                history_reply = price_history.get_history_reply([s for s, _ in holdings], window, quote, lang)
+        if history_reply:
+            logger.info(f"{log_prefix} - Answered from price history ({window:g}s window).")
+            reply_text = history_reply
+        else:
+            logger.info(f"{log_prefix} - Not enough price history for this window. Switching to price.")
+            query_type = "price"  # Fallback to the current price
+
+    # 3. Route to "price" logic
     if query_type == "price":
-        symbol = extract_symbol(user_query)
-        if symbol:
-            logger.info(f"{log_prefix} - Extracted symbol: {symbol}. Fetching price.")
-            reply_text = pricing_service.get_wallex_price(symbol, lang)
+        # Every coin in the query ("BTC, ETH and SOL", "0.5 BTC + 2 ETH in TMN") is answered from one snapshot
+        with tracing.span("extract_symbol"):
+            holdings, quote = extract_price_request(user_query)
+        if holdings:
+            logger.info(f"{log_prefix} - Extracted symbols: {', '.join(s for s, _ in holdings)}. Fetching prices.")
+            with tracing.span("wallex"):
+                reply_text = await pricing_service.get_wallex_prices_async(holdings, quote, lang)
+        elif not pricing_service.is_coin_map_ready():
+            # Started moments ago: the coin names are still being downloaded
+            logger.info(f"{log_prefix} - Price query before the coin map is ready.")
+            reply_text = t['price_warming_up']
         else:
             logger.info(f"{log_prefix} - Price query, but no symbol found. Switching to research.")
             query_type = "research"  # Fallback to research
 
-    # 3. Route to "research" logic (or fallback)
-    if query_type == "research":
-        logger.info(f"{log_prefix} - Performing web search.")
-        context_text, sources = search_service.search_web(user_query, lang)
+    # 4. Route to "research" logic (or fallback)
+    if query_type == "research" and not llm_service.is_ollama_available():
+        # Without Ollama there is nothing to write the answer with, so skip the (paid) search
+        logger.warning(f"{log_prefix} - Ollama is unreachable. Skipping research.")
+        reply_text = t['synth_service_unavailable']
+    elif query_type == "research":
+        # Paraphrases of an earlier question reuse its answer
+        with tracing.span("embed"):
+            embedding = await llm_service.embed_text_async(user_query)
+        # ...about the same coins only: a coin name barely moves the embedding
+        symbols = frozenset(symbol for symbol, _ in extract_price_request(user_query)[0])
+        with tracing.span("answer_cache"):
+            cached = answer_cache.find(embedding, lang, symbols) if embedding else None
 
-        if sources:
-            logger.info(f"{log_prefix} - Synthesizing answer from {len(sources)} sources.")
-            answer = llm_service.synthesize_answer(user_query, context_text, lang)
+        if cached:
+            logger.info(f"{log_prefix} - Answering from semantic answer cache.")
+            answer, sources = cached
+            reply_text = _format_answer(answer, sources, t)
+        else:
+            logger.info(f"{log_prefix} - Performing web search.")
+            with tracing.span("search"):
+                context_text, sources = await search_service.search_web_async(user_query, lang)
 
-            if answer:
-                source_links = [f"• {s['title']} ({s['link']})" for s in sources]
-                reply_text = f"{answer}{t['synth_sources_header']}" + "\n".join(source_links)
+            if sources:
+                logger.info(f"{log_prefix} - Synthesizing answer from {len(sources)} sources.")
+                try:
+                    with tracing.span("synthesis"):
+                        answer, model = await llm_service.synthesize_answer_async(user_query, context_text, lang, on_partial)
+                except LLMBusyError:
+                    logger.warning(f"{log_prefix} - LLM queue full. Answering with the busy message.")
+                    reply_text = t['llm_busy']
+                else:
+                    if answer:
+                        reply_text = _format_answer(answer, sources, t)
+                        # Error messages and stopgap answers from the fallback model are not reused
+                        if embedding and model not in (None, LLM_SYNTH_FALLBACK_MODEL):
+                            answer_cache.add(embedding, lang, user_query, answer, sources, symbols)
+                    else:
+                        reply_text = t['synth_api_error']  # Synthesis failed
             else:
-                reply_text = t['synth_api_error']  # Synthesis failed
-        else:
-            reply_text = context_text  # This will be the error message from search_web
+                reply_text = context_text  # This will be the error message from search_web_async
 
+    tracing.set_label("intent", query_type)
     logger.info(f"{log_prefix} - Generation complete. Reply snippet: {reply_text[:150]}...")
 
-    # 4. Log and return
+    # 5. Log and return
     log_example_run(user_query, f"{query_type} ({lang})", reply_text)
-    return reply_text
\ No newline at end of file
+    return reply_text
+
+
+async def _generate_reply_standalone(user_query: str, request_id: str | None) -> str:
+    try:
+        return await generate_reply_async(user_query, request_id)
+    finally:
+        await close_async_http_client()
+
+
+def generate_reply(user_query: str, request_id: str | None = None) -> str:
+    """Synchronous shim around generate_reply_async() for standalone use (scripts, REPL)."""
+    return asyncio.run(_generate_reply_standalone(user_query, request_id))
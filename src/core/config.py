@@ -1,28 +1,130 @@
 import os
-import sys
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
 # --- Telegram Bot ---
+# Checked when the bot starts (main.py), so the modules stay importable without it
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-if not TELEGRAM_BOT_TOKEN:
-    print("Error: TELEGRAM_BOT_TOKEN not found in environment variables.", file=sys.stderr)
-    sys.exit(1)
+
+TELEGRAM_CONCURRENT_UPDATES = int(os.getenv("TELEGRAM_CONCURRENT_UPDATES", "256"))  # Updates handled concurrently
+TELEGRAM_STREAM_EDIT_INTERVAL = 1.5  # Min seconds between edits of a streamed reply (Telegram rate limits)
+TELEGRAM_DRAIN_TIMEOUT = 30.0  # On shutdown, seconds to let in-flight replies finish before cancelling them
+
+# Update delivery: "polling" (default) or "webhook" (Telegram POSTs updates to a local HTTP server,
+# normally behind a TLS-terminating reverse proxy that TELEGRAM_WEBHOOK_URL points at)
+TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "polling")
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL")  # Public base URL, e.g. https://bot.example.com
+TELEGRAM_WEBHOOK_LISTEN = os.getenv("TELEGRAM_WEBHOOK_LISTEN", "127.0.0.1")
+TELEGRAM_WEBHOOK_PORT = int(os.getenv("TELEGRAM_WEBHOOK_PORT", "8443"))
+TELEGRAM_WEBHOOK_PATH = "telegram"
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET")  # Checked against Telegram's secret token header
+TELEGRAM_WEBHOOK_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_WEBHOOK_MAX_CONNECTIONS", "40"))  # Parallel deliveries
 
 # --- APIs ---
-SERPAPI_KEY = os.getenv("SERPAPI_KEY")
-if not SERPAPI_KEY:
-    print("Warning: SERPAPI_KEY not found. Web search will fail.", file=sys.stderr)
+SERPAPI_KEY = os.getenv("SERPAPI_KEY")  # Without it web search is disabled (warned about at startup)
 
 WALLEX_API_URL = "https://api.wallex.ir/hector/web/v1/markets"
-OLLAMA_HOST = "http://127.0.0.1:11434"
+WALLEX_TIMEOUT = 10
+WALLEX_REFRESH_INTERVAL = 15  # Seconds between background market snapshot refreshes
+WALLEX_MAX_STALENESS = 60  # Oldest snapshot (in seconds) we still answer price queries from
+PRICE_PORTFOLIO_DEFAULT_QUOTE = "TMN"  # Currency holdings ("0.5 BTC + 2 ETH") are valued in unless the query names one
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+
+# --- Web Search ---
+SEARCH_SCRAPE_RESULTS = 3  # How many organic results to scrape for context
+SEARCH_SCRAPE_TIMEOUT = 5  # Per-page fetch timeout (seconds)
+SEARCH_SCRAPE_DEADLINE = 6.0  # Overall budget for all page fetches; slower pages fall back to snippets
+SEARCH_PAGE_MAX_CHARS = 20000  # Cap on extracted text kept per page (passages are picked from it)
+SEARCH_PAGE_MAX_BYTES = 1_500_000  # Stop downloading a page body beyond this many bytes
+SEARCH_HTML_EXTRACTOR = "auto"  # "auto" (fastest installed), "selectolax", "lxml" or "bs4"
+SEARCH_CACHE_FILE = "search_cache.sqlite3"
+SEARCH_CACHE_RESULTS_TTL = 6 * 3600  # Seconds a cached SerpAPI result list stays valid
+SEARCH_CACHE_PAGES_TTL = 24 * 3600  # Seconds a cached page text stays valid
+SEARCH_CACHE_MAX_RESULTS = 5000  # LRU bound on cached queries
+SEARCH_CACHE_MAX_PAGES = 20000  # LRU bound on cached pages
+
+# --- HTTP Connection Pools ---
+# Keep-alive pools shared by all callers of one service (see core/http_client.py).
+# "retries" applies to idempotent GETs, with exponential "backoff" (seconds).
+HTTP_POOLS = {
+    "default": {"max_connections": 50, "max_keepalive": 10, "timeout": 10, "retries": 2, "backoff": 0.3},
+    "wallex": {"max_connections": 10, "max_keepalive": 4, "timeout": WALLEX_TIMEOUT},
+    "serpapi": {"max_connections": 20, "max_keepalive": 10, "timeout": 30},
+    "scrape": {"max_connections": 100, "max_keepalive": 50, "timeout": SEARCH_SCRAPE_TIMEOUT, "retries": 0},
+    "ollama": {"max_connections": 32, "max_keepalive": 32, "timeout": 300, "retries": 0},
+}
 
 # --- LLM Models ---
 LLM_MODEL1 = "gemma2:2b"  # For classification
 LLM_MODEL2 = "gemma2:9b"  # For synthesis
+CLASSIFIER_CONFIDENCE_THRESHOLD = 0.75  # Below this, rule-based classification defers to LLM_MODEL1
+EMBEDDING_MODEL = "nomic-embed-text"  # For the semantic answer cache
+
+# --- Synthesis Context ---
+SYNTH_CONTEXT_TOKEN_BUDGETS = {LLM_MODEL2: 1000}  # Max (estimated) context tokens per synthesis model
+CONTEXT_PASSAGE_WORDS = 80  # Passage size used for relevance scoring
+
+# --- LLM Classification ---
+CLASSIFICATION_NUM_PREDICT = 24  # Max output tokens per message (a result is ~15 tokens)
+CLASSIFICATION_BATCH_WINDOW = 0.005  # Seconds to gather concurrent messages into one LLM call; 0 disables batching
+CLASSIFICATION_MAX_BATCH = 8  # Messages per batched classification call
+
+# --- LLM Scheduling ---
+LLM_MAX_CONCURRENCY = 3  # Requests in flight to the single Ollama instance, across all models
+LLM_MODEL_CONCURRENCY = {LLM_MODEL1: 2, LLM_MODEL2: 1, EMBEDDING_MODEL: 2}  # Per-model limits (default 1)
+LLM_PRIORITY_RESERVED_SLOTS = 1  # Slots only priority work (classification) may take
+LLM_MAX_QUEUE = 32  # Embedding/synthesis calls allowed to wait for a slot; more are answered "busy"
+
+# --- Model Lifecycle ---
+LLM_KEEP_ALIVE = {LLM_MODEL1: "1h", LLM_MODEL2: "1h", EMBEDDING_MODEL: "1h"}  # How long Ollama keeps a model loaded after a call
+LLM_MODEL_CHECK_INTERVAL = 300  # Seconds between readiness checks / keep-alive pings of every model
+OLLAMA_HEALTH_RETRY_INTERVAL = 15  # Seconds between health checks while Ollama is unreachable
+LLM_SYNTH_FALLBACK_MODEL = LLM_MODEL1  # Synthesizes while LLM_MODEL2 is still loading; None always waits for it
+
+# --- Per-User Rate Limit ---
+USER_RATE_LIMIT_BURST = 5  # Messages a user may send back to back
+USER_RATE_LIMIT_PER_MINUTE = 12  # Sustained messages per user per minute
+
+# --- Price Alerts ---
+ALERTS_FILE = "alerts.sqlite3"  # SQLite database holding active /alert subscriptions
+ALERT_MAX_PER_CHAT = 20  # Active alerts a chat may hold
+ALERT_DEFAULT_QUOTE = "USDT"  # Quote asset when "/alert BTC > 110000" names none
+ALERT_DISPATCH_INTERVAL = 1.0  # Seconds between notification batches sent from the job queue
+ALERT_NOTIFY_PER_SECOND = 25  # Notification messages per second (Telegram allows ~30 per bot)
+
+# --- Price History ---
+PRICE_HISTORY_DIR = "price_history"  # Memory-mapped store that survives restarts; "" keeps it in memory only
+PRICE_HISTORY_SAMPLE_INTERVAL = 60  # Seconds between recorded samples (taken from snapshot refreshes)
+PRICE_HISTORY_SLOTS = 1440  # Samples kept per market (1440 x 60s = 24 hours)
+PRICE_HISTORY_MAX_MARKETS = 1024  # Markets the store has room for
+PRICE_HISTORY_MIN_COVERAGE = 0.5  # Share of a question's window the history must cover to answer it
+
+# --- Semantic Answer Cache ---
+ANSWER_CACHE_SIMILARITY = 0.92  # Minimum cosine similarity to reuse an earlier answer
+ANSWER_CACHE_TTL = 6 * 3600  # Seconds a synthesized answer may be reused
+ANSWER_CACHE_MAX_ENTRIES = 2000
+
+# --- Tracing & Metrics ---
+METRICS_HOST = "127.0.0.1"  # The metrics endpoint is local-only
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))  # Serves /metrics in Prometheus text format; 0 disables it
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40)  # Histogram bounds (seconds)
+TRACE_SLOW_REQUEST_SECONDS = 8.0  # Requests slower than this are logged with their span breakdown
+SLOW_REQUEST_LOG_FILE = "slow_requests.log"
 
 # --- Other ---
 LOG_FILE = "bot.log"
-EXAMPLE_LOG_FILE = "examples.json"
\ No newline at end of file
+LOG_FORMAT = "json"  # bot.log and slow_requests.log records: "json" (one object per line) or "text"
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Rotate bot.log beyond this size...
+LOG_ROTATE_WHEN = ""  # ...or by time instead, e.g. "midnight" or "H" (see logging.handlers.TimedRotatingFileHandler)
+LOG_BACKUPS = 5
+LOG_QUEUE_SIZE = 10000  # Records waiting for the logging thread; more are dropped rather than blocking the caller
+LOG_SAMPLE_ABOVE_PER_SECOND = 200  # Per-request INFO lines per second before sampling starts
+LOG_INFO_SAMPLE_RATE = 0.1  # Share of requests whose INFO lines are kept while sampling (warnings are always kept)
+EXAMPLE_LOG_FILE = "examples.jsonl"  # Append-only JSON Lines example log
+LEGACY_EXAMPLE_LOG_FILE = "examples.json"  # Old single-array format, still read by example_log.read_examples()
+EXAMPLE_LOG_MAX_BYTES = 10 * 1024 * 1024  # Rotate examples.jsonl beyond this size
+EXAMPLE_LOG_BACKUPS = 5
+EXAMPLE_LOG_FLUSH_INTERVAL = 1.0  # Seconds the writer thread waits for more entries
+EXAMPLE_LOG_BATCH_SIZE = 100
\ No newline at end of file
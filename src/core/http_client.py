@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import threading
+import weakref
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from src.core import metrics
+from src.core.config import HTTP_POOLS
+
+logger = logging.getLogger(__name__)
+
+# Named connection pools (see HTTP_POOLS in config): one requests.Session for
+# synchronous callers, and one httpx.AsyncClient per event loop for async ones.
+# Both keep connections alive and pool them per host.
+
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+# httpx pools connections per loop, so a client must never be shared between the
+# bot's loop and a standalone asyncio.run().
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+_stats: dict[str, dict] = {}
+_stats_lock = threading.Lock()
+
+
+def _pool_config(pool: str) -> dict:
+    return {**HTTP_POOLS["default"], **HTTP_POOLS.get(pool, {})}
+
+
+def _count(pool: str, field: str, amount: int = 1):
+    with _stats_lock:
+        stats = _stats.setdefault(pool, {"requests": 0, "retries": 0, "failures": 0, "in_flight": 0, "max_in_flight": 0})
+        stats[field] += amount
+        if field == "in_flight":
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+
+
+def get_httpx_limits(pool: str) -> httpx.Limits:
+    """httpx connection limits for a pool, for clients built elsewhere (e.g. Ollama's)."""
+    config = _pool_config(pool)
+    return httpx.Limits(max_connections=config["max_connections"], max_keepalive_connections=config["max_keepalive"])
+
+
+# --- Synchronous (requests) ---
+
+def get_session(pool: str = "default") -> requests.Session:
+    """Returns the shared keep-alive requests.Session for a pool, with GET retries and backoff mounted."""
+    session = _sessions.get(pool)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        if pool not in _sessions:
+            config = _pool_config(pool)
+            retry = Retry(
+                total=config["retries"],
+                backoff_factor=config["backoff"],
+                status_forcelist=_RETRY_STATUSES,
+                allowed_methods=frozenset(["GET", "HEAD"]),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=config["max_keepalive"],
+                pool_maxsize=config["max_connections"],
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[pool] = session
+            logger.debug(f"Created HTTP session for pool '{pool}'.")
+        return _sessions[pool]
+
+
+def get(url: str, pool: str = "default", **kwargs) -> requests.Response:
+    """GET through a pool's session, using the pool's timeout unless one is given."""
+    kwargs.setdefault("timeout", _pool_config(pool)["timeout"])
+    _count(pool, "requests")
+    _count(pool, "in_flight")
+    try:
+        response = get_session(pool).get(url, **kwargs)
+    except requests.exceptions.RequestException:
+        _count(pool, "failures")
+        raise
+    finally:
+        _count(pool, "in_flight", -1)
+
+    retries = getattr(getattr(response.raw, "retries", None), "history", ())
+    if retries:
+        _count(pool, "retries", len(retries))
+    return response
+
+
+# --- Asynchronous (httpx) ---
+
+def get_async_http_client(pool: str = "default") -> httpx.AsyncClient:
+    """Returns the shared httpx.AsyncClient for a pool on the current event loop."""
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    client = clients.get(pool)
+    if client is None or client.is_closed:
+        config = _pool_config(pool)
+        client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=config["timeout"],
+            limits=get_httpx_limits(pool),
+        )
+        clients[pool] = client
+        logger.debug(f"Created async HTTP client for pool '{pool}' on the current event loop.")
+    return client
+
+
+async def get_async(url: str, pool: str = "default", **kwargs) -> httpx.Response:
+    """GET through a pool's async client, retrying 429/5xx and transport errors with exponential backoff."""
+    config = _pool_config(pool)
+    client = get_async_http_client(pool)
+    _count(pool, "requests")
+    _count(pool, "in_flight")
+    try:
+        for attempt in range(config["retries"] + 1):
+            last_attempt = attempt == config["retries"]
+            try:
+                response = await client.get(url, **kwargs)
+                if response.status_code not in _RETRY_STATUSES or last_attempt:
+                    return response
+            except httpx.TransportError:
+                if last_attempt:
+                    _count(pool, "failures")
+                    raise
+            _count(pool, "retries")
+            await asyncio.sleep(config["backoff"] * (2 ** attempt))
+    finally:
+        _count(pool, "in_flight", -1)
+
+
+def track_async_request(pool: str):
+    """Counts a request made directly on a pool's client (e.g. client.stream()) in the pool stats."""
+    _count(pool, "requests")
+
+
+async def close_async_http_client():
+    """Closes every pool's client on the current event loop (call before the loop shuts down)."""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+def get_pool_stats() -> dict:
+    """Returns per-pool request/retry/failure counters and, for sync pools, connection reuse."""
+    with _stats_lock:
+        stats = {pool: dict(values) for pool, values in _stats.items()}
+
+    for pool, session in list(_sessions.items()):
+        adapter = session.get_adapter("https://")
+        opened = served = 0
+        for key in list(adapter.poolmanager.pools.keys()):
+            host_pool = adapter.poolmanager.pools.get(key)
+            if host_pool is not None:
+                opened += host_pool.num_connections
+                served += host_pool.num_requests
+        entry = stats.setdefault(pool, {})
+        entry["connections_opened"] = opened
+        entry["connection_reuse_ratio"] = 1 - opened / served if served else None
+    return stats
+
+
+def _collect_metrics():
+    for pool, stats in get_pool_stats().items():
+        yield "chatbot_http_requests_total", stats.get("requests"), {"pool": pool}
+        yield "chatbot_http_retries_total", stats.get("retries"), {"pool": pool}
+        yield "chatbot_http_failures_total", stats.get("failures"), {"pool": pool}
+        yield "chatbot_http_in_flight", stats.get("in_flight"), {"pool": pool}
+        yield "chatbot_http_connections_opened", stats.get("connections_opened"), {"pool": pool}
+
+
+metrics.register_collector(_collect_metrics)
@@ -1,32 +1,198 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
 import sys
-from src.core.config import LOG_FILE
+import time
+import zlib
+from datetime import datetime
+from src.core import metrics, tracing
+from src.core.config import (
+    LOG_FILE, SLOW_REQUEST_LOG_FILE, LOG_FORMAT, LOG_MAX_BYTES, LOG_ROTATE_WHEN, LOG_BACKUPS, LOG_QUEUE_SIZE,
+    LOG_SAMPLE_ABOVE_PER_SECOND, LOG_INFO_SAMPLE_RATE
+)
 
+# Logging never blocks the bot: the root logger only has a QueueHandler, which
+# tags each record with the current request id and pipeline stage (see
+# core/tracing.py), samples per-request INFO lines under load and puts the record
+# on a bounded queue. One listener thread formats and writes everything: the
+# console, bot.log (rotated) and, for the "slow_requests" logger, slow_requests.log.
 
-def setup_logging():
-    """Configures the root logger for the application."""
-    log_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
-    # Get the root logger
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
+_traceback_formatter = logging.Formatter()
+_listener: logging.handlers.QueueListener | None = None  # The logging thread
+_stats = {"sampled_out": 0, "queue_full": 0}
+
+metrics.describe("chatbot_log_records_dropped_total", "counter", "Log records not written, by reason.")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id and stage when known."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key in ("request_id", "stage"):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        entry["thread"] = record.threadName
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _ContextFilter(logging.Filter):
+    """Copies the request id and stage from the caller's context onto the record (before it changes threads)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = tracing.current_request_id()
+        record.stage = tracing.current_stage()
+        return True
+
+
+class _RequestSampler(logging.Filter):
+    """
+    Once more than `above_per_second` per-request INFO lines arrive in a second,
+    keeps those of only `rate` of the requests (chosen by request id, so a kept
+    request keeps all its lines). Warnings and lines outside a request always pass.
+    """
+
+    def __init__(self, above_per_second: int, rate: float):
+        super().__init__()
+        self.above_per_second = above_per_second
+        self.threshold = int(rate * 10000)
+        self._second = 0
+        self._count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not record.request_id:
+            return True
+
+        second = int(time.monotonic())
+        if second != self._second:
+            self._second, self._count = second, 0
+        self._count += 1
+        if self._count <= self.above_per_second:
+            return True
+        if zlib.crc32(record.request_id.encode()) % 10000 < self.threshold:
+            return True
+
+        _stats["sampled_out"] += 1
+        metrics.increment("chatbot_log_records_dropped_total", reason="sampled")
+        return False
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Drops the record when the queue is full instead of blocking (or printing an error per record)."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments and render any traceback now, while exc_info is valid;
+        # the traceback stays out of the message so JSON records keep it apart
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _stats["queue_full"] += 1
+            metrics.increment("chatbot_log_records_dropped_total", reason="queue_full")
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room: on shutdown the queue may still be full of records to write
+        self.queue.put(self._sentinel)
 
-    # Clear existing handlers
-    if logger.handlers:
-        logger.handlers = []
+
+def _file_handler(path: str) -> logging.Handler:
+    """A rotating file handler: by time when LOG_ROTATE_WHEN is set, by size otherwise."""
+    if LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUPS,
+                                                         encoding='utf-8')
+    return logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                                encoding='utf-8')
+
+
+def setup_logging(stream=None):
+    """Configures the root logger for the application (console output goes to `stream`, default stdout)."""
+    global _listener
+
+    stop_logging()
+    text_formatter = logging.Formatter(TEXT_FORMAT)
+    file_formatter = JsonFormatter() if LOG_FORMAT == "json" else text_formatter
+    handlers = []
+
+    # Stream Handler (to console)
+    stream_handler = logging.StreamHandler(stream or sys.stdout)
+    stream_handler.setFormatter(text_formatter)
+    handlers.append(stream_handler)
 
     # File Handler
     try:
-        file_handler = logging.FileHandler(LOG_FILE, encoding='utf-8')
-        file_handler.setFormatter(log_formatter)
-        logger.addHandler(file_handler)
+        file_handler = _file_handler(LOG_FILE)
+        file_handler.setFormatter(file_formatter)
+        handlers.append(file_handler)
     except Exception as e:
         print(f"Error setting up file logger ({LOG_FILE}): {e}", file=sys.stderr)
 
-    # Stream Handler (to console)
-    stream_handler = logging.StreamHandler(sys.stdout)
-    stream_handler.setFormatter(log_formatter)
-    stream_handler.encoding = 'utf-8'  # type: ignore
-    logger.addHandler(stream_handler)
+    # Slow-request log: span breakdowns of requests over TRACE_SLOW_REQUEST_SECONDS
+    # (these records also reach the console and bot.log)
+    try:
+        slow_handler = _file_handler(SLOW_REQUEST_LOG_FILE)
+        slow_handler.setFormatter(file_formatter)
+        slow_handler.addFilter(lambda record: record.name == "slow_requests")
+        handlers.append(slow_handler)
+    except Exception as e:
+        print(f"Error setting up slow request logger ({SLOW_REQUEST_LOG_FILE}): {e}", file=sys.stderr)
+    logging.getLogger("slow_requests").handlers = []
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = _NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(_ContextFilter())
+    queue_handler.addFilter(_RequestSampler(LOG_SAMPLE_ABOVE_PER_SECOND, LOG_INFO_SAMPLE_RATE))
+
+    # Get the root logger
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    logger.handlers = [queue_handler]
+
+    _listener = _Listener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    logging.info("Logging configured.")
+
+
+def stop_logging():
+    """Writes out the records still queued and stops the logging thread (also run at exit)."""
+    global _listener
+
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def get_logging_stats() -> dict:
+    """Returns records queued now and records dropped by sampling or a full queue."""
+    listener = _listener
+    return {**_stats, "queued": listener.queue.qsize() if listener else 0}
+
 
-    logging.info("Logging configured.")
\ No newline at end of file
+atexit.register(stop_logging)
@@ -0,0 +1,191 @@
+import bisect
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.core import readiness
+from src.core.config import METRICS_HOST, METRICS_PORT, METRICS_LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+# In-process counters, gauges and histograms, rendered in the Prometheus text format on
+# a local HTTP endpoint. Label sets are kept small (stage, intent, outcome) so the
+# number of series stays bounded. Services that already keep their own counters
+# (cache hits, pool usage, ...) register a collector that reads them at render time.
+
+_lock = threading.Lock()
+_help: dict[str, tuple[str, str]] = {}  # metric name -> (type, help text)
+_counters: dict[tuple, float] = {}  # (name, labels) -> value
+_gauges: dict[tuple, float] = {}  # (name, labels) -> value
+_histograms: dict[tuple, dict] = {}  # (name, labels) -> {"buckets": [...], "sum": float, "count": int}
+_collectors: list = []
+
+_server: ThreadingHTTPServer | None = None
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def describe(name: str, kind: str, help_text: str):
+    """Sets the # TYPE / # HELP lines of a metric ('counter', 'gauge' or 'histogram')."""
+    _help[name] = (kind, help_text)
+
+
+def register_collector(collect):
+    """
+    Adds collect() to every render(): it yields (name, value, labels) samples read
+    from a service's own stats. The type comes from describe() (gauge if undescribed);
+    None values are skipped.
+    """
+    if collect not in _collectors:
+        _collectors.append(collect)
+
+
+def _collect() -> tuple[dict, dict]:
+    """Runs the collectors. Returns (counters, gauges) keyed like _counters/_gauges."""
+    counters, gauges = {}, {}
+    for collect in list(_collectors):
+        try:
+            for name, value, labels in collect():
+                if value is None:
+                    continue
+                kind = _help.get(name, ("gauge", ""))[0]
+                (counters if kind == "counter" else gauges)[(name, _labels_key(labels))] = value
+        except Exception as e:
+            logger.warning(f"Metrics collector {collect!r} failed: {e}")
+    return counters, gauges
+
+
+def increment(name: str, amount: float = 1, **labels):
+    """Adds amount to a counter."""
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name: str, value: float, **labels):
+    """Sets a gauge to value."""
+    with _lock:
+        _gauges[(name, _labels_key(labels))] = value
+
+
+def observe(name: str, value: float, **labels):
+    """Records a value (seconds, for latencies) in a histogram with METRICS_LATENCY_BUCKETS."""
+    key = (name, _labels_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * len(METRICS_LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+        index = bisect.bisect_left(METRICS_LATENCY_BUCKETS, value)
+        if index < len(METRICS_LATENCY_BUCKETS):
+            histogram["buckets"][index] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render() -> str:
+    """Returns every metric in the Prometheus text exposition format."""
+    counters, gauges = _collect()
+    with _lock:
+        counters.update(_counters)
+        gauges.update(_gauges)
+        histograms = {key: {**h, "buckets": list(h["buckets"])} for key, h in _histograms.items()}
+
+    lines = []
+    described = set()
+
+    def header(name: str, default_kind: str):
+        if name not in described:
+            kind, help_text = _help.get(name, (default_kind, name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            described.add(name)
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    for (name, labels), value in sorted(gauges.items()):
+        header(name, "gauge")
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    for (name, labels), histogram in sorted(histograms.items()):
+        header(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(METRICS_LATENCY_BUCKETS, histogram["buckets"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {histogram['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            self._send(200, "text/plain; version=0.0.4; charset=utf-8", render())
+        elif path == "/ready":
+            # 503 until every required component is ready, for deploy health checks
+            status = readiness.get_readiness()
+            self._send(200 if status["ready"] else 503, "application/json", json.dumps(status))
+        else:
+            self.send_error(404)
+
+    def _send(self, code: int, content_type: str, text: str):
+        body = text.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would otherwise flood stderr
+        pass
+
+
+def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> bool:
+    """Serves /metrics and /ready from a daemon thread (idempotent). Returns False if disabled or the port is taken."""
+    global _server
+
+    if _server is not None:
+        return True
+    if not port:
+        logger.info("Metrics endpoint disabled (METRICS_PORT=0).")
+        return False
+
+    try:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.error(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        return False
+
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{_server.server_port}/metrics")
+    return True
+
+
+def stop_metrics_server():
+    """Stops the metrics endpoint if it is running."""
+    global _server
+
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
@@ -0,0 +1,62 @@
+import logging
+import threading
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Readiness of the bot's dependencies and the timing of its startup.
+# Components register a check: a cheap callable that reads in-memory state and
+# never does I/O (the background refresher and model manager keep that state
+# current). Required components must all be ready for get_readiness() to report
+# the bot ready; optional ones (e.g. Ollama, which price lookups do not need)
+# are reported but do not block it. main.py imports this module first, so the
+# startup milestones are seconds since the process began loading the bot.
+
+_boot_time = time.monotonic()
+_checks: dict[str, tuple[Callable[[], bool], bool]] = {}  # name -> (check, required)
+_milestones: dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def register(name: str, check: Callable[[], bool], required: bool = True):
+    """Adds (or replaces) the readiness check of a component."""
+    _checks[name] = (check, required)
+
+
+def get_readiness() -> dict:
+    """Returns {"ready": bool, "components": {name: {"ready", "required"}}, "startup": milestones}."""
+    components = {}
+    for name, (check, required) in list(_checks.items()):
+        try:
+            ready = bool(check())
+        except Exception as e:
+            logger.error(f"Readiness check '{name}' failed: {e}")
+            ready = False
+        components[name] = {"ready": ready, "required": required}
+    return {
+        "ready": all(c["ready"] for c in components.values() if c["required"]),
+        "components": components,
+        "startup": get_startup_report(),
+    }
+
+
+def is_ready() -> bool:
+    """True once every required component is ready."""
+    return get_readiness()["ready"]
+
+
+def milestone(name: str) -> float | None:
+    """Records (and logs) the first time a startup milestone is reached. Returns its seconds since boot."""
+    with _lock:
+        if name in _milestones:
+            return None
+        seconds = _milestones[name] = time.monotonic() - _boot_time
+    logger.info(f"Startup: {name} after {seconds:.2f}s.")
+    return seconds
+
+
+def get_startup_report() -> dict[str, float]:
+    """Returns the seconds since boot of every milestone reached so far."""
+    with _lock:
+        return dict(_milestones)
@@ -0,0 +1,131 @@
+import contextvars
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from src.core import metrics
+from src.core.config import TRACE_SLOW_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Slow requests go to their own logger (see setup_logging), with the span breakdown
+slow_logger = logging.getLogger("slow_requests")
+
+metrics.describe("chatbot_requests_total", "counter", "Replies generated, by final intent, classifier tier and outcome.")
+metrics.describe("chatbot_request_duration_seconds", "histogram", "End-to-end reply latency, by final intent.")
+metrics.describe("chatbot_stage_duration_seconds", "histogram", "Latency of each pipeline stage.")
+metrics.describe("chatbot_stage_errors_total", "counter", "Pipeline stages that raised or were cancelled.")
+metrics.describe("chatbot_slow_requests_total", "counter", "Requests slower than TRACE_SLOW_REQUEST_SECONDS.")
+
+
+class Trace:
+    """The timed spans of one request. Offsets are seconds since the request started."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.monotonic()
+        self.spans: list[dict] = []
+        self.labels: dict[str, str] = {}
+
+    def breakdown(self) -> str:
+        parts = []
+        for s in sorted(self.spans, key=lambda s: s["offset"]):
+            detail = f" ({s['detail']})" if s["detail"] else ""
+            error = f" [{s['error']}]" if s["error"] else ""
+            parts.append(f"{s['name']}{detail} +{s['offset']:.3f}s {s['seconds']:.3f}s{error}")
+        return ", ".join(parts)
+
+
+_current_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("current_trace", default=None)
+# The innermost span being run, so log records can say which stage they came from
+_current_stage: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_stage", default=None)
+
+
+def new_request_id(prefix: str = "Standalone") -> str:
+    """A request id that stays readable (prefix, e.g. the user) but is unique per request."""
+    return f"{prefix}_{time.strftime('%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def current_request_id() -> str | None:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+def current_stage() -> str | None:
+    return _current_stage.get()
+
+
+def set_label(key: str, value: str):
+    """Attaches a label (e.g. intent) to the current request's metrics and slow log entry."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.labels[key] = value
+
+
+@contextmanager
+def trace_request(request_id: str):
+    """
+    Traces one request: spans opened inside (including in tasks it starts) are
+    recorded on it. Nested calls join the outer trace, so the handler and
+    generate_reply_async can both open one.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        yield trace
+        return
+
+    trace = Trace(request_id)
+    token = _current_trace.set(trace)
+    outcome = "ok"
+    try:
+        yield trace
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        _current_trace.reset(token)
+        _finish(trace, outcome)
+
+
+def _finish(trace: Trace, outcome: str):
+    seconds = time.monotonic() - trace.started
+    intent = trace.labels.get("intent", "unknown")
+    tier = trace.labels.get("tier", "unknown")
+    metrics.increment("chatbot_requests_total", intent=intent, tier=tier, outcome=outcome)
+    metrics.observe("chatbot_request_duration_seconds", seconds, intent=intent)
+
+    if seconds >= TRACE_SLOW_REQUEST_SECONDS:
+        metrics.increment("chatbot_slow_requests_total", intent=intent)
+        labels = " ".join(f"{k}={v}" for k, v in trace.labels.items())
+        slow_logger.warning(f"[{trace.request_id}] Slow request: {seconds:.3f}s ({labels}). Spans: {trace.breakdown()}")
+
+
+@contextmanager
+def span(name: str, detail: str | None = None):
+    """
+    Times a pipeline stage into chatbot_stage_duration_seconds{stage=name} and,
+    inside a traced request, onto its trace. detail (e.g. a scraped domain) only
+    goes to the trace, to keep the metric's label set small.
+    """
+    started = time.monotonic()
+    error = None
+    stage_token = _current_stage.set(name)
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        metrics.increment("chatbot_stage_errors_total", stage=name)
+        raise
+    finally:
+        _current_stage.reset(stage_token)
+        seconds = time.monotonic() - started
+        metrics.observe("chatbot_stage_duration_seconds", seconds, stage=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append({
+                "name": name,
+                "detail": detail,
+                "offset": started - trace.started,
+                "seconds": seconds,
+                "error": error,
+            })
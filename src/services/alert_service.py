@@ -0,0 +1,336 @@
+import bisect
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from src.core import metrics
+from src.core.config import ALERTS_FILE, ALERT_MAX_PER_CHAT, ALERT_DEFAULT_QUOTE
+from src.services import market_snapshot
+from src.utils.amounts import PERSIAN_DIGITS, normalize_quote
+
+logger = logging.getLogger(__name__)
+
+# Price alerts ("/alert BTC > 110000 USDT"), evaluated on every market snapshot
+# refresh instead of users polling the bot for prices.
+#
+# Alerts are one-shot and persisted in SQLite. In memory they are indexed per
+# (base, quote) market in two sorted threshold arrays: "above" alerts fire once
+# the price is at or above their threshold, "below" alerts once it is at or below.
+# Alerts still in the index have not fired, so after a price move every "above"
+# alert that fires sits at the front of its array and every "below" alert at the
+# back: one bisect per market finds them, and markets whose price did not move
+# are skipped. Fired alerts wait in a per-chat queue that the bot drains from its
+# job queue (see handlers._dispatch_alert_notifications).
+
+ABOVE = "above"
+BELOW = "below"
+
+_OPERATORS = {">": ABOVE, ">=": ABOVE, "above": ABOVE, "بالای": ABOVE, "بالاتر": ABOVE,
+              "<": BELOW, "<=": BELOW, "below": BELOW, "زیر": BELOW, "پایین": BELOW, "پایینتر": BELOW}
+_ALERT_RE = re.compile(
+    r"^(?P<coin>.+?)\s*(?P<op>>=|<=|>|<|\b(?:above|below)\b|بالاتر|بالای|پایینتر|پایین|زیر)\s*"
+    r"(?P<threshold>\d[\d,_]*(?:\.\d+)?)\s*(?P<quote>[A-Za-z]+|تومان|تومن|تتر)?$",
+    re.IGNORECASE
+)
+
+
+class _MarketAlerts:
+    """The pending alerts of one (base, quote) market, as threshold-sorted parallel arrays."""
+
+    __slots__ = ("above_thresholds", "above_ids", "below_thresholds", "below_ids", "last_price")
+
+    def __init__(self):
+        self.above_thresholds: list[float] = []
+        self.above_ids: list[int] = []
+        self.below_thresholds: list[float] = []
+        self.below_ids: list[int] = []
+        self.last_price: float | None = None
+
+    def add(self, alert_id: int, direction: str, threshold: float):
+        thresholds, ids = self._arrays(direction)
+        index = bisect.bisect_right(thresholds, threshold)
+        thresholds.insert(index, threshold)
+        ids.insert(index, alert_id)
+
+    def remove(self, alert_id: int, direction: str, threshold: float):
+        thresholds, ids = self._arrays(direction)
+        index = bisect.bisect_left(thresholds, threshold)
+        while index < len(ids) and thresholds[index] == threshold:
+            if ids[index] == alert_id:
+                del thresholds[index], ids[index]
+                return
+            index += 1
+
+    def pop_triggered(self, price: float) -> list[int]:
+        """Removes and returns the ids of every alert the price has reached."""
+        above = bisect.bisect_right(self.above_thresholds, price)
+        below = bisect.bisect_left(self.below_thresholds, price)
+        triggered = self.above_ids[:above] + self.below_ids[below:]
+        del self.above_thresholds[:above], self.above_ids[:above]
+        del self.below_thresholds[below:], self.below_ids[below:]
+        return triggered
+
+    def __len__(self):
+        return len(self.above_ids) + len(self.below_ids)
+
+    def _arrays(self, direction: str) -> tuple[list[float], list[int]]:
+        if direction == ABOVE:
+            return self.above_thresholds, self.above_ids
+        return self.below_thresholds, self.below_ids
+
+
+_alerts: dict[int, dict] = {}  # alert id -> alert
+_markets: dict[tuple[str, str], _MarketAlerts] = {}  # (BASE, QUOTE) -> index
+_notifications: "OrderedDict[int, list[dict]]" = OrderedDict()  # chat id -> triggered alerts, oldest chat first
+_lock = threading.Lock()
+_connection: sqlite3.Connection | None = None
+_loaded = False
+_stats = {"evaluations": 0, "markets_checked": 0, "triggered": 0}
+
+metrics.describe("chatbot_alerts_active", "gauge", "Price alerts waiting to trigger.")
+metrics.describe("chatbot_alerts_triggered_total", "counter", "Price alerts that reached their threshold.")
+metrics.describe("chatbot_alert_evaluation_seconds", "histogram", "Time to evaluate all alerts against a new snapshot.")
+metrics.describe("chatbot_alert_markets", "gauge", "Markets with at least one active alert.")
+metrics.describe("chatbot_alert_notifications_queued", "gauge", "Chats with triggered alerts waiting to be sent.")
+metrics.describe("chatbot_alert_evaluations_total", "counter", "Snapshot evaluations of the alert index.")
+metrics.describe("chatbot_alert_markets_checked_total", "counter", "Markets checked against the alert index after a price change.")
+
+
+# --- Persistence ---
+
+def _get_connection() -> sqlite3.Connection:
+    """Opens (and creates, on first use) the alerts database. Caller holds _lock."""
+    global _connection
+
+    if _connection is None:
+        _connection = sqlite3.connect(ALERTS_FILE, check_same_thread=False)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS alerts (id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL, "
+            "base TEXT NOT NULL, quote TEXT NOT NULL, direction TEXT NOT NULL, threshold REAL NOT NULL, "
+            "lang TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        _connection.execute("CREATE INDEX IF NOT EXISTS alerts_chat ON alerts (chat_id)")
+        _connection.commit()
+    return _connection
+
+
+def _index(alert: dict):
+    _alerts[alert["id"]] = alert
+    _markets.setdefault((alert["base"], alert["quote"]), _MarketAlerts()).add(
+        alert["id"], alert["direction"], alert["threshold"])
+
+
+def _unindex(alert: dict):
+    key = (alert["base"], alert["quote"])
+    market = _markets.get(key)
+    if market is not None:
+        market.remove(alert["id"], alert["direction"], alert["threshold"])
+        if not len(market):
+            del _markets[key]
+    _alerts.pop(alert["id"], None)
+
+
+def _ensure_loaded():
+    """Loads the stored alerts into the index on first use. Caller holds _lock."""
+    global _loaded
+
+    if _loaded:
+        return
+    rows = _get_connection().execute(
+        "SELECT id, chat_id, base, quote, direction, threshold, lang, created FROM alerts").fetchall()
+    for row in rows:
+        _index(dict(zip(("id", "chat_id", "base", "quote", "direction", "threshold", "lang", "created"), row)))
+    _loaded = True
+    metrics.set_gauge("chatbot_alerts_active", len(_alerts))
+    logger.info(f"Loaded {len(rows)} price alerts from {ALERTS_FILE}.")
+
+
+# --- Parsing ---
+
+def parse_alert(text: str) -> tuple[str, str, float, str | None]:
+    """
+    Parses "BTC > 110000 USDT" (also >=, <, <=, above/below, Farsi words and
+    digits, thousands separators; the quote is optional).
+    Returns (coin text, direction, threshold, quote or None). Raises ValueError.
+    """
+    match = _ALERT_RE.match(" ".join(text.translate(PERSIAN_DIGITS).split()))
+    if not match:
+        raise ValueError(f"Not an alert: {text!r}")
+
+    threshold = float(match["threshold"].replace(",", "").replace("_", ""))
+    if threshold <= 0:
+        raise ValueError(f"Threshold must be positive: {threshold}")
+    quote = match["quote"]
+    if quote:
+        quote = normalize_quote(quote)
+    return match["coin"].strip(), _OPERATORS[match["op"].lower()], threshold, quote
+
+
+def _current_price(snapshot: market_snapshot.MarketSnapshot | None, base: str, quote: str) -> float | None:
+    if snapshot is None:
+        return None
+    for market in snapshot.by_base.get(base.lower(), []):
+        if market["quote"] == quote:
+            try:
+                return float(market["price"])
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+# --- Subscriptions ---
+
+def add_alert(snapshot: market_snapshot.MarketSnapshot | None, chat_id: int, base: str, direction: str,
+              threshold: float, quote: str | None = None, lang: str = 'en') -> tuple[str, dict]:
+    """
+    Subscribes a chat to a one-shot alert, checked against the current prices in snapshot.
+    Returns (status, alert) where status is 'created', 'already_met' (the price is
+    already past the threshold; nothing is stored), 'unknown_market' or 'limit'.
+    alert["price"] holds the current price when known.
+    """
+    base, quote = base.upper(), (quote or ALERT_DEFAULT_QUOTE).upper()
+    alert = {"chat_id": chat_id, "base": base, "quote": quote, "direction": direction, "threshold": threshold,
+             "lang": lang, "created": time.time()}
+
+    price = _current_price(snapshot, base, quote)
+    alert["price"] = price
+    if price is None:
+        return "unknown_market", alert
+    if (price >= threshold) if direction == ABOVE else (price <= threshold):
+        return "already_met", alert
+
+    with _lock:
+        _ensure_loaded()
+        if sum(1 for a in _alerts.values() if a["chat_id"] == chat_id) >= ALERT_MAX_PER_CHAT:
+            return "limit", alert
+        conn = _get_connection()
+        cursor = conn.execute(
+            "INSERT INTO alerts (chat_id, base, quote, direction, threshold, lang, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (chat_id, base, quote, direction, threshold, lang, alert["created"])
+        )
+        conn.commit()
+        alert["id"] = cursor.lastrowid
+        new_market = (base, quote) not in _markets
+        _index({k: v for k, v in alert.items() if k != "price"})
+        if new_market:
+            # Only prices seen from now on may trigger it (an existing market keeps the last evaluated price)
+            _markets[(base, quote)].last_price = price
+        metrics.set_gauge("chatbot_alerts_active", len(_alerts))
+
+    logger.info(f"Alert {alert['id']} created for chat {chat_id}: {base}/{quote} {direction} {threshold:g}.")
+    return "created", alert
+
+
+def list_alerts(chat_id: int) -> list[dict]:
+    """Returns the chat's active alerts, oldest first."""
+    with _lock:
+        _ensure_loaded()
+        return sorted((dict(a) for a in _alerts.values() if a["chat_id"] == chat_id), key=lambda a: a["id"])
+
+
+def remove_alerts(chat_id: int, alert_id: int | None = None) -> int:
+    """Deletes one of the chat's alerts (or all of them when alert_id is None). Returns how many were deleted."""
+    with _lock:
+        _ensure_loaded()
+        doomed = [a for a in _alerts.values()
+                  if a["chat_id"] == chat_id and (alert_id is None or a["id"] == alert_id)]
+        if not doomed:
+            return 0
+        conn = _get_connection()
+        conn.executemany("DELETE FROM alerts WHERE id = ?", [(a["id"],) for a in doomed])
+        conn.commit()
+        for alert in doomed:
+            _unindex(alert)
+        metrics.set_gauge("chatbot_alerts_active", len(_alerts))
+    return len(doomed)
+
+
+# --- Evaluation ---
+
+def evaluate(snapshot: market_snapshot.MarketSnapshot) -> int:
+    """Triggers every alert the snapshot's prices have reached. Returns how many triggered."""
+    started = time.monotonic()
+    with _lock:
+        _ensure_loaded()
+        triggered = []
+        checked = 0
+        for (base, quote), market in list(_markets.items()):
+            price = _current_price(snapshot, base, quote)
+            if price is None or price == market.last_price:
+                continue
+            checked += 1
+            market.last_price = price
+            for alert_id in market.pop_triggered(price):
+                alert = _alerts.pop(alert_id)
+                triggered.append({**alert, "price": price})
+            if not len(market):
+                del _markets[(base, quote)]
+
+        if triggered:
+            conn = _get_connection()
+            conn.executemany("DELETE FROM alerts WHERE id = ?", [(a["id"],) for a in triggered])
+            conn.commit()
+            for alert in triggered:
+                _notifications.setdefault(alert["chat_id"], []).append(alert)
+
+        _stats["evaluations"] += 1
+        _stats["markets_checked"] += checked
+        _stats["triggered"] += len(triggered)
+        metrics.set_gauge("chatbot_alerts_active", len(_alerts))
+
+    metrics.observe("chatbot_alert_evaluation_seconds", time.monotonic() - started)
+    if triggered:
+        metrics.increment("chatbot_alerts_triggered_total", len(triggered))
+        logger.info(f"{len(triggered)} price alerts triggered ({checked} markets checked).")
+    return len(triggered)
+
+
+def _on_snapshot_refresh(snapshot: market_snapshot.MarketSnapshot):
+    evaluate(snapshot)
+
+
+def start_alert_engine():
+    """Loads the stored alerts and evaluates them on every market snapshot refresh (idempotent)."""
+    with _lock:
+        _ensure_loaded()
+    market_snapshot.add_refresh_listener(_on_snapshot_refresh)
+
+
+# --- Notifications ---
+
+def take_notifications(max_chats: int) -> list[tuple[int, list[dict]]]:
+    """Removes and returns the triggered alerts of up to max_chats chats, oldest first, as (chat id, alerts)."""
+    with _lock:
+        batch = []
+        while _notifications and len(batch) < max_chats:
+            batch.append(_notifications.popitem(last=False))
+        return batch
+
+
+def requeue_notifications(batch: list[tuple[int, list[dict]]]):
+    """Puts notifications that could not be sent back at the front of the queue."""
+    with _lock:
+        for chat_id, alerts in reversed(batch):
+            _notifications[chat_id] = alerts + _notifications.get(chat_id, [])
+            _notifications.move_to_end(chat_id, last=False)
+
+
+def get_alert_stats() -> dict:
+    """Returns active alerts, indexed markets, queued notifications and evaluation counters."""
+    with _lock:
+        return {"active": len(_alerts), "markets": len(_markets),
+                "queued_chats": len(_notifications), **_stats}
+
+
+def _collect_metrics():
+    stats = get_alert_stats()
+    yield "chatbot_alert_markets", stats["markets"], {}
+    yield "chatbot_alert_notifications_queued", stats["queued_chats"], {}
+    yield "chatbot_alert_evaluations_total", stats["evaluations"], {}
+    yield "chatbot_alert_markets_checked_total", stats["markets_checked"], {}
+
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,201 @@
+import logging
+import threading
+import time
+import numpy as np
+from src.core import metrics
+from src.core.config import ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+
+class BruteForceIndex:
+    """
+    Exact nearest-neighbour search over unit vectors with one NumPy matmul.
+
+    Any object with the same add/remove/search/__len__ methods can replace it
+    through set_index_backend(), e.g. a wrapper around an ANN library.
+    """
+
+    def __init__(self):
+        self._vectors: np.ndarray | None = None
+        self._keys: list[int] = []
+        self._positions: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: int, vector: np.ndarray):
+        if self._vectors is None:
+            self._vectors = np.empty((16, vector.shape[0]), dtype=np.float32)
+        elif len(self._keys) == self._vectors.shape[0]:
+            self._vectors = np.concatenate([self._vectors, np.empty_like(self._vectors)])
+
+        position = len(self._keys)
+        self._vectors[position] = vector
+        self._keys.append(key)
+        self._positions[key] = position
+
+    def remove(self, key: int):
+        position = self._positions.pop(key, None)
+        if position is None:
+            return
+        # Move the last row into the hole so the live rows stay contiguous
+        last = len(self._keys) - 1
+        if position != last:
+            last_key = self._keys[last]
+            self._vectors[position] = self._vectors[last]
+            self._keys[position] = last_key
+            self._positions[last_key] = position
+        self._keys.pop()
+
+    def search(self, vector: np.ndarray, k: int = 1) -> list[tuple[int, float]]:
+        """Returns up to k (key, cosine similarity) pairs, best first."""
+        if not self._keys:
+            return []
+        scores = self._vectors[:len(self._keys)] @ vector
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self._keys[i], float(scores[i])) for i in best]
+
+
+# One index per language, so an English answer is never served for a Farsi question
+_index_factory = BruteForceIndex
+_indexes: dict[str, object] = {}
+_entries: dict[int, dict] = {}
+_next_key = 0
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "symbol_mismatches": 0, "evictions": 0}
+
+metrics.describe("chatbot_answer_cache_lookups_total", "counter", "Answer cache lookups, by result (hit, miss).")
+metrics.describe("chatbot_answer_cache_stores_total", "counter", "Answers added to the answer cache.")
+metrics.describe("chatbot_answer_cache_removals_total", "counter", "Answer cache entries dropped, by reason (expired, evicted).")
+metrics.describe("chatbot_answer_cache_symbol_mismatches_total", "counter", "Similar cached answers skipped because they name other coins.")
+metrics.describe("chatbot_answer_cache_entries", "gauge", "Answers currently in the answer cache.")
+# Nearest neighbours checked per lookup, so an expired or other-coin best match does not hide a usable one
+_CANDIDATES = 8
+
+
+def set_index_backend(factory):
+    """Swaps the vector index implementation; existing entries are re-indexed."""
+    global _index_factory
+
+    with _lock:
+        _index_factory = factory
+        _indexes.clear()
+        for key, entry in _entries.items():
+            _index_for(entry["lang"]).add(key, entry["vector"])
+
+
+def _index_for(lang: str):
+    index = _indexes.get(lang)
+    if index is None:
+        index = _indexes[lang] = _index_factory()
+    return index
+
+
+def _normalize(embedding) -> np.ndarray | None:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+def _remove(key: int):
+    entry = _entries.pop(key)
+    _indexes[entry["lang"]].remove(key)
+
+
+def find(embedding, lang: str, symbols: frozenset = frozenset()) -> tuple[str, list] | None:
+    """
+    Returns the cached (answer, sources) of the most similar earlier question in
+    the same language about the same coins (symbols), if it is similar enough
+    and younger than the TTL. Expired candidates are evicted on the way.
+    """
+    vector = _normalize(embedding)
+    if vector is None:
+        return None
+
+    with _lock:
+        index = _indexes.get(lang)
+        matches = index.search(vector, _CANDIDATES) if index is not None else []
+        now = time.monotonic()
+        hit = None
+        for key, similarity in matches:
+            if similarity < ANSWER_CACHE_SIMILARITY:
+                break
+            entry = _entries[key]
+            if now - entry["created"] > ANSWER_CACHE_TTL:
+                _remove(key)
+                _stats["expired"] += 1
+                continue
+            if entry["symbols"] != symbols:
+                # "Why did BTC drop?" and "Why did ETH drop?" embed almost alike
+                _stats["symbol_mismatches"] += 1
+                continue
+            hit = entry, similarity
+            break
+
+        if hit is None:
+            _stats["misses"] += 1
+            return None
+        _stats["hits"] += 1
+
+    entry, similarity = hit
+    logger.info(f"Semantic answer cache hit (similarity={similarity:.3f}) for earlier query: '{entry['query']}'")
+    return entry["answer"], entry["sources"]
+
+
+def add(embedding, lang: str, query: str, answer: str, sources: list, symbols: frozenset = frozenset()):
+    """
+    Caches a synthesized answer under the query's embedding and the coins it
+    names (symbols), evicting the oldest entry when full.
+    """
+    global _next_key
+
+    vector = _normalize(embedding)
+    if vector is None:
+        return
+
+    with _lock:
+        now = time.monotonic()
+        # Entries are kept in creation order, so the expired ones are at the front
+        while _entries and now - _entries[next(iter(_entries))]["created"] > ANSWER_CACHE_TTL:
+            _remove(next(iter(_entries)))
+            _stats["expired"] += 1
+        while len(_entries) >= ANSWER_CACHE_MAX_ENTRIES:
+            _remove(next(iter(_entries)))  # dicts keep insertion order: this is the oldest
+            _stats["evictions"] += 1
+
+        key = _next_key
+        _next_key += 1
+        _entries[key] = {
+            "vector": vector,
+            "lang": lang,
+            "symbols": symbols,
+            "query": query,
+            "answer": answer,
+            "sources": sources,
+            "created": now,
+        }
+        _index_for(lang).add(key, vector)
+        _stats["stores"] += 1
+
+
+def get_cache_stats() -> dict:
+    """Returns hit/miss/store/eviction counters and the current entry count."""
+    with _lock:
+        return {**_stats, "entries": len(_entries)}
+
+
+def _collect_metrics():
+    stats = get_cache_stats()
+    yield "chatbot_answer_cache_lookups_total", stats["hits"], {"result": "hit"}
+    yield "chatbot_answer_cache_lookups_total", stats["misses"], {"result": "miss"}
+    yield "chatbot_answer_cache_stores_total", stats["stores"], {}
+    yield "chatbot_answer_cache_removals_total", stats["expired"], {"reason": "expired"}
+    yield "chatbot_answer_cache_removals_total", stats["evictions"], {"reason": "evicted"}
+    yield "chatbot_answer_cache_symbol_mismatches_total", stats["symbol_mismatches"], {}
+    yield "chatbot_answer_cache_entries", stats["entries"], {}
+
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,163 @@
+import logging
+import re
+from src.core import metrics
+from src.core.config import CLASSIFIER_CONFIDENCE_THRESHOLD, LLM_MODEL1
+from src.services import llm_service, price_history, pricing_service
+from src.utils.symbol_matcher import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Arabic-script blocks (Arabic, Arabic Supplement, Presentation Forms A/B); Farsi lives here
+_ARABIC_SCRIPT_RE = re.compile(r'[\u0600-\u06FF\u0750-\u077F\uFB50-\uFDFF\uFE70-\uFEFF]')
+_LATIN_RE = re.compile(r'[A-Za-z]')
+
+_PRICE_KEYWORDS_RE = re.compile(
+    r"\b(price|prices|cost|how much|worth|value|rate)\b|"
+    r"قیمت|چنده|چند\s*(است|هست|تومن|تومان|دلار)|ارزش|نرخ|چقدره|چقدر است"
+)
+# Plain question words: compatible with a price question ("what is the price of BTC?")
+_QUESTION_WORDS_RE = re.compile(
+    r"\b(what is|what's|what are|who|how does|how do|how to)\b|چیست|چیه|چی هست|چطور|چگونه"
+)
+# Words that point at research even when a price word is present
+_RESEARCH_KEYWORDS_RE = re.compile(
+    r"\b(why|explain|news|history|predict|prediction|forecast|should i|will|compare|difference|"
+    r"change|changed|yesterday|last|factors|influence|affect|affects|impact)\b|"
+    r"چرا|توضیح|اخبار|خبر|تاریخچه|پیش‌بینی|پیش بینی|مقایسه|تفاوت|تغییر|دیروز|عوامل|تاثیر|تأثیر"
+)
+# Research words that still apply when a question names a time window ("why did BTC drop in the last hour?")
+_EXPLANATION_KEYWORDS_RE = re.compile(
+    r"\b(why|explain|news|predict|prediction|forecast|should i|will|factors|influence|affect|affects|impact)\b|"
+    r"چرا|توضیح|اخبار|خبر|پیش‌بینی|پیش بینی|عوامل|تاثیر|تأثیر"
+)
+# Change/trend words that make a time window a history question ("how much did ETH change in the last hour?")
+_TREND_KEYWORDS_RE = re.compile(
+    r"\b(change|changed|changes|up|down|rise|rose|risen|fall|fell|fallen|drop|dropped|gain|gained|"
+    r"trend|move|moved|low|lowest|high|highest|average)\b|"
+    r"تغییر|بالا|پایین|افزایش|کاهش|رشد|ریزش|روند|کمترین|بیشترین|میانگین"
+)
+# "... in TMN" / "... به تومان" ending a holdings query ("0.5 BTC + 2 ETH in TMN")
+_TARGET_QUOTE_SUFFIX_RE = re.compile(r"\s*(\b(in|to)\b|به)\s*\w+\s*[?؟.!]*\s*$", re.IGNORECASE)
+
+# How many queries each tier has decided since startup
+_tier_counts = {"rules": 0, "llm": 0, "rules_cold": 0}
+
+metrics.describe("chatbot_classifier_decisions_total", "counter", "Queries classified, by the tier that decided.")
+
+
+def detect_language(text: str) -> tuple[str, float]:
+    """Detects 'fa' vs 'en' from the script of the letters in text. Returns (lang, confidence)."""
+    arabic = len(_ARABIC_SCRIPT_RE.findall(text))
+    latin = len(_LATIN_RE.findall(text))
+    if arabic:
+        # Farsi queries often embed Latin tickers ("قیمت BTC"), so a few Farsi letters decide it
+        return "fa", 1.0 if arabic >= 3 else arabic / (arabic + latin)
+    if latin:
+        return "en", 1.0
+    return "en", 0.0
+
+
+def _coin_letter_share(text: str, matcher) -> float:
+    """Share of the message's letters that belong to coin mentions (a trailing "in TMN" is ignored)."""
+    text = _TARGET_QUOTE_SUFFIX_RE.sub("", text)
+    letters = sum(1 for char in text if char.isalpha())
+    if not letters:
+        return 0.0
+    # Lowercase tickers count here: a message made of them is still just coin names ("eth sol")
+    mentions = matcher.find_all(text, strict=False)
+    mentioned = sum(1 for start, end, _, _ in mentions for char in text[start:end] if char.isalpha())
+    return mentioned / letters
+
+
+def score_intent(text: str) -> tuple[str, float]:
+    """
+    Scores price vs history vs research intent with keyword and COIN_MAP heuristics.
+    Returns (intent, confidence).
+    """
+    text_lower = text.lower()
+    normalized = normalize_text(text)
+    match = pricing_service.get_symbol_matcher().find(normalized) if normalized else None
+
+    has_price_word = bool(_PRICE_KEYWORDS_RE.search(text_lower))
+    has_research_word = bool(_RESEARCH_KEYWORDS_RE.search(text_lower))
+    has_question_word = bool(_QUESTION_WORDS_RE.search(text_lower))
+
+    window = price_history.parse_window(text_lower)
+    if (window and match and window <= price_history.max_window() and _TREND_KEYWORDS_RE.search(text_lower)
+            and not _EXPLANATION_KEYWORDS_RE.search(text_lower)):
+        # A coin, a change word and a recent time window ("ETH change in the last hour"): answered from the local price history
+        return "history", 0.9
+    if has_price_word and match and not has_research_word:
+        return "price", 0.95
+    if has_price_word and not has_research_word and not pricing_service.is_coin_map_ready():
+        # The coin names are still loading at startup; the price path answers "try again shortly"
+        return "price", 0.9
+    if has_price_word and not match:
+        # Without a known coin the price path falls back to research anyway
+        return "research", 0.85
+    if not has_price_word and (has_research_word or has_question_word):
+        return "research", 0.9
+    if match and _coin_letter_share(text, pricing_service.get_symbol_matcher()) >= 0.6:
+        # The message is (almost) just coin names, e.g. "BTC", "اتریوم" or "0.5 BTC + 2 ETH"
+        return "price", 0.8
+    if has_price_word and has_research_word:
+        return "price", 0.5
+    return "research", 0.3
+
+
+def _classify_by_rules(text: str) -> tuple[str, str | None, bool]:
+    """Runs the rule tier. Returns (intent, language, confident)."""
+    lang, lang_confidence = detect_language(text)
+    intent, intent_confidence = score_intent(text)
+    confidence = min(lang_confidence, intent_confidence)
+
+    if confidence >= CLASSIFIER_CONFIDENCE_THRESHOLD:
+        _tier_counts["rules"] += 1
+        logger.info(f"Rule-based classification (Intent: '{intent}', Language: '{lang}', confidence={confidence:.2f}).")
+        return intent, lang, True
+
+    logger.info(f"Rule-based confidence too low ({confidence:.2f}). Falling back to LLM classification.")
+    # Script detection is more reliable than the LLM for language when letters are present
+    return intent, (lang if lang_confidence >= CLASSIFIER_CONFIDENCE_THRESHOLD else None), False
+
+
+def _cold_model_fallback(intent: str, lang: str | None) -> tuple[str, str, str]:
+    """Takes the rules' best guess while the classification model is still loading."""
+    _tier_counts["rules_cold"] += 1
+    logger.info(f"{LLM_MODEL1} is not loaded yet. Using the rule-based guess (Intent: '{intent}').")
+    return intent, lang or "en", "rules_cold"
+
+
+async def classify_query_async(text: str) -> tuple[str, str, str]:
+    """
+    Tiered query classification.
+    1. Script detection for language, keyword + COIN_MAP heuristics for intent
+    2. Falls back to the LLM (gemma2:2b) only when the rules are not confident,
+       and only once that model is loaded (otherwise the rules' guess is used)
+    Returns (intent, language, tier) where tier is 'rules', 'llm' or 'rules_cold'.
+    """
+    intent, lang, confident = _classify_by_rules(text)
+    if confident:
+        return intent, lang, "rules"
+    if not llm_service.is_model_ready(LLM_MODEL1):
+        return _cold_model_fallback(intent, lang)
+
+    llm_intent, llm_lang = await llm_service.decide_query_type_async(text)
+    _tier_counts["llm"] += 1
+    return llm_intent, lang or llm_lang, "llm"
+
+
+def get_classifier_metrics() -> dict:
+    """Returns how many queries each tier decided and the share of LLM calls saved."""
+    total = sum(_tier_counts.values())
+    metrics = dict(_tier_counts)
+    metrics["llm_calls_saved_ratio"] = (_tier_counts["rules"] + _tier_counts["rules_cold"]) / total if total else 0.0
+    return metrics
+
+
+def _collect_metrics():
+    for tier, count in _tier_counts.items():
+        yield "chatbot_classifier_decisions_total", count, {"tier": tier}
+
+
+metrics.register_collector(_collect_metrics)
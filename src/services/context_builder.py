@@ -0,0 +1,122 @@
+import logging
+import math
+import re
+from collections import Counter
+from src.core.config import LLM_MODEL2, SYNTH_CONTEXT_TOKEN_BUDGETS, CONTEXT_PASSAGE_WORDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 1000
+
+# BM25 parameters (the usual defaults)
+_K1 = 1.5
+_B = 0.75
+
+_WORD_RE = re.compile(r'\w+')
+_STOPWORDS = {
+    'the', 'a', 'an', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'is', 'are', 'was', 'were', 'be', 'it',
+    'this', 'that', 'with', 'as', 'by', 'at', 'from', 'what', 'how', 'why', 'do', 'does', 'i', 'you',
+    'و', 'در', 'به', 'از', 'که', 'این', 'را', 'با', 'است', 'برای', 'آن', 'یک', 'هم', 'تا', 'چیست', 'چه',
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (~3.5 characters per token for gemma on mixed en/fa text)."""
+    return int(len(text) / 3.5) + 1
+
+
+def _terms(text: str) -> list[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def split_passages(text: str, max_words: int = CONTEXT_PASSAGE_WORDS) -> list[str]:
+    """Splits page text into passages of at most max_words, merging short paragraphs."""
+    passages = []
+    current: list[str] = []
+    for paragraph in text.split("\n"):
+        words = paragraph.split()
+        while words:
+            room = max_words - len(current)
+            current.extend(words[:room])
+            words = words[room:]
+            if len(current) >= max_words:
+                passages.append(" ".join(current))
+                current = []
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def bm25_scores(query: str, passages: list[str]) -> list[float]:
+    """Scores each passage against the query with Okapi BM25, using the passages themselves as the corpus."""
+    query_terms = set(_terms(query))
+    docs = [_terms(p) for p in passages]
+    if not docs or not query_terms:
+        return [0.0] * len(passages)
+
+    avg_len = sum(len(d) for d in docs) / len(docs) or 1.0
+    doc_freq = Counter(term for d in docs for term in set(d) if term in query_terms)
+    n = len(docs)
+
+    scores = []
+    for doc in docs:
+        tf = Counter(doc)
+        score = 0.0
+        for term in query_terms:
+            f = tf.get(term)
+            if not f:
+                continue
+            idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            score += idf * f * (_K1 + 1) / (f + _K1 * (1 - _B + _B * len(doc) / avg_len))
+        scores.append(score)
+    return scores
+
+
+def build_context(query: str, pages: list[tuple[str, str]], model: str = LLM_MODEL2) -> str:
+    """
+    Packs the passages most relevant to the query into the model's token budget.
+
+    pages is a list of (label, text), e.g. ("Source 1 (Title)", page_text).
+    Every page first gets its best passage (if it fits), the rest of the budget
+    goes to the highest-scoring passages overall. Chosen passages are emitted per
+    page in their original order.
+    """
+    budget = SYNTH_CONTEXT_TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET)
+
+    # (page index, position in page, passage)
+    candidates = [
+        (page_index, position, passage)
+        for page_index, (_, text) in enumerate(pages)
+        for position, passage in enumerate(split_passages(text))
+    ]
+    scores = bm25_scores(query, [c[2] for c in candidates])
+    ranked = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+
+    chosen: set[int] = set()
+    used = sum(estimate_tokens(label) for label, _ in pages)
+
+    def take(i: int) -> bool:
+        nonlocal used
+        cost = estimate_tokens(candidates[i][2])
+        if i in chosen or used + cost > budget:
+            return False
+        chosen.add(i)
+        used += cost
+        return True
+
+    seen_pages = set()
+    for i in ranked:
+        page_index = candidates[i][0]
+        if page_index not in seen_pages and take(i):
+            seen_pages.add(page_index)
+    for i in ranked:
+        take(i)
+
+    sections = []
+    for page_index, (label, _) in enumerate(pages):
+        picked = [candidates[i][2] for i in sorted(chosen) if candidates[i][0] == page_index]
+        if picked:
+            sections.append(f"{label}: " + " … ".join(picked))
+
+    logger.info(f"Packed {len(chosen)}/{len(candidates)} passages into ~{used}/{budget} tokens for {model}.")
+    return "\n\n".join(sections)
@@ -0,0 +1,152 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import weakref
+from contextlib import asynccontextmanager
+from src.core import metrics
+from src.core.config import LLM_MAX_CONCURRENCY, LLM_MODEL_CONCURRENCY, LLM_PRIORITY_RESERVED_SLOTS, LLM_MAX_QUEUE
+
+logger = logging.getLogger(__name__)
+
+# Admission control in front of the single Ollama instance. Every LLM call takes
+# a slot first. A slot needs room under both the model's own limit and the
+# global limit. Priority work (classification) is dispatched first and may use
+# the LLM_PRIORITY_RESERVED_SLOTS that research work (embeddings, synthesis)
+# never takes, so a burst of long gemma2:9b generations cannot hold up price
+# lookups. At most LLM_MAX_QUEUE normal-priority calls wait; any more are
+# rejected straight away with LLMBusyError instead of timing out.
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+metrics.describe("chatbot_llm_queue_wait_seconds", "histogram", "Time LLM calls waited for a scheduler slot.")
+metrics.describe("chatbot_llm_shed_total", "counter", "LLM calls rejected because the queue was full.")
+metrics.describe("chatbot_llm_active", "gauge", "LLM calls holding a scheduler slot, by model.")
+metrics.describe("chatbot_llm_waiting", "gauge", "LLM calls queued for a scheduler slot.")
+
+
+class LLMBusyError(Exception):
+    """Raised when the LLM queue is full and the call is shed."""
+
+
+class _Scheduler:
+    """Slot bookkeeping for one event loop."""
+
+    def __init__(self):
+        self.active: dict[str, int] = {}
+        self.total = 0
+        self.waiting: list = []  # heap of [priority, seq, model, future]
+        self.queued_normal = 0
+        self.shed = 0
+        self._seq = itertools.count()
+
+    def _can_run(self, model: str, priority: int) -> bool:
+        if self.active.get(model, 0) >= LLM_MODEL_CONCURRENCY.get(model, 1):
+            return False
+        reserved = 0 if priority == PRIORITY_HIGH else LLM_PRIORITY_RESERVED_SLOTS
+        return LLM_MAX_CONCURRENCY - self.total > reserved
+
+    def _start(self, model: str):
+        self.active[model] = self.active.get(model, 0) + 1
+        self.total += 1
+
+    def _release(self, model: str):
+        self.active[model] -= 1
+        self.total -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grants slots to waiters in priority order; a waiter blocked on its model does not hold up other models."""
+        still_waiting = []
+        while self.waiting:
+            entry = heapq.heappop(self.waiting)
+            priority, _, model, future = entry
+            if future.done():  # cancelled while waiting
+                continue
+            if self._can_run(model, priority):
+                self._start(model)
+                if priority == PRIORITY_NORMAL:
+                    self.queued_normal -= 1
+                future.set_result(None)
+            else:
+                still_waiting.append(entry)
+        for entry in still_waiting:
+            heapq.heappush(self.waiting, entry)
+
+    async def acquire(self, model: str, priority: int):
+        if self._can_run(model, priority):
+            self._start(model)
+            return
+
+        if priority == PRIORITY_NORMAL:
+            if self.queued_normal >= LLM_MAX_QUEUE:
+                self.shed += 1
+                metrics.increment("chatbot_llm_shed_total", model=model)
+                raise LLMBusyError(f"LLM queue is full ({LLM_MAX_QUEUE} waiting)")
+            self.queued_normal += 1
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiting, [priority, next(self._seq), model, future])
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(model)  # granted just as we were cancelled
+            elif priority == PRIORITY_NORMAL:
+                self.queued_normal -= 1
+            raise
+
+
+_schedulers: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _get_scheduler() -> _Scheduler:
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = _schedulers[loop] = _Scheduler()
+    return scheduler
+
+
+@asynccontextmanager
+async def llm_slot(model: str, priority: int = PRIORITY_NORMAL):
+    """Holds a slot for one call to `model` for the duration of the block. Raises LLMBusyError if shed."""
+    scheduler = _get_scheduler()
+    started = time.monotonic()
+    await scheduler.acquire(model, priority)
+    metrics.observe("chatbot_llm_queue_wait_seconds", time.monotonic() - started, model=model)
+    try:
+        yield
+    finally:
+        scheduler._release(model)
+
+
+def get_scheduler_stats() -> dict:
+    """Returns slots in use per model, waiting calls and shed calls for the current event loop."""
+    scheduler = _get_scheduler()
+    return {
+        "active": dict(scheduler.active),
+        "active_total": scheduler.total,
+        "waiting": sum(1 for entry in scheduler.waiting if not entry[3].done()),
+        "waiting_normal": scheduler.queued_normal,
+        "shed": scheduler.shed,
+    }
+
+
+def _collect_metrics():
+    # Rendered from the metrics server's thread, so read every loop's scheduler
+    # instead of get_scheduler_stats(), which needs a running loop
+    active: dict[str, int] = {}
+    waiting = 0
+    for scheduler in list(_schedulers.values()):
+        for model, count in list(scheduler.active.items()):
+            active[model] = active.get(model, 0) + count
+        waiting += sum(1 for entry in list(scheduler.waiting) if not entry[3].done())
+    for model, count in active.items():
+        yield "chatbot_llm_active", count, {"model": model}
+    yield "chatbot_llm_waiting", waiting, {}
+
+
+metrics.register_collector(_collect_metrics)
@@ -1,94 +1,431 @@
+import asyncio
+import hashlib
 import logging
 import json
+import threading
+import time
+import weakref
 import ollama
-from src.core.config import OLLAMA_HOST, LLM_MODEL1, LLM_MODEL2
+from src.core import http_client, metrics, readiness
+from src.core.config import (
+    OLLAMA_HOST, LLM_MODEL1, LLM_MODEL2, EMBEDDING_MODEL, HTTP_POOLS,
+    LLM_KEEP_ALIVE, LLM_MODEL_CHECK_INTERVAL, LLM_SYNTH_FALLBACK_MODEL, OLLAMA_HEALTH_RETRY_INTERVAL,
+    CLASSIFICATION_NUM_PREDICT, CLASSIFICATION_BATCH_WINDOW, CLASSIFICATION_MAX_BATCH
+)
+from src.services.llm_scheduler import llm_slot, LLMBusyError, PRIORITY_HIGH, PRIORITY_NORMAL
+from src.utils.singleflight import AsyncSingleFlight
 from src.utils.templates import get_template
 
 logger = logging.getLogger(__name__)
 
 # --- Client Initialization ---
 
-def get_ollama_client():
-    """Initializes and returns the Ollama client."""
+def _ollama_client_options() -> dict:
+    """httpx options for the Ollama clients, taken from the 'ollama' connection pool settings."""
+    return {"timeout": HTTP_POOLS["ollama"]["timeout"], "limits": http_client.get_httpx_limits("ollama")}
+
+
+# Nothing here talks to Ollama at import time. The synchronous client is created on
+# first use, and reachability is learned from the model manager's periodic checks.
+
+_ollama_client: ollama.Client | None = None
+_ollama_client_lock = threading.Lock()
+_ollama_available: bool | None = None  # None until the first health check
+
+
+def get_ollama_client() -> ollama.Client:
+    """Returns the shared synchronous Ollama client, creating it on first use (no network I/O)."""
+    global _ollama_client
+
+    if _ollama_client is None:
+        with _ollama_client_lock:
+            if _ollama_client is None:
+                _ollama_client = ollama.Client(host=OLLAMA_HOST, **_ollama_client_options())
+    return _ollama_client
+
+
+def check_ollama() -> bool:
+    """Asks Ollama for its models and records whether it answered. Returns the new state."""
+    global _ollama_available
+
     try:
-        client = ollama.Client(host=OLLAMA_HOST)
-        client.list()
+        get_ollama_client().list()
+        available = True
+    except Exception as e:
+        available = False
+        if _ollama_available is not False:
+            logger.error(f"Failed to connect to Ollama at {OLLAMA_HOST}. Is it running? Error: {e}")
+
+    if available and _ollama_available is not True:
         logger.info(f"Successfully connected to Ollama at {OLLAMA_HOST}")
-        return client
+    _ollama_available = available
+    return available
+
+
+def is_ollama_available() -> bool:
+    """False only after a health check failed; before the first check, callers simply try."""
+    return _ollama_available is not False
+
+
+# Price lookups work without Ollama, so it does not hold up readiness
+readiness.register("ollama", lambda: _ollama_available is True, required=False)
+
+
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_async_ollama_client() -> ollama.AsyncClient:
+    """Returns an ollama.AsyncClient bound to the current event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = ollama.AsyncClient(host=OLLAMA_HOST, **_ollama_client_options())
+        _async_clients[loop] = client
+    return client
+
+# --- Model Lifecycle ---
+
+# Preloads every model at boot, keeps them resident with keep_alive plus a
+# periodic ping, and tracks which ones are warm. Until a model is warm, callers
+# route around it (rule-based classification, a smaller synthesis model).
+
+_MANAGED_MODELS = (LLM_MODEL1, EMBEDDING_MODEL, LLM_MODEL2)  # Load order: cheapest / most urgent first
+
+_model_status = {
+    model: {"ready": False, "loads": 0, "last_load_seconds": None, "last_checked": None, "failures": 0}
+    for model in _MANAGED_MODELS
+}
+_model_manager_thread: threading.Thread | None = None
+_model_manager_stop = threading.Event()
+
+metrics.describe("chatbot_model_ready", "gauge", "1 while the model is loaded in Ollama.")
+metrics.describe("chatbot_model_load_seconds", "histogram", "Time Ollama took to load a model into memory.")
+
+
+def _keep_alive(model: str):
+    return LLM_KEEP_ALIVE.get(model)
+
+
+def _full_model_name(model: str) -> str:
+    return model if ":" in model else f"{model}:latest"
+
+
+def _set_ready(model: str, ready: bool):
+    _model_status[model]["ready"] = ready
+    metrics.set_gauge("chatbot_model_ready", 1 if ready else 0, model=model)
+    if ready:
+        readiness.milestone(f"model_ready:{model}")
+
+
+def _loaded_models() -> set[str] | None:
+    """Names of the models Ollama currently holds in memory, or None if it cannot be asked."""
+    try:
+        return {_full_model_name(m.model or m.name) for m in get_ollama_client().ps().models}
     except Exception as e:
-        logger.error(f"Failed to connect to Ollama at {OLLAMA_HOST}. Is it running? Error: {e}")
+        logger.warning(f"Could not list loaded Ollama models: {e}")
         return None
 
-ollama_client = get_ollama_client()
 
-# --- Service Functions ---
+def _warm_model(model: str, loaded: set[str] | None):
+    """Loads a model (timing the load) or, if it is already loaded, pings it to renew its keep_alive."""
+    status = _model_status[model]
+    was_loaded = loaded is not None and _full_model_name(model) in loaded
+    if status["ready"] and loaded is not None and not was_loaded:
+        logger.warning(f"Model {model} was evicted by Ollama. Reloading.")
+        _set_ready(model, False)
 
-def decide_query_type(text: str) -> tuple[str, str]:
-    """Classifies query intent ('price'/'research') and language ('en'/'fa')."""
-    if not ollama_client:
-        logger.error("Ollama client not initialized. Falling back to ('research', 'en').")
-        return "research", "en"
+    started = time.monotonic()
+    try:
+        # An empty prompt (or a tiny embedding) loads the model without generating anything
+        if model == EMBEDDING_MODEL:
+            get_ollama_client().embed(model=model, input="warm-up", keep_alive=_keep_alive(model))
+        else:
+            get_ollama_client().generate(model=model, prompt="", keep_alive=_keep_alive(model))
+    except Exception as e:
+        status["failures"] += 1
+        _set_ready(model, False)
+        logger.error(f"Could not load model {model}: {e}")
+        return
+    seconds = time.monotonic() - started
 
-    logger.info("Using LLM to classify query type and language.")
+    status["last_checked"] = time.time()
+    if not was_loaded:
+        status["loads"] += 1
+        status["last_load_seconds"] = seconds
+        metrics.observe("chatbot_model_load_seconds", seconds, model=model)
+        logger.info(f"Model {model} loaded in {seconds:.1f}s (keep_alive={_keep_alive(model)}).")
+    _set_ready(model, True)
+
+
+def _manage_models(interval: float):
+    logger.info(f"Ollama model manager started for {', '.join(_MANAGED_MODELS)} (check interval={interval}s).")
+    wait = 0
+    while not _model_manager_stop.wait(wait):
+        # The model check doubles as the Ollama health check; while it is down, check more often
+        if not check_ollama():
+            for model in _MANAGED_MODELS:
+                _set_ready(model, False)
+            wait = min(interval, OLLAMA_HEALTH_RETRY_INTERVAL)
+            continue
+
+        wait = interval
+        loaded = _loaded_models()
+        for model in _MANAGED_MODELS:
+            if _model_manager_stop.is_set():
+                break
+            _warm_model(model, loaded)
+    logger.info("Ollama model manager stopped.")
 
-    prompt = f"""
-    Analyze the user query below. Classify its intent ('price' or 'research') AND identify its primary language ('en' for English, 'fa' for Farsi, or 'other').
 
-    'price': Use this if the user is explicitly asking for the current market value, cost, or price of a specific cryptocurrency (e.g., "how much is BTC?", "قیمت اتریوم؟").
-    'research': Use this for all other questions, including general crypto questions, news, historical data, or definitions (e.g., "what is Solana?", "NFT چیست؟").
+def start_model_manager(interval: float = LLM_MODEL_CHECK_INTERVAL):
+    """Starts the thread that preloads the models and keeps them warm (idempotent)."""
+    global _model_manager_thread
 
-    Your response MUST be a single, valid JSON object in the format:
-    {{"intent": "...", "language": "..."}}
+    if _model_manager_thread and _model_manager_thread.is_alive():
+        return
+    _model_manager_stop.clear()
+    _model_manager_thread = threading.Thread(target=_manage_models, args=(interval,), name="ollama-models", daemon=True)
+    _model_manager_thread.start()
 
-    User Query: "{text}"
 
-    Response:
+def stop_model_manager():
+    """Signals the model manager thread to stop."""
+    _model_manager_stop.set()
+
+
+def is_model_ready(model: str) -> bool:
     """
+    True if the model is loaded in Ollama. Readiness is only tracked while the
+    model manager runs; without it (scripts, benchmarks) every model counts as ready.
+    """
+    if _model_manager_thread is None or model not in _model_status:
+        return True
+    return _model_status[model]["ready"]
 
-    try:
-        response = ollama_client.generate(
-            model=LLM_MODEL1,
-            prompt=prompt,
-            format="json",
-            options={"temperature": 0.0}
-        )
-
-        raw_response = response.get("response", "{}").strip()
-        data = json.loads(raw_response)
 
-        intent = data.get("intent", "research").lower()
-        language = data.get("language", "en").lower()
+def get_model_status() -> dict:
+    """Returns readiness, load count, last load time and failures per managed model."""
+    return {model: dict(status) for model, status in _model_status.items()}
+
+
+for _model in _MANAGED_MODELS:
+    readiness.register(f"model:{_model}", lambda model=_model: _model_status[model]["ready"], required=False)
+
+
+def _synthesis_model() -> str:
+    """LLM_MODEL2, or the fallback model while LLM_MODEL2 is cold and the fallback is warm."""
+    if is_model_ready(LLM_MODEL2) or not LLM_SYNTH_FALLBACK_MODEL or not is_model_ready(LLM_SYNTH_FALLBACK_MODEL):
+        return LLM_MODEL2
+    logger.info(f"{LLM_MODEL2} is not loaded yet. Synthesizing with {LLM_SYNTH_FALLBACK_MODEL}.")
+    return LLM_SYNTH_FALLBACK_MODEL
+
+
+# --- Classification Batching ---
+
+class _ClassificationBatcher:
+    """Collects the messages one event loop submits within CLASSIFICATION_BATCH_WINDOW into one LLM call."""
+
+    def __init__(self):
+        self.pending: list[tuple[str, asyncio.Future]] = []
+        self.timer: asyncio.TimerHandle | None = None
+        self.tasks: set[asyncio.Task] = set()
+
+    def submit(self, text: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((text, future))
+        if len(self.pending) >= CLASSIFICATION_MAX_BATCH:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(CLASSIFICATION_BATCH_WINDOW, self.flush)
+        return future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch = [(text, future) for text, future in self.pending if not future.done()]  # skip cancelled callers
+        self.pending = []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]):
+        try:
+            results = await _classify_batch_async([text for text, _ in batch])
+        except BaseException:
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+            raise
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+_classification_batchers: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _get_classification_batcher() -> _ClassificationBatcher:
+    loop = asyncio.get_running_loop()
+    batcher = _classification_batchers.get(loop)
+    if batcher is None:
+        batcher = _classification_batchers[loop] = _ClassificationBatcher()
+    return batcher
+
+
+# Token counts as reported by Ollama: prompt_eval_count (in) and eval_count (out)
+_classification_stats = {"calls": 0, "messages": 0, "tokens_in": 0, "tokens_out": 0, "seconds": 0.0}
+_classification_stats_lock = threading.Lock()
+
+metrics.describe("chatbot_classification_seconds", "histogram", "Latency of LLM classification calls, by mode (single or batch).")
+metrics.describe("chatbot_classification_messages_total", "counter", "Messages classified by the LLM, by mode.")
+metrics.describe("chatbot_classification_tokens_total", "counter", "Classification tokens evaluated (in) and generated (out).")
+
+
+def _record_classification(response, seconds: float, size: int):
+    tokens_in = response.get("prompt_eval_count") or 0
+    tokens_out = response.get("eval_count") or 0
+    mode = "batch" if size > 1 else "single"
+    with _classification_stats_lock:
+        _classification_stats["calls"] += 1
+        _classification_stats["messages"] += size
+        _classification_stats["tokens_in"] += tokens_in
+        _classification_stats["tokens_out"] += tokens_out
+        _classification_stats["seconds"] += seconds
+    metrics.observe("chatbot_classification_seconds", seconds, mode=mode)
+    metrics.increment("chatbot_classification_messages_total", size, mode=mode)
+    metrics.increment("chatbot_classification_tokens_total", tokens_in, direction="in")
+    metrics.increment("chatbot_classification_tokens_total", tokens_out, direction="out")
+    logger.info(f"Classified {size} message(s) in {seconds:.2f}s ({tokens_in} tokens in, {tokens_out} out).")
+
+
+def get_classification_stats() -> dict:
+    """Returns LLM classification calls and messages, with tokens in/out and seconds per message."""
+    with _classification_stats_lock:
+        stats = dict(_classification_stats)
+    messages = stats["messages"] or 1
+    stats["tokens_in_per_message"] = stats["tokens_in"] / messages
+    stats["tokens_out_per_message"] = stats["tokens_out"] / messages
+    stats["seconds_per_message"] = stats["seconds"] / messages
+    return stats
+
+
+# --- Synthesis Coalescing ---
+
+# Identical concurrent syntheses (same query, language and context) share one generation
+_synthesis_flight_async = AsyncSingleFlight("synthesis_async")
 
-        if intent not in ["price", "research"]:
-            logger.warning(f"LLM returned invalid intent: '{intent}'. Defaulting to 'research'.")
-            intent = "research"
+# Streaming callbacks of every caller waiting on an in-flight async synthesis, and
+# the answer streamed so far, so callers that join late start from the current text.
+_synthesis_listeners: dict[tuple, list] = {}
+_synthesis_partials: dict[tuple, str] = {}
 
-        if language not in ["en", "fa"]:
-            logger.warning(f"LLM returned unsupported language: '{language}'. Defaulting to 'en'.")
-            language = "en"
 
-        logger.info(f"LLM classified query as (Intent: '{intent}', Language: '{language}').")
-        return intent, language
+def _synthesis_key(query: str, context: str, lang: str) -> tuple[str, str, str]:
+    return lang, " ".join(query.lower().split()), hashlib.sha256(context.encode('utf-8')).hexdigest()
 
+
+async def _broadcast_partial(key: tuple, answer: str):
+    _synthesis_partials[key] = answer
+    listeners = list(_synthesis_listeners.get(key, ()))
+    results = await asyncio.gather(*(listener(answer) for listener in listeners), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Streaming synthesis listener failed: {result}")
+
+# --- Prompt Building / Parsing ---
+
+# Every classification prompt starts with this fixed text, so Ollama can reuse the
+# already evaluated prefix (its KV cache) and only evaluate the messages themselves.
+_CLASSIFICATION_PREFIX = (
+    "Classify crypto chatbot messages.\n"
+    'intent: "price" if the message asks the current price or value of a coin, otherwise "research".\n'
+    'language: "fa" for Farsi, otherwise "en".\n'
+)
+
+# Constrains the output to exactly the two fields and their allowed values
+_CLASSIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "enum": ["price", "research"]},
+        "language": {"type": "string", "enum": ["en", "fa"]},
+    },
+    "required": ["intent", "language"],
+}
+
+
+def _batch_classification_schema(size: int) -> dict:
+    return {
+        "type": "object",
+        "properties": {
+            "results": {"type": "array", "items": _CLASSIFICATION_SCHEMA, "minItems": size, "maxItems": size},
+        },
+        "required": ["results"],
+    }
+
+
+def _classification_options(size: int) -> dict:
+    return {"temperature": 0.0, "num_predict": CLASSIFICATION_NUM_PREDICT * size}
+
+
+def _quote_message(text: str) -> str:
+    # JSON quoting keeps a message on one line and stops it from posing as another one
+    return json.dumps(" ".join(text.split()), ensure_ascii=False)
+
+
+def _build_classification_prompt(text: str) -> str:
+    return f"{_CLASSIFICATION_PREFIX}\nMessage: {_quote_message(text)}"
+
+
+def _build_batch_classification_prompt(texts: list[str]) -> str:
+    messages = "\n".join(f"{i + 1}. {_quote_message(text)}" for i, text in enumerate(texts))
+    return f"{_CLASSIFICATION_PREFIX}\nReturn one result per message, in order.\nMessages:\n{messages}"
+
+
+def _validate_classification(data: dict) -> tuple[str, str]:
+    intent = str(data.get("intent", "research")).lower()
+    language = str(data.get("language", "en")).lower()
+
+    if intent not in ["price", "research"]:
+        logger.warning(f"LLM returned invalid intent: '{intent}'. Defaulting to 'research'.")
+        intent = "research"
+
+    if language not in ["en", "fa"]:
+        logger.warning(f"LLM returned unsupported language: '{language}'. Defaulting to 'en'.")
+        language = "en"
+
+    logger.info(f"LLM classified query as (Intent: '{intent}', Language: '{language}').")
+    return intent, language
+
+
+def _parse_classification(response) -> tuple[str, str]:
+    raw_response = response.get("response", "{}").strip()
+    try:
+        data = json.loads(raw_response)
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse LLM JSON response: {raw_response}. Error: {e}. Defaulting to ('research', 'en').")
         return "research", "en"
-    except Exception as e:
-        logger.error(f"Error calling Ollama for classification: {e}. DefaultTing to ('research', 'en').")
-        return "research", "en"
+    return _validate_classification(data if isinstance(data, dict) else {})
 
 
-def synthesize_answer(query: str, context: str, lang: str = 'en') -> str | None:
-    """Generates an answer based on search context using an LLM."""
-    t = get_template(lang)
-
-    if not ollama_client:
-        logger.error("Ollama client not initialized. Cannot synthesize answer.")
-        return t['synth_service_unavailable']
+def _parse_batch_classification(response, size: int) -> list[tuple[str, str]] | None:
+    """Returns one (intent, language) per message, or None if the answer does not hold exactly `size` results."""
+    raw_response = response.get("response", "{}").strip()
+    try:
+        results = json.loads(raw_response).get("results")
+    except (json.JSONDecodeError, AttributeError) as e:
+        logger.error(f"Failed to parse batched LLM JSON response: {raw_response}. Error: {e}.")
+        return None
+    if not isinstance(results, list) or len(results) != size:
+        logger.error(f"Batched LLM classification returned {raw_response} for {size} messages.")
+        return None
+    return [_validate_classification(result if isinstance(result, dict) else {}) for result in results]
 
-    logger.info(f"Synthesizing answer with LLM in language: {lang}")
 
-    prompt = f"""
+def _build_synthesis_prompt(query: str, context: str, t: dict) -> str:
+    return f"""
     {t['synth_prompt']}
 
     Search Results:
@@ -99,10 +436,149 @@ def synthesize_answer(query: str, context: str, lang: str = 'en') -> str | None:
 
     Answer:
     """
+
+# --- Service Functions ---
+
+async def decide_query_type_async(text: str) -> tuple[str, str]:
+    """
+    Classifies query intent ('price'/'research') and language ('en'/'fa'). Messages arriving
+    within CLASSIFICATION_BATCH_WINDOW of each other are classified in one LLM call.
+    """
+    if not is_ollama_available():
+        logger.error("Ollama is unreachable. Falling back to ('research', 'en').")
+        return "research", "en"
+
+    logger.info("Using LLM to classify query type and language.")
+
+    if CLASSIFICATION_BATCH_WINDOW <= 0:
+        return await _classify_one_async(text)
+    return await _get_classification_batcher().submit(text)
+
+
+async def _classify_one_async(text: str) -> tuple[str, str]:
+    try:
+        # Classification sits on the path of price lookups, so it takes the priority lane
+        async with llm_slot(LLM_MODEL1, PRIORITY_HIGH):
+            started = time.monotonic()
+            response = await get_async_ollama_client().generate(
+                model=LLM_MODEL1,
+                prompt=_build_classification_prompt(text),
+                format=_CLASSIFICATION_SCHEMA,
+                options=_classification_options(1),
+                keep_alive=_keep_alive(LLM_MODEL1)
+            )
+        _record_classification(response, time.monotonic() - started, 1)
+        return _parse_classification(response)
+    except Exception as e:
+        logger.error(f"Error calling Ollama for classification: {e}. Defaulting to ('research', 'en').")
+        return "research", "en"
+
+
+async def _classify_batch_async(texts: list[str]) -> list[tuple[str, str]]:
+    """Classifies several messages with one call, falling back to one call each if the answer is malformed."""
+    if len(texts) == 1:
+        return [await _classify_one_async(texts[0])]
+
     try:
-        response = ollama_client.generate(model=LLM_MODEL2, prompt=prompt)
-        logger.info("LLM synthesis successful.")
-        return response.get("response")
+        async with llm_slot(LLM_MODEL1, PRIORITY_HIGH):
+            started = time.monotonic()
+            response = await get_async_ollama_client().generate(
+                model=LLM_MODEL1,
+                prompt=_build_batch_classification_prompt(texts),
+                format=_batch_classification_schema(len(texts)),
+                options=_classification_options(len(texts)),
+                keep_alive=_keep_alive(LLM_MODEL1)
+            )
+        _record_classification(response, time.monotonic() - started, len(texts))
+    except Exception as e:
+        logger.error(f"Error calling Ollama for batched classification: {e}. Defaulting to ('research', 'en').")
+        return [("research", "en")] * len(texts)
+
+    results = _parse_batch_classification(response, len(texts))
+    if results is None:
+        logger.warning(f"Classifying the {len(texts)} batched messages one by one.")
+        results = await asyncio.gather(*(_classify_one_async(text) for text in texts))
+    return list(results)
+
+
+async def synthesize_answer_async(query: str, context: str, lang: str = 'en',
+                                  on_partial=None) -> tuple[str | None, str | None]:
+    """
+    Generates an answer based on search context using an LLM.
+    Returns (answer, model): model is the one that wrote it (LLM_SYNTH_FALLBACK_MODEL
+    while LLM_MODEL2 is cold), or None when the answer is an error message.
+    If on_partial is given, the answer is streamed and `await on_partial(text_so_far)`
+    is called as tokens arrive; the full answer is still returned at the end.
+    Concurrent identical requests share one generation, and every caller's
+    on_partial receives its stream.
+    Raises LLMBusyError if the scheduler's queue is full.
+    """
+    key = _synthesis_key(query, context, lang)
+    if on_partial is not None:
+        _synthesis_listeners.setdefault(key, []).append(on_partial)
+        if key in _synthesis_partials:
+            await on_partial(_synthesis_partials[key])
+
+    try:
+        return await _synthesis_flight_async.do(key, lambda: _synthesize_answer_async(query, context, lang, key))
+    finally:
+        if on_partial is not None:
+            listeners = _synthesis_listeners.get(key, [])
+            if on_partial in listeners:
+                listeners.remove(on_partial)
+            if not listeners:
+                _synthesis_listeners.pop(key, None)
+
+
+async def _synthesize_answer_async(query: str, context: str, lang: str, key: tuple) -> tuple[str | None, str | None]:
+    t = get_template(lang)
+
+    if not is_ollama_available():
+        logger.error("Ollama is unreachable. Cannot synthesize answer.")
+        return t['synth_service_unavailable'], None
+
+    logger.info(f"Synthesizing answer with LLM in language: {lang}")
+
+    try:
+        prompt = _build_synthesis_prompt(query, context, t)
+        model = _synthesis_model()
+        async with llm_slot(model, PRIORITY_NORMAL):
+            client = get_async_ollama_client()
+            if not _synthesis_listeners.get(key):
+                response = await client.generate(model=model, prompt=prompt, keep_alive=_keep_alive(model))
+                logger.info("LLM synthesis successful.")
+                return response.get("response"), model
+
+            answer = ""
+            async for chunk in await client.generate(model=model, prompt=prompt, stream=True,
+                                                     keep_alive=_keep_alive(model)):
+                token = chunk.get("response") or ""
+                if token:
+                    answer += token
+                    await _broadcast_partial(key, answer)
+        logger.info("LLM streaming synthesis successful.")
+        return answer, model
+    except LLMBusyError:
+        logger.warning("LLM queue is full. Shedding synthesis request.")
+        raise
     except Exception as e:
         logger.error(f"Error calling Ollama: {e}")
-        return t['synth_api_error']
\ No newline at end of file
+        return t['synth_api_error'], None
+    finally:
+        _synthesis_partials.pop(key, None)
+
+
+async def embed_text_async(text: str) -> list[float] | None:
+    """Returns the embedding of text from the local embedding model, or None if unavailable."""
+    if not is_ollama_available():
+        return None
+
+    try:
+        # Embeddings only serve the research path's answer cache, so they queue with synthesis
+        async with llm_slot(EMBEDDING_MODEL, PRIORITY_NORMAL):
+            response = await get_async_ollama_client().embed(model=EMBEDDING_MODEL, input=text,
+                                                             keep_alive=_keep_alive(EMBEDDING_MODEL))
+        return response.get("embeddings", [None])[0]
+    except Exception as e:
+        logger.error(f"Error calling Ollama for embedding: {e}")
+        return None
\ No newline at end of file
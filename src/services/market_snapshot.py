@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import threading
+import time
+import httpx
+import requests
+from datetime import datetime
+from src.core import http_client, metrics, tracing
+from src.core.config import WALLEX_API_URL, WALLEX_REFRESH_INTERVAL, WALLEX_MAX_STALENESS
+from src.utils.singleflight import SingleFlight, AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class MarketSnapshot:
+    """An indexed view of one Wallex /markets download."""
+
+    def __init__(self, markets: list[dict], etag: str | None = None, last_modified: str | None = None):
+        self.markets = markets
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.monotonic()
+        self.fetched_wall = datetime.now()
+        self.by_base = self._build_index(markets)
+
+    @staticmethod
+    def _build_index(markets: list[dict]) -> dict[str, list[dict]]:
+        """Indexes markets as base asset (lowercase) -> list of quote markets, TMN and USDT first."""
+        index: dict[str, list[dict]] = {}
+        for market_data in markets:
+            base_asset = (market_data.get("base_asset") or "").lower()
+            last_price = market_data.get("price")
+            market_symbol = market_data.get("symbol")
+            quote_asset = market_data.get("quote_asset")
+
+            if base_asset and last_price and market_symbol and quote_asset:
+                index.setdefault(base_asset, []).append({
+                    "symbol": market_symbol,
+                    "price": last_price,
+                    "quote": quote_asset
+                })
+
+        for quotes in index.values():
+            quotes.sort(key=lambda x: (x['quote'] != 'TMN', x['quote'] != 'USDT', x['quote']))
+        return index
+
+    def age(self) -> float:
+        """Seconds since this snapshot was last confirmed against Wallex."""
+        return time.monotonic() - self.fetched_at
+
+    def touch(self):
+        """Marks the snapshot as fresh again (used after a 304 Not Modified)."""
+        self.fetched_at = time.monotonic()
+        self.fetched_wall = datetime.now()
+
+
+# The current snapshot. Replaced wholesale on every successful refresh, so readers
+# never see a half-built index.
+_snapshot: MarketSnapshot | None = None
+_refresh_lock = threading.Lock()
+_refresher_thread: threading.Thread | None = None
+_stop_event = threading.Event()
+_listeners = []
+
+# A stale snapshot is refreshed inline by whoever reads it first; everyone else
+# reading it meanwhile waits for that same download instead of starting their own.
+_refresh_flight = SingleFlight("wallex_refresh")
+_refresh_flight_async = AsyncSingleFlight("wallex_refresh_async")
+
+_metrics = {
+    "refresh_count": 0,
+    "refresh_failures": 0,
+    "not_modified_count": 0,
+    "stale_reads": 0,
+    "last_refresh_duration": 0.0,
+}
+
+metrics.describe("chatbot_snapshot_refreshes_total", "counter", "Wallex refreshes, by result (updated, not_modified, failed).")
+metrics.describe("chatbot_snapshot_stale_reads_total", "counter", "Reads that found the snapshot older than WALLEX_MAX_STALENESS.")
+metrics.describe("chatbot_snapshot_age_seconds", "gauge", "Age of the current market snapshot.")
+metrics.describe("chatbot_snapshot_markets", "gauge", "Markets in the current snapshot.")
+metrics.describe("chatbot_snapshot_refresh_seconds", "gauge", "Duration of the last Wallex refresh.")
+
+
+def add_refresh_listener(callback):
+    """Registers callback(snapshot), called whenever a refresh yields new market data."""
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def _conditional_headers(current: MarketSnapshot | None) -> dict:
+    headers = {}
+    if current and current.etag:
+        headers['If-None-Match'] = current.etag
+    if current and current.last_modified:
+        headers['If-Modified-Since'] = current.last_modified
+    return headers
+
+
+def _install_response(current: MarketSnapshot | None, status_code: int, headers, load_json) -> MarketSnapshot | None:
+    """
+    Turns a Wallex response into the current snapshot.
+    Returns the new snapshot, or None if Wallex answered 304 Not Modified.
+    """
+    global _snapshot
+
+    if status_code == 304 and current:
+        current.touch()
+        _metrics["not_modified_count"] += 1
+        logger.debug("Wallex markets not modified since last refresh.")
+        return None
+
+    data = load_json()
+    markets = data.get("result", {}).get("markets", [])
+    if not isinstance(markets, list):
+        logger.error(f"Wallex API 'markets' is not a list as expected. Type: {type(markets)}")
+        markets = []
+
+    new_snapshot = MarketSnapshot(
+        markets,
+        etag=headers.get('ETag'),
+        last_modified=headers.get('Last-Modified')
+    )
+    _snapshot = new_snapshot
+    _metrics["refresh_count"] += 1
+    logger.info(f"Market snapshot refreshed: {len(new_snapshot.markets)} markets, "
+                f"{len(new_snapshot.by_base)} base assets.")
+    return new_snapshot
+
+
+def _notify_listeners(new_snapshot: MarketSnapshot):
+    for callback in list(_listeners):
+        try:
+            callback(new_snapshot)
+        except Exception as e:
+            logger.error(f"Market snapshot listener {callback!r} failed: {e}")
+
+
+def refresh_snapshot() -> bool:
+    """
+    Downloads the Wallex markets payload (conditionally, when we hold an ETag or
+    Last-Modified value) and swaps in a freshly indexed snapshot.
+    Concurrent callers share one download.
+    Returns True if we hold a fresh snapshot afterwards.
+    """
+    return _refresh_flight.do("markets", _refresh_snapshot)
+
+
+def _refresh_snapshot() -> bool:
+    with _refresh_lock:
+        current = _snapshot
+        started = time.monotonic()
+        try:
+            with tracing.span("wallex_refresh"):
+                response = http_client.get(WALLEX_API_URL, pool="wallex", headers=_conditional_headers(current))
+            response.raise_for_status()
+            new_snapshot = _install_response(current, response.status_code, response.headers, response.json)
+        except requests.exceptions.RequestException as e:
+            _metrics["refresh_failures"] += 1
+            logger.error(f"Failed to refresh market snapshot from Wallex API: {e}")
+            return False
+        except Exception as e:
+            _metrics["refresh_failures"] += 1
+            logger.error(f"Error processing Wallex response for market snapshot: {e}")
+            return False
+        finally:
+            _metrics["last_refresh_duration"] = time.monotonic() - started
+
+    if new_snapshot:
+        _notify_listeners(new_snapshot)
+    return True
+
+
+async def refresh_snapshot_async() -> bool:
+    """Async counterpart of refresh_snapshot(), for use on the bot's event loop."""
+    return await _refresh_flight_async.do("markets", _refresh_snapshot_async)
+
+
+async def _refresh_snapshot_async() -> bool:
+    current = _snapshot
+    started = time.monotonic()
+    try:
+        with tracing.span("wallex_refresh"):
+            response = await http_client.get_async(WALLEX_API_URL, pool="wallex", headers=_conditional_headers(current))
+        if response.status_code != 304:
+            # httpx also raises on 3xx, so Not Modified is let through to _install_response first
+            response.raise_for_status()
+        # Installed under the background refresher's lock, and listeners run, on a worker thread
+        return await asyncio.to_thread(_install_async_response, current, response)
+    except httpx.HTTPError as e:
+        _metrics["refresh_failures"] += 1
+        logger.error(f"Failed to refresh market snapshot from Wallex API: {e}")
+        return False
+    finally:
+        _metrics["last_refresh_duration"] = time.monotonic() - started
+
+
+def _install_async_response(current: MarketSnapshot | None, response: httpx.Response) -> bool:
+    with _refresh_lock:
+        if _snapshot is not current:
+            # The background refresher installed a newer snapshot while this download was in flight
+            return True
+        try:
+            new_snapshot = _install_response(current, response.status_code, response.headers, response.json)
+        except Exception as e:
+            _metrics["refresh_failures"] += 1
+            logger.error(f"Error processing Wallex response for market snapshot: {e}")
+            return False
+
+    if new_snapshot:
+        _notify_listeners(new_snapshot)
+    return True
+
+
+def _fresh_snapshot(max_staleness: float) -> MarketSnapshot | None:
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.age() <= max_staleness:
+        return snapshot
+
+    if snapshot is not None:
+        _metrics["stale_reads"] += 1
+        logger.warning(f"Market snapshot is {snapshot.age():.1f}s old (max {max_staleness}s). Refreshing inline.")
+    return None
+
+
+def get_snapshot(max_staleness: float = WALLEX_MAX_STALENESS) -> MarketSnapshot | None:
+    """
+    Returns the in-memory snapshot if it is younger than max_staleness seconds.
+    Otherwise a blocking refresh is attempted; None means no usable data.
+    """
+    snapshot = _fresh_snapshot(max_staleness)
+    if snapshot is not None:
+        return snapshot
+
+    if refresh_snapshot():
+        return _snapshot
+    return None
+
+
+async def get_snapshot_async(max_staleness: float = WALLEX_MAX_STALENESS) -> MarketSnapshot | None:
+    """Async counterpart of get_snapshot(); a stale snapshot is refreshed without blocking the loop."""
+    snapshot = _fresh_snapshot(max_staleness)
+    if snapshot is not None:
+        return snapshot
+
+    if await refresh_snapshot_async():
+        return _snapshot
+    return None
+
+
+def get_snapshot_metrics() -> dict:
+    """Returns refresh counters and the age of the current snapshot."""
+    snapshot = _snapshot
+    metrics = dict(_metrics)
+    metrics["snapshot_age_seconds"] = snapshot.age() if snapshot else None
+    metrics["market_count"] = len(snapshot.markets) if snapshot else 0
+    return metrics
+
+
+def _refresh_loop(interval: float, refresh_now: bool):
+    logger.info(f"Market snapshot refresher started (interval={interval}s).")
+    if refresh_now:
+        refresh_snapshot()
+    while not _stop_event.wait(interval):
+        refresh_snapshot()
+        logger.debug(f"Market snapshot metrics: {get_snapshot_metrics()}")
+    logger.info("Market snapshot refresher stopped.")
+
+
+def start_refresher(interval: float = WALLEX_REFRESH_INTERVAL, refresh_now: bool = False):
+    """
+    Starts the background refresher thread (idempotent). With refresh_now the
+    first download happens immediately instead of after one interval.
+    """
+    global _refresher_thread
+
+    if _refresher_thread and _refresher_thread.is_alive():
+        return
+    _stop_event.clear()
+    _refresher_thread = threading.Thread(target=_refresh_loop, args=(interval, refresh_now),
+                                         name="wallex-refresher", daemon=True)
+    _refresher_thread.start()
+
+
+def stop_refresher():
+    """Signals the background refresher to stop."""
+    _stop_event.set()
+
+
+def _collect_metrics():
+    stats = get_snapshot_metrics()
+    yield "chatbot_snapshot_refreshes_total", stats["refresh_count"], {"result": "updated"}
+    yield "chatbot_snapshot_refreshes_total", stats["not_modified_count"], {"result": "not_modified"}
+    yield "chatbot_snapshot_refreshes_total", stats["refresh_failures"], {"result": "failed"}
+    yield "chatbot_snapshot_stale_reads_total", stats["stale_reads"], {}
+    yield "chatbot_snapshot_age_seconds", stats["snapshot_age_seconds"], {}
+    yield "chatbot_snapshot_markets", stats["market_count"], {}
+    yield "chatbot_snapshot_refresh_seconds", stats["last_refresh_duration"], {}
+
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,339 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import numpy as np
+from src.core import metrics
+from src.core.config import (
+    PRICE_HISTORY_DIR, PRICE_HISTORY_SAMPLE_INTERVAL, PRICE_HISTORY_SLOTS, PRICE_HISTORY_MAX_MARKETS,
+    PRICE_HISTORY_MIN_COVERAGE
+)
+from src.services import market_snapshot
+from src.utils.amounts import PERSIAN_DIGITS, format_amount
+from src.utils.templates import get_template
+
+logger = logging.getLogger(__name__)
+
+# Local price history, so "how much did ETH change in the last hour?" is answered
+# from memory instead of the research path.
+#
+# Every market snapshot refresh (at most once per PRICE_HISTORY_SAMPLE_INTERVAL)
+# appends one sample of every market. All markets share one time axis, so the
+# store is a ring of PRICE_HISTORY_SLOTS rows, each row one sample time and each
+# column one market: an append is a single contiguous row write, and a window
+# query selects rows by time and reduces a column (or, for all markets at once,
+# the whole block) with NumPy. Empty cells are NaN. With PRICE_HISTORY_DIR set
+# the arrays are memory-mapped .npy files, so the history survives restarts.
+
+
+class PriceHistory:
+    """A fixed-size ring buffer of price samples for up to max_markets markets."""
+
+    def __init__(self, slots: int, max_markets: int, path: str | None = None):
+        self.slots = slots
+        self.max_markets = max_markets
+        self.path = path
+        self._columns: dict[str, int] = {}  # market symbol -> column
+        self._markets: list[tuple[str, str, str]] = []  # column -> (symbol, BASE, QUOTE)
+        self._by_base: dict[str, list[tuple[str, str]]] = {}  # BASE -> [(symbol, QUOTE)]
+        self._lock = threading.Lock()
+
+        if path:
+            self._prices, self._times = self._open_files(path)
+        else:
+            self._prices = np.full((slots, max_markets), np.nan)
+            self._times = np.zeros(slots)
+
+        # The next slot to write is the one after the newest sample
+        newest = int(np.argmax(self._times))
+        self._head = (newest + 1) % slots if self._times[newest] > 0 else 0
+
+    def _open_files(self, path: str) -> tuple[np.ndarray, np.ndarray]:
+        os.makedirs(path, exist_ok=True)
+        prices_file, times_file = os.path.join(path, "prices.npy"), os.path.join(path, "times.npy")
+        try:
+            prices = np.lib.format.open_memmap(prices_file, mode="r+")
+            times = np.lib.format.open_memmap(times_file, mode="r+")
+            if prices.shape == (self.slots, self.max_markets) and times.shape == (self.slots,):
+                with open(os.path.join(path, "markets.json"), encoding="utf-8") as f:
+                    for symbol, base, quote in json.load(f):
+                        self._add_market(symbol, base, quote)
+                logger.info(f"Loaded price history for {len(self._markets)} markets from {path}.")
+                return prices, times
+            logger.warning(f"Price history in {path} has another size. Starting a new one.")
+        except (OSError, ValueError) as e:
+            logger.info(f"No usable price history in {path} ({e}). Starting a new one.")
+
+        self._columns.clear()
+        self._markets.clear()
+        self._by_base.clear()
+        prices = np.lib.format.open_memmap(prices_file, mode="w+", dtype=np.float64,
+                                           shape=(self.slots, self.max_markets))
+        prices[:] = np.nan
+        times = np.lib.format.open_memmap(times_file, mode="w+", dtype=np.float64, shape=(self.slots,))
+        self._save_markets()
+        return prices, times
+
+    def _save_markets(self):
+        if self.path:
+            with open(os.path.join(self.path, "markets.json"), "w", encoding="utf-8") as f:
+                json.dump(self._markets, f)
+
+    def _add_market(self, symbol: str, base: str, quote: str) -> int | None:
+        if len(self._markets) >= self.max_markets:
+            return None
+        column = len(self._markets)
+        self._columns[symbol] = column
+        self._markets.append((symbol, base, quote))
+        self._by_base.setdefault(base, []).append((symbol, quote))
+        return column
+
+    def __len__(self) -> int:
+        """Number of markets tracked."""
+        return len(self._markets)
+
+    @property
+    def newest_time(self) -> float:
+        """Timestamp of the latest sample (0 when empty)."""
+        return float(self._times[(self._head - 1) % self.slots])
+
+    @property
+    def oldest_time(self) -> float:
+        """Timestamp of the oldest sample still kept (0 when empty)."""
+        times = self._times[self._times > 0]
+        return float(times.min()) if len(times) else 0.0
+
+    def append(self, timestamp: float, markets: list[dict]):
+        """Appends one sample of every market (Wallex market dicts: symbol, base_asset, quote_asset, price)."""
+        row = np.full(self.max_markets, np.nan)
+        added = dropped = 0
+        with self._lock:
+            for market in markets:
+                symbol = market.get("symbol")
+                try:
+                    price = float(market.get("price"))
+                except (TypeError, ValueError):
+                    continue
+                column = self._columns.get(symbol)
+                if column is None:
+                    base, quote = market.get("base_asset"), market.get("quote_asset")
+                    if not (symbol and base and quote):
+                        continue
+                    column = self._add_market(symbol, base.upper(), quote.upper())
+                    if column is None:
+                        dropped += 1
+                        continue
+                    added += 1
+                row[column] = price
+
+            self._prices[self._head] = row
+            self._times[self._head] = timestamp
+            self._head = (self._head + 1) % self.slots
+            if added:
+                self._save_markets()
+        if dropped:
+            logger.warning(f"Price history is full ({self.max_markets} markets). {dropped} markets not recorded.")
+
+    def _window_rows(self, seconds: float, now: float) -> np.ndarray:
+        """Ring indices of the samples in the last `seconds`, oldest first."""
+        chronological = (self._head + np.arange(self.slots)) % self.slots
+        times = self._times[chronological]
+        return chronological[(times > 0) & (times >= now - seconds)]
+
+    def markets_of(self, base: str) -> list[tuple[str, str]]:
+        """Returns the (market symbol, QUOTE) pairs recorded for a base asset."""
+        return list(self._by_base.get(base.upper(), []))
+
+    def stats(self, symbol: str, seconds: float, now: float | None = None) -> dict | None:
+        """
+        Summarizes one market over the last `seconds`: first/last price, % change,
+        min, max, simple moving average (the window mean), sample count and the
+        time span actually covered. None if the window holds fewer than 2 samples.
+        """
+        now = now or time.time()
+        with self._lock:
+            column = self._columns.get(symbol)
+            if column is None:
+                return None
+            rows = self._window_rows(seconds, now)
+            values = self._prices[rows, column]
+            times = self._times[rows]
+        valid = ~np.isnan(values)
+        values, times = values[valid], times[valid]
+        if len(values) < 2:
+            return None
+
+        first, last = float(values[0]), float(values[-1])
+        return {
+            "first": first,
+            "last": last,
+            "change_pct": (last - first) / first * 100 if first else 0.0,
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "sma": float(values.mean()),
+            "samples": int(len(values)),
+            "span": float(now - times[0]),
+        }
+
+    def changes(self, seconds: float, now: float | None = None) -> dict[str, float]:
+        """% change of every market over the last `seconds`, computed for all markets at once."""
+        now = now or time.time()
+        with self._lock:
+            rows = self._window_rows(seconds, now)
+            block = self._prices[rows, :len(self._markets)]
+            symbols = [market[0] for market in self._markets]
+        if len(rows) < 2:
+            return {}
+
+        present = ~np.isnan(block)
+        columns = np.arange(block.shape[1])
+        first = block[np.argmax(present, axis=0), columns]
+        last = block[len(rows) - 1 - np.argmax(present[::-1], axis=0), columns]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = (last - first) / first * 100
+        return {symbols[i]: float(change[i]) for i in np.flatnonzero(np.isfinite(change))}
+
+    def flush(self):
+        """Writes memory-mapped arrays back to disk."""
+        for array in (self._prices, self._times):
+            if isinstance(array, np.memmap):
+                array.flush()
+
+
+_history: PriceHistory | None = None
+_history_lock = threading.Lock()
+_stats = {"samples": 0, "skipped": 0}
+
+metrics.describe("chatbot_price_history_append_seconds", "histogram", "Time to append one sample of every market.")
+metrics.describe("chatbot_price_history_samples_total", "counter", "Snapshots offered to the price history, by result (appended, skipped).")
+metrics.describe("chatbot_price_history_markets", "gauge", "Markets tracked by the price history.")
+metrics.describe("chatbot_price_history_span_seconds", "gauge", "Age of the oldest price history sample.")
+
+
+def get_price_history() -> PriceHistory:
+    """Returns the process-wide store, opening (or creating) it on first use."""
+    global _history
+
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = PriceHistory(PRICE_HISTORY_SLOTS, PRICE_HISTORY_MAX_MARKETS, PRICE_HISTORY_DIR or None)
+    return _history
+
+
+def max_window() -> float:
+    """The longest window the store can answer for."""
+    return PRICE_HISTORY_SLOTS * PRICE_HISTORY_SAMPLE_INTERVAL
+
+
+def _on_snapshot_refresh(snapshot: market_snapshot.MarketSnapshot):
+    history = get_price_history()
+    timestamp = snapshot.fetched_wall.timestamp()
+    if timestamp - history.newest_time < PRICE_HISTORY_SAMPLE_INTERVAL:
+        _stats["skipped"] += 1
+        return
+
+    started = time.monotonic()
+    history.append(timestamp, snapshot.markets)
+    _stats["samples"] += 1
+    metrics.observe("chatbot_price_history_append_seconds", time.monotonic() - started)
+
+
+def start_price_history():
+    """Opens the store and records a sample on every market snapshot refresh from now on."""
+    history = get_price_history()
+    market_snapshot.add_refresh_listener(_on_snapshot_refresh)
+    logger.info(f"Recording price history every {PRICE_HISTORY_SAMPLE_INTERVAL}s "
+                f"({len(history)} markets known, up to {max_window() / 3600:g}h kept).")
+
+
+def get_history_stats() -> dict:
+    """Returns appended/skipped samples, markets tracked and the oldest sample's age."""
+    history = get_price_history()
+    oldest = history.oldest_time
+    return {
+        **_stats,
+        "markets": len(history),
+        "span_seconds": time.time() - oldest if oldest else 0.0,
+    }
+
+
+def _collect_metrics():
+    yield "chatbot_price_history_samples_total", _stats["samples"], {"result": "appended"}
+    yield "chatbot_price_history_samples_total", _stats["skipped"], {"result": "skipped"}
+    if _history is None:  # get_history_stats() would load the store just to report on it
+        return
+    stats = get_history_stats()
+    yield "chatbot_price_history_markets", stats["markets"], {}
+    yield "chatbot_price_history_span_seconds", stats["span_seconds"], {}
+
+
+metrics.register_collector(_collect_metrics)
+
+
+# --- Queries ---
+
+_UNIT_SECONDS = {"min": 60, "mins": 60, "minute": 60, "minutes": 60, "دقیقه": 60,
+                 "hr": 3600, "hrs": 3600, "hour": 3600, "hours": 3600, "ساعت": 3600,
+                 "day": 86400, "days": 86400, "روز": 86400}
+# "last 30 minutes", "past 4 hours", "in the last hour", "24h", "۲ ساعت گذشته", "ساعت گذشته", "yesterday"
+_WINDOW_RE = re.compile(
+    r"\b(?:last|past)\s+(?:(?P<n1>\d+(?:\.\d+)?)\s*)?(?P<u1>minutes?|mins?|hours?|hrs?|days?)\b|"
+    r"(?:(?P<n2>\d+(?:\.\d+)?)\s*)?(?P<u2>دقیقه|ساعت|روز)\s*(?:ی\s*)?(?:گذشته|اخیر)|"
+    r"(?P<day>\byesterday\b|\b24\s*(?:hours?|hrs?|h)\b|دیروز)",
+    re.IGNORECASE
+)
+
+
+def parse_window(text: str) -> float | None:
+    """Parses the time window of a history question into seconds ("last hour" -> 3600). None if there is none."""
+    match = _WINDOW_RE.search(text.translate(PERSIAN_DIGITS))
+    if not match:
+        return None
+    if match["day"]:
+        return 86400.0
+    for number, unit in (("n1", "u1"), ("n2", "u2")):
+        if match[unit]:
+            return float(match[number] or 1) * _UNIT_SECONDS[match[unit].lower()]
+    return None
+
+
+def _format_window(seconds: float, t: dict) -> str:
+    if seconds % 3600 == 0:
+        return t['duration_hours'].format(n=int(seconds // 3600))
+    return t['duration_minutes'].format(n=max(1, round(seconds / 60)))
+
+
+def get_history_reply(symbols: list[str], seconds: float, quote: str | None = None, lang: str = 'en') -> str | None:
+    """
+    Renders change, low, high and average over the last `seconds` for every
+    recorded quote market of each symbol (only `quote` markets if given).
+    Returns None when the store does not cover enough of the window
+    (PRICE_HISTORY_MIN_COVERAGE), so the caller can answer another way.
+    """
+    t = get_template(lang)
+    history = get_price_history()
+    lines, covered = [], 0.0
+    for symbol in symbols:
+        for market, market_quote in history.markets_of(symbol):
+            if quote and market_quote != quote:
+                continue
+            stats = history.stats(market, seconds)
+            if stats is None or stats["span"] < PRICE_HISTORY_MIN_COVERAGE * seconds:
+                continue
+            covered = max(covered, stats["span"])
+            lines.append(t['history_line'].format(
+                base=symbol, quote=market_quote, change=f"{stats['change_pct']:+.2f}%",
+                first=format_amount(stats["first"]), last=format_amount(stats["last"]),
+                low=format_amount(stats["min"]), high=format_amount(stats["max"]), sma=format_amount(stats["sma"])))
+
+    if not lines:
+        logger.info(f"Not enough price history for {', '.join(symbols)} over {seconds:g}s.")
+        return None
+
+    reply_lines = [t['history_header'].format(window=_format_window(seconds, t))] + lines
+    if covered < 0.95 * seconds:
+        reply_lines.append(t['history_partial'].format(span=_format_window(round(covered / 60) * 60, t)))
+    return "\n".join(reply_lines)
@@ -1,13 +1,17 @@
 import logging
-import requests
-from datetime import datetime
-from src.core.config import WALLEX_API_URL
+from src.core import readiness
+from src.core.config import PRICE_PORTFOLIO_DEFAULT_QUOTE
+from src.services import market_snapshot
+from src.utils.amounts import format_amount
+from src.utils.symbol_matcher import SymbolMatcher
 from src.utils.templates import get_template
 
 logger = logging.getLogger(__name__)
 
 # This map is populated by initialize_coin_map()
 COIN_MAP: dict[str, str] = {}
+# Compiled matcher over COIN_MAP keys, rebuilt together with the map
+SYMBOL_MATCHER: SymbolMatcher | None = None
 
 
 def _normalize_key(key: str) -> str:
@@ -17,100 +21,225 @@ def _normalize_key(key: str) -> str:
     return key.lower().replace(' ', '').replace('‌', '')  # '‌' is the Farsi zero-width non-joiner
 
 
+def _build_coin_map(markets: list[dict]) -> dict[str, str]:
+    """Builds a *normalized* name-to-symbol map from a list of Wallex markets."""
+    temp_map = {}
+    for market in markets:
+        symbol = market.get("symbol", "").strip()
+        base_asset = market.get("base_asset", "").strip()
+        fa_base_asset = market.get("fa_base_asset", "").strip()
+        en_base_asset = market.get("en_base_asset", "").strip()
+
+        if base_asset:
+            base_symbol = base_asset.upper()
+            if base_asset: temp_map[base_asset.lower()] = base_symbol
+            if en_base_asset: temp_map[en_base_asset.lower()] = base_symbol
+            if fa_base_asset:
+                temp_map[fa_base_asset.lower()] = base_symbol
+                no_space_farsi = fa_base_asset.replace(' ', '').replace('‌', '')
+                temp_map[no_space_farsi.lower()] = base_symbol
+            if symbol: temp_map[symbol.lower()] = base_symbol
+    return temp_map
+
+
+def _on_snapshot_refresh(snapshot: market_snapshot.MarketSnapshot):
+    """Keeps COIN_MAP in step with newly listed markets."""
+    global COIN_MAP, SYMBOL_MATCHER
+
+    try:
+        new_map = _build_coin_map(snapshot.markets)
+        first_load = not COIN_MAP and new_map
+        # Map first: a reader in between compiles a matcher for the new map rather than
+        # pairing is_coin_map_ready() with a matcher over the old (possibly empty) one
+        COIN_MAP = new_map
+        SYMBOL_MATCHER = SymbolMatcher(new_map)
+        if first_load:
+            logger.info(f"Coin map ready: {len(new_map)} coin names/symbols loaded.")
+            readiness.milestone("coin_map_ready")
+    except Exception as e:
+        logger.error(f"Error rebuilding coin map from market snapshot: {e}")
+
+
+def get_symbol_matcher() -> SymbolMatcher:
+    """Returns the matcher for the current COIN_MAP, compiling it if the map was replaced."""
+    global SYMBOL_MATCHER
+
+    matcher = SYMBOL_MATCHER
+    if matcher is None or matcher.coin_map is not COIN_MAP:
+        matcher = SymbolMatcher(COIN_MAP)
+        SYMBOL_MATCHER = matcher
+    return matcher
+
+
 def initialize_coin_map() -> bool:
     """
-    Fetches market data from Wallex and builds a *normalized* name-to-symbol map.
-    This function *modifies* the global COIN_MAP.
+    Loads the Wallex market snapshot and builds a *normalized* name-to-symbol map.
+    This function *modifies* the global COIN_MAP, and keeps it updated on every
+    subsequent snapshot refresh.
     """
-    global COIN_MAP
-
     logger.info("Initializing coin map from Wallex API...")
-    try:
-        response = requests.get(WALLEX_API_URL, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-        markets = data.get("result", {}).get("markets", [])
-
-        temp_map = {}
-        for market in markets:
-            symbol = market.get("symbol", "").strip()
-            base_asset = market.get("base_asset", "").strip()
-            fa_base_asset = market.get("fa_base_asset", "").strip()
-            en_base_asset = market.get("en_base_asset", "").strip()
-
-            if base_asset:
-                base_symbol = base_asset.upper()
-                if base_asset: temp_map[base_asset.lower()] = base_symbol
-                if en_base_asset: temp_map[en_base_asset.lower()] = base_symbol
-                if fa_base_asset:
-                    temp_map[fa_base_asset.lower()] = base_symbol
-                    no_space_farsi = fa_base_asset.replace(' ', '').replace('‌', '')
-                    temp_map[no_space_farsi.lower()] = base_symbol
-                if symbol: temp_map[symbol.lower()] = base_symbol
-
-        COIN_MAP = temp_map
-        logger.info(f"Successfully loaded {len(COIN_MAP)} coin names/symbols into the map.")
-        return True
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to initialize coin map from Wallex API: {e}")
-        return False
-    except Exception as e:
-        logger.error(f"Error processing Wallex response for map initialization: {e}")
+    market_snapshot.add_refresh_listener(_on_snapshot_refresh)
+
+    snapshot = market_snapshot.get_snapshot()
+    if snapshot is None:
+        logger.error("Failed to initialize coin map: no Wallex market snapshot available.")
         return False
 
+    if not COIN_MAP:
+        _on_snapshot_refresh(snapshot)
+    logger.info(f"Successfully loaded {len(COIN_MAP)} coin names/symbols into the map.")
+    return bool(COIN_MAP)
 
-def get_wallex_price(symbol: str, lang: str = 'en') -> str:
-    """Fetches all market prices for a given base symbol from Wallex."""
-    t = get_template(lang)
-    logger.info(f"Attempting to fetch all market prices for base symbol: {symbol}")
 
-    try:
-        response = requests.get(WALLEX_API_URL, timeout=10)
-        response.raise_for_status()
+def warm_coin_map():
+    """
+    Non-blocking counterpart of initialize_coin_map(): subscribes to snapshot
+    refreshes, so COIN_MAP is built as soon as the background refresher (started
+    with refresh_now=True) has downloaded the markets.
+    """
+    market_snapshot.add_refresh_listener(_on_snapshot_refresh)
+    logger.info("Coin map will be built from the first background market snapshot.")
+
+
+def is_coin_map_ready() -> bool:
+    """True once COIN_MAP has been built from a market snapshot."""
+    return bool(COIN_MAP)
+
 
-        data = response.json()
-        markets = data.get("result", {}).get("markets", [])
-        if not isinstance(markets, list):
-            logger.error(f"Wallex API 'markets' is not a list as expected. Type: {type(markets)}")
-            markets = []
+readiness.register("coin_map", is_coin_map_ready)
 
-        symbol_lower = symbol.lower()
-        found_prices = []
 
-        for market_data in markets:
-            base_asset = market_data.get("base_asset", "").lower()
+def _format_prices(symbol: str, snapshot: market_snapshot.MarketSnapshot | None, lang: str) -> str:
+    """Renders every quote market of a base symbol from a market snapshot."""
+    t = get_template(lang)
 
-            if base_asset == symbol_lower:
-                last_price = market_data.get("price")
-                market_symbol = market_data.get("symbol")
-                quote_asset = market_data.get("quote_asset")
+    if snapshot is None:
+        logger.error("No fresh Wallex market snapshot available.")
+        return t['price_api_error']
 
-                if last_price and market_symbol and quote_asset:
-                    found_prices.append({
-                        "symbol": market_symbol,
-                        "price": last_price,
-                        "quote": quote_asset
-                    })
+    try:
+        found_prices = snapshot.by_base.get(symbol.lower(), [])
 
         if found_prices:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            # Sort to show TMN and USDT first
-            found_prices.sort(key=lambda x: (x['quote'] != 'TMN', x['quote'] != 'USDT', x['quote']))
+            timestamp = snapshot.fetched_wall.strftime('%Y-%m-%d %H:%M:%S')
 
             reply_lines = [t['price_header'].format(symbol=symbol, timestamp=timestamp)]
             for p in found_prices:
                 reply_lines.append(t['price_line'].format(quote=p['quote'], symbol=p['symbol'], price=p['price']))
 
             reply = "\n".join(reply_lines)
-            logger.info(f"Successfully found and compiled prices for {symbol} across {len(found_prices)} markets.")
+            logger.info(f"Successfully found and compiled prices for {symbol} across {len(found_prices)} markets "
+                        f"(snapshot age {snapshot.age():.1f}s).")
             return reply
         else:
             logger.warning(f"Symbol '{symbol}' not found in Wallex.ir markets.")
             return t['price_not_found'].format(symbol=symbol)
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error calling Wallex API: {e}")
+    except Exception as e:
+        logger.error(f"Error reading Wallex market snapshot: {e}")
+        return t['price_parse_error']
+
+
+async def get_wallex_price_async(symbol: str, lang: str = 'en') -> str:
+    """
+    Returns all market prices for a given base symbol from the in-memory Wallex
+    snapshot; a stale snapshot is refreshed without blocking the loop.
+    """
+    logger.info(f"Looking up all market prices for base symbol: {symbol}")
+    return _format_prices(symbol, await market_snapshot.get_snapshot_async(), lang)
+
+
+def _market_price(snapshot: market_snapshot.MarketSnapshot, base: str, quote: str) -> float | None:
+    for market in snapshot.by_base.get(base.lower(), []):
+        if market["quote"] == quote:
+            try:
+                return float(market["price"])
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def _convert(snapshot: market_snapshot.MarketSnapshot, base: str, quote: str) -> float | None:
+    """
+    Price of one `base` in `quote`: the direct market if Wallex lists it, else
+    through USDT or TMN (e.g. a coin without a TMN market, valued in TMN).
+    """
+    if base == quote:
+        return 1.0
+    direct = _market_price(snapshot, base, quote)
+    if direct is not None:
+        return direct
+    for bridge in ("USDT", "TMN"):
+        if bridge in (base, quote):
+            continue
+        via = _market_price(snapshot, base, bridge)
+        if via is None:
+            continue
+        rate = _market_price(snapshot, bridge, quote)
+        if rate is None:
+            inverse = _market_price(snapshot, quote, bridge)
+            rate = 1 / inverse if inverse else None
+        if rate is not None:
+            return via * rate
+    return None
+
+
+def _format_price_table(holdings: list[tuple[str, float | None]], quote: str | None,
+                        snapshot: market_snapshot.MarketSnapshot | None, lang: str) -> str:
+    """Renders several symbols (and the value of any holdings) from one market snapshot."""
+    t = get_template(lang)
+
+    if snapshot is None:
+        logger.error("No fresh Wallex market snapshot available.")
         return t['price_api_error']
+
+    try:
+        timestamp = snapshot.fetched_wall.strftime('%Y-%m-%d %H:%M:%S')
+        reply_lines = [t['price_table_header'].format(timestamp=timestamp)]
+        for symbol, _ in holdings:
+            markets = snapshot.by_base.get(symbol.lower(), [])
+            if markets:
+                prices = " | ".join(f"{p['price']} {p['quote']}" for p in markets)
+                reply_lines.append(t['price_table_line'].format(symbol=symbol, prices=prices))
+            else:
+                reply_lines.append(t['price_table_missing'].format(symbol=symbol))
+
+        owned = [(symbol, amount) for symbol, amount in holdings if amount is not None]
+        if owned:
+            quote = quote or PRICE_PORTFOLIO_DEFAULT_QUOTE
+            total, complete = 0.0, True
+            reply_lines.append(t['portfolio_header'].format(quote=quote))
+            for symbol, amount in owned:
+                price = _convert(snapshot, symbol, quote)
+                if price is None:
+                    complete = False
+                    reply_lines.append(t['portfolio_line_unpriced'].format(
+                        amount=format_amount(amount), symbol=symbol, quote=quote))
+                    continue
+                total += amount * price
+                reply_lines.append(t['portfolio_line'].format(
+                    amount=format_amount(amount), symbol=symbol, value=format_amount(amount * price), quote=quote))
+            if len(owned) > 1 or not complete:
+                reply_lines.append(t['portfolio_total' if complete else 'portfolio_total_partial'].format(
+                    total=format_amount(total), quote=quote))
+
+        logger.info(f"Compiled prices for {len(holdings)} symbols ({len(owned)} holdings) "
+                    f"from one snapshot (age {snapshot.age():.1f}s).")
+        return "\n".join(reply_lines)
+
     except Exception as e:
-        logger.error(f"Error parsing Wallex response: {e}")
-        return t['price_parse_error']
\ No newline at end of file
+        logger.error(f"Error reading Wallex market snapshot: {e}")
+        return t['price_parse_error']
+
+
+async def get_wallex_prices_async(holdings: list[tuple[str, float | None]], quote: str | None = None,
+                                  lang: str = 'en') -> str:
+    """
+    Answers a query about one or more symbols (see helpers.extract_price_request)
+    from a single market snapshot. A lone symbol without an amount gets the
+    usual get_wallex_price_async() reply.
+    """
+    if len(holdings) == 1 and holdings[0][1] is None:
+        return await get_wallex_price_async(holdings[0][0], lang)
+    logger.info(f"Looking up market prices for symbols: {', '.join(symbol for symbol, _ in holdings)}")
+    return _format_price_table(holdings, quote, await market_snapshot.get_snapshot_async(), lang)
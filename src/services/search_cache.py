@@ -0,0 +1,130 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from src.core import metrics
+from src.core.config import (
+    SEARCH_CACHE_FILE, SEARCH_CACHE_RESULTS_TTL, SEARCH_CACHE_PAGES_TTL,
+    SEARCH_CACHE_MAX_RESULTS, SEARCH_CACHE_MAX_PAGES
+)
+
+logger = logging.getLogger(__name__)
+
+# Two levels, each with its own TTL and size bound:
+#   search_results: normalized query + lang -> SerpAPI organic results (JSON)
+#   page_texts:     URL -> extracted paragraph text
+_TABLES = {
+    "search_results": (SEARCH_CACHE_RESULTS_TTL, SEARCH_CACHE_MAX_RESULTS),
+    "page_texts": (SEARCH_CACHE_PAGES_TTL, SEARCH_CACHE_MAX_PAGES),
+}
+
+_connection: sqlite3.Connection | None = None
+_lock = threading.Lock()
+_stats = {table: {"hits": 0, "misses": 0, "evictions": 0} for table in _TABLES}
+
+metrics.describe("chatbot_search_cache_lookups_total", "counter", "Search cache lookups, by table and result (hit, miss).")
+metrics.describe("chatbot_search_cache_evictions_total", "counter", "Search cache rows dropped to stay under the size limit.")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases, drops ZWNJ/trailing punctuation and collapses whitespace, so trivial variants share a key."""
+    query = query.lower().replace('‌', ' ')
+    query = re.sub(r'\s+', ' ', query).strip()
+    return query.rstrip('?؟!.،, ')
+
+
+def _get_connection() -> sqlite3.Connection:
+    """Opens (and creates, on first use) the cache database. Caller holds _lock."""
+    global _connection
+
+    if _connection is None:
+        _connection = sqlite3.connect(SEARCH_CACHE_FILE, check_same_thread=False)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute("PRAGMA synchronous=NORMAL")
+        for table in _TABLES:
+            _connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                f"(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            _connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed)")
+        _connection.commit()
+        logger.info(f"Search cache opened at {SEARCH_CACHE_FILE}.")
+    return _connection
+
+
+def _get(table: str, key: str) -> str | None:
+    ttl, _ = _TABLES[table]
+    now = time.time()
+    try:
+        with _lock:
+            conn = _get_connection()
+            row = conn.execute(f"SELECT value, created FROM {table} WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > ttl:
+                _stats[table]["misses"] += 1
+                return None
+            conn.execute(f"UPDATE {table} SET accessed = ? WHERE key = ?", (now, key))
+            conn.commit()
+            _stats[table]["hits"] += 1
+            return row[0]
+    except sqlite3.Error as e:
+        logger.error(f"Search cache read from {table} failed: {e}")
+        return None
+
+
+def _put(table: str, key: str, value: str):
+    _, max_entries = _TABLES[table]
+    now = time.time()
+    try:
+        with _lock:
+            conn = _get_connection()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {table} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            # Least-recently-used eviction down to the size bound
+            evicted = conn.execute(
+                f"DELETE FROM {table} WHERE key IN "
+                f"(SELECT key FROM {table} ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (max_entries,)
+            ).rowcount
+            conn.commit()
+            _stats[table]["evictions"] += max(evicted, 0)
+    except sqlite3.Error as e:
+        logger.error(f"Search cache write to {table} failed: {e}")
+
+
+def get_search_results(query: str, lang: str) -> list | None:
+    """Returns cached SerpAPI organic results for the query, or None on a miss."""
+    value = _get("search_results", f"{lang}:{normalize_query(query)}")
+    return json.loads(value) if value is not None else None
+
+
+def put_search_results(query: str, lang: str, organic_results: list):
+    _put("search_results", f"{lang}:{normalize_query(query)}", json.dumps(organic_results, ensure_ascii=False))
+
+
+def get_page_text(url: str) -> str | None:
+    """Returns the cached extracted text of a page, or None on a miss."""
+    return _get("page_texts", url)
+
+
+def put_page_text(url: str, text: str):
+    _put("page_texts", url, text)
+
+
+def get_cache_stats() -> dict:
+    """Returns hit/miss/eviction counters per cache level."""
+    with _lock:
+        return {table: dict(stats) for table, stats in _stats.items()}
+
+
+def _collect_metrics():
+    for table, stats in get_cache_stats().items():
+        yield "chatbot_search_cache_lookups_total", stats["hits"], {"cache": table, "result": "hit"}
+        yield "chatbot_search_cache_lookups_total", stats["misses"], {"cache": table, "result": "miss"}
+        yield "chatbot_search_cache_evictions_total", stats["evictions"], {"cache": table}
+
+
+metrics.register_collector(_collect_metrics)
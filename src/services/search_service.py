@@ -1,96 +1,327 @@
+import asyncio
 import logging
-import requests
 import re
-import serpapi
+import threading
+import time
+from urllib.parse import urlparse
 from bs4 import BeautifulSoup
-from src.core.config import SERPAPI_KEY
+from src.core.config import (
+    SERPAPI_KEY, SEARCH_SCRAPE_RESULTS, SEARCH_SCRAPE_DEADLINE,
+    SEARCH_PAGE_MAX_CHARS, SEARCH_PAGE_MAX_BYTES, SEARCH_HTML_EXTRACTOR
+)
+from src.core import http_client, metrics, tracing
+from src.services import context_builder, search_cache
+from src.utils.singleflight import AsyncSingleFlight
 from src.utils.templates import get_template
 
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
 logger = logging.getLogger(__name__)
 
 # --- Client Initialization ---
-serpapi_client = serpapi.Client(api_key=SERPAPI_KEY)
+SERPAPI_SEARCH_URL = "https://serpapi.com/search"
 
+SCRAPER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
 
-# --- Service Functions ---
+# Identical concurrent searches (same language and normalized query) share one run
+_search_flight_async = AsyncSingleFlight("search_async")
 
-def search_web(query: str, lang: str = 'en') -> tuple[str, list | None]:
-    """
-    Performs a web search, scrapes top results, and returns context.
-    Returns (context_text, sources_list) or (error_message, None)
-    """
-    t = get_template(lang)
-    logger.info(f"Performing web search for: '{query}' (lang={lang})")
+# Per-domain fetch timings, see get_scrape_stats()
+_scrape_stats: dict[str, dict] = {}
+_scrape_stats_lock = threading.Lock()
+
+metrics.describe("chatbot_scrape_fetches_total", "counter", "Page fetches for search context, by outcome (ok, failed, deadline).")
+metrics.describe("chatbot_scrape_fetch_seconds_total", "counter", "Time spent on finished page fetches.")
+
+
+# --- HTML Extraction ---
+# Each extractor returns the raw text of every <p> element. The C-backed parsers
+# are used when installed; BeautifulSoup's pure-Python parser is the fallback.
+
+def _paragraphs_selectolax(html: str | bytes) -> list[str]:
+    return [node.text() for node in LexborHTMLParser(html).css('p')]
+
+
+def _paragraphs_lxml(html: str | bytes) -> list[str]:
+    if not html:
+        return []
+    return [p.text_content() for p in lxml.html.document_fromstring(html).iter('p')]
+
+
+def _paragraphs_bs4(html: str | bytes) -> list[str]:
+    return [p.get_text() for p in BeautifulSoup(html, 'html.parser').find_all('p')]
+
+
+HTML_EXTRACTORS = {"bs4": _paragraphs_bs4}
+if LexborHTMLParser is not None:
+    HTML_EXTRACTORS["selectolax"] = _paragraphs_selectolax
+if lxml is not None:
+    HTML_EXTRACTORS["lxml"] = _paragraphs_lxml
+
+
+def _resolve_extractor(name: str):
+    if name == "auto":
+        for candidate in ("selectolax", "lxml", "bs4"):
+            if candidate in HTML_EXTRACTORS:
+                return candidate, HTML_EXTRACTORS[candidate]
+    if name not in HTML_EXTRACTORS:
+        logger.warning(f"HTML extractor '{name}' is not available. Falling back to bs4.")
+        name = "bs4"
+    return name, HTML_EXTRACTORS[name]
 
-    if not SERPAPI_KEY:
-        logger.error("SERPAPI_KEY is not set. Web search is disabled.")
-        return t['search_api_error'].format(e="API key not configured"), None
 
+_extractor_name, _extract_paragraphs = _resolve_extractor(SEARCH_HTML_EXTRACTOR)
+logger.debug(f"Using '{_extractor_name}' HTML extractor.")
+
+
+def _extract_page_text(html: str | bytes) -> str:
+    """Returns the text of all <p> tags, one cleaned paragraph per line, capped at SEARCH_PAGE_MAX_CHARS."""
     try:
-        search_results = serpapi_client.search(
-            q=query,
-            engine="google",
-            hl=lang,
-            gl="us"
-        )
-        organic_results = search_results.get("organic_results", [])
+        paragraphs = _extract_paragraphs(html)
+    except Exception as e:
+        logger.warning(f"'{_extractor_name}' failed to parse page ({e}). Retrying with bs4.")
+        paragraphs = _paragraphs_bs4(html)
 
-        if not organic_results:
-            logger.warning("Web search returned no organic results.")
-            return t['search_no_results'], None
+    # Clean up whitespace inside each paragraph
+    cleaned = (re.sub(r'\s+', ' ', p).strip() for p in paragraphs)
+    page_text = "\n".join(p for p in cleaned if p)
+
+    if len(page_text) > SEARCH_PAGE_MAX_CHARS:
+        page_text = page_text[:SEARCH_PAGE_MAX_CHARS]
+    return page_text
+
+
+# --- Scraping Helpers ---
+
+_HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+
+def _check_content_type(headers) -> str | None:
+    """Raises for non-HTML responses before their body is downloaded. Returns the declared charset, if any."""
+    content_type = headers.get('Content-Type', '')
+    mime_type = content_type.split(';')[0].strip().lower()
+    if mime_type and mime_type not in _HTML_CONTENT_TYPES:
+        raise ValueError(f"Skipping non-HTML content type '{mime_type}'")
+
+    match = re.search(r'charset=["\']?([\w-]+)', content_type, re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def _decode_body(body: bytes, charset: str | None) -> str | bytes:
+    """Decodes with the HTTP charset; without one, the parser sniffs <meta charset> from the bytes."""
+    if charset:
+        try:
+            return body.decode(charset, errors='replace')
+        except LookupError:
+            pass
+    return body
+
+
+def _record_fetch(link: str, seconds: float | None, outcome: str):
+    """
+    Records per-domain fetch timing so slow or failing domains become visible.
+    outcome is 'ok', 'failed' or 'deadline' (no timing: the fetch was abandoned).
+    """
+    domain = urlparse(link).netloc or link
+    with _scrape_stats_lock:
+        stats = _scrape_stats.setdefault(
+            domain, {"count": 0, "failures": 0, "deadline_misses": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+        )
+        if outcome == "deadline":
+            stats["deadline_misses"] += 1
+            return
+        stats["count"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        if outcome == "failed":
+            stats["failures"] += 1
+    logger.info(f"Fetch {link} {outcome} in {seconds * 1000:.0f} ms.")
 
-        snippets = []
-        sources = []
 
-        scraper_headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+def get_scrape_stats() -> dict:
+    """Returns per-domain scrape timings: count, failures, deadline misses, mean and max seconds."""
+    with _scrape_stats_lock:
+        return {
+            domain: {**stats, "mean_seconds": stats["total_seconds"] / stats["count"] if stats["count"] else None}
+            for domain, stats in _scrape_stats.items()
         }
 
-        # Scrape top 3 results
-        for i, result in enumerate(organic_results[:3]):
-            link = result.get("link")
-            title = result.get("title", "No title")
-            original_snippet = result.get('snippet', 'No snippet available.')
 
-            if not link:
-                continue
+def _collect_metrics():
+    # Summed over domains: a per-domain label would grow with every site ever scraped
+    totals = {"count": 0, "failures": 0, "deadline_misses": 0, "total_seconds": 0.0}
+    for stats in get_scrape_stats().values():
+        for key in totals:
+            totals[key] += stats[key]
+    yield "chatbot_scrape_fetches_total", totals["count"] - totals["failures"], {"outcome": "ok"}
+    yield "chatbot_scrape_fetches_total", totals["failures"], {"outcome": "failed"}
+    yield "chatbot_scrape_fetches_total", totals["deadline_misses"], {"outcome": "deadline"}
+    yield "chatbot_scrape_fetch_seconds_total", totals["total_seconds"], {}
 
-            sources.append({"title": title, "link": link})
 
-            try:
-                logger.info(f"Scraping {link} for context...")
-                page_response = requests.get(link, headers=scraper_headers, timeout=5)
+metrics.register_collector(_collect_metrics)
+
+
+async def _scrape_page_async(link: str) -> str | None:
+    cached = await asyncio.to_thread(search_cache.get_page_text, link)
+    if cached is not None:
+        return cached
+
+    started = time.monotonic()
+    try:
+        with tracing.span("scrape", urlparse(link).netloc):
+            logger.info(f"Scraping {link} for context...")
+            client = http_client.get_async_http_client("scrape")
+            http_client.track_async_request("scrape")
+            async with client.stream("GET", link, headers=SCRAPER_HEADERS) as page_response:
                 page_response.raise_for_status()
+                charset = _check_content_type(page_response.headers)
+
+                body = bytearray()
+                async for chunk in page_response.aiter_bytes():
+                    body.extend(chunk)
+                    if len(body) >= SEARCH_PAGE_MAX_BYTES:
+                        break
+            # HTML parsing is CPU-bound; keep it off the event loop
+            page_text = await asyncio.to_thread(_extract_page_text, _decode_body(bytes(body[:SEARCH_PAGE_MAX_BYTES]), charset))
+        _record_fetch(link, time.monotonic() - started, "ok")
+        await asyncio.to_thread(search_cache.put_page_text, link, page_text)
+        return page_text
+    except Exception as e:
+        _record_fetch(link, time.monotonic() - started, "failed")
+        logger.warning(f"Failed to scrape {link}: {e}. Falling back to snippet.")
+        return None
+
+
+async def _scrape_pages_async(links: list[str]) -> list[str | None]:
+    """
+    Scrapes all links concurrently. Pages not finished within SEARCH_SCRAPE_DEADLINE
+    are cancelled and come back as None, so their search snippet is used instead.
+    """
+    if not links:
+        return []
+
+    tasks = [asyncio.create_task(_scrape_page_async(link)) for link in links]
+    done, not_done = await asyncio.wait(tasks, timeout=SEARCH_SCRAPE_DEADLINE)
+
+    for task, link in zip(tasks, links):
+        if task in not_done:
+            task.cancel()
+            _record_fetch(link, None, "deadline")
+            logger.warning(f"Scraping {link} missed the {SEARCH_SCRAPE_DEADLINE}s deadline. Falling back to snippet.")
+    return [task.result() if task in done else None for task in tasks]
+
+
+def _top_results(organic_results: list) -> list[tuple[int, dict]]:
+    """The top results worth scraping, with their original rank."""
+    return [(i, result) for i, result in enumerate(organic_results[:SEARCH_SCRAPE_RESULTS]) if result.get("link")]
+
+
+def _build_context(query: str, top_results: list[tuple[int, dict]], page_texts: list[str | None]) -> tuple[str, list]:
+    """
+    Pairs each result with its scraped text (or snippet fallback) and packs the
+    passages most relevant to the query into the synthesis token budget.
+    Returns (context_text, sources).
+    """
+    pages = []
+    sources = []
+
+    for (i, result), page_text in zip(top_results, page_texts):
+        link = result.get("link")
+        title = result.get("title", "No title")
+        original_snippet = result.get('snippet', 'No snippet available.')
+
+        sources.append({"title": title, "link": link})
+
+        if page_text and len(page_text) > len(original_snippet):
+            pages.append((f"Source {i + 1} ({title})", f"{original_snippet}\n{page_text}"))
+        else:
+            if page_text is not None:
+                logger.warning(f"Scraping {link} yielded little text. Falling back to snippet.")
+            pages.append((f"Source {i + 1} ({title})", original_snippet))
 
-                soup = BeautifulSoup(page_response.text, 'html.parser')
+    return context_builder.build_context(query, pages), sources
 
-                # Get text from all <p> tags
-                paragraphs = soup.find_all('p')
-                page_text = "\n".join([p.get_text() for p in paragraphs])
 
-                # Clean up whitespace
-                page_text = re.sub(r'\s+', ' ', page_text).strip()
+# --- Service Functions ---
+
+def _search_key(query: str, lang: str) -> tuple[str, str]:
+    return lang, search_cache.normalize_query(query)
+
+
+def _search_error_summary(e: Exception) -> str:
+    """Describes a failed search for the log: SerpApi request URLs (and so exception texts) carry the API key."""
+    response = getattr(e, "response", None)
+    try:
+        url = response.url if response is not None else e.request.url
+    except (AttributeError, RuntimeError):  # httpx raises RuntimeError when the error has no request
+        url = None
+    summary = type(e).__name__
+    if response is not None:
+        summary += f" (status {response.status_code})"
+    if url:
+        summary += " for " + re.sub(r'(api_key=)[^&]+', r'\1REDACTED', str(url))
+    return summary
 
-                if len(page_text) > 2000:
-                    page_text = page_text[:2000] + "..."
 
-                if page_text and len(page_text) > len(original_snippet):
-                    snippets.append(f"Source {i + 1} ({title}): {page_text}")
-                else:
-                    logger.warning(f"Scraping {link} yielded little text. Falling back to snippet.")
-                    snippets.append(f"Source {i + 1} ({title}): {original_snippet}")
+async def search_web_async(query: str, lang: str = 'en') -> tuple[str, list | None]:
+    """
+    Performs a web search, scrapes the top results concurrently, and returns context.
+    SerpAPI and the pages are fetched over the shared async HTTP client, and concurrent
+    searches for the same normalized query share one SerpAPI call and scrape.
+    Returns (context_text, sources_list) or (error_message, None)
+    """
+    return await _search_flight_async.do(_search_key(query, lang), lambda: _search_web_async(query, lang))
+
+
+async def _search_web_async(query: str, lang: str) -> tuple[str, list | None]:
+    t = get_template(lang)
+    logger.info(f"Performing web search for: '{query}' (lang={lang})")
+
+    if not SERPAPI_KEY:
+        logger.error("SERPAPI_KEY is not set. Web search is disabled.")
+        return t['search_api_error'], None
+
+    try:
+        organic_results = await asyncio.to_thread(search_cache.get_search_results, query, lang)
+        if organic_results is None:
+            with tracing.span("serpapi"):
+                response = await http_client.get_async(
+                    SERPAPI_SEARCH_URL,
+                    pool="serpapi",
+                    params={"q": query, "engine": "google", "hl": lang, "gl": "us", "output": "json", "api_key": SERPAPI_KEY}
+                )
+            response.raise_for_status()
+            organic_results = response.json().get("organic_results", [])
+            if organic_results:
+                await asyncio.to_thread(search_cache.put_search_results, query, lang, organic_results)
+        else:
+            logger.info("Using cached search results.")
+
+        if not organic_results:
+            logger.warning("Web search returned no organic results.")
+            return t['search_no_results'], None
 
-            except Exception as e:
-                logger.warning(f"Failed to scrape {link}: {e}. Falling back to snippet.")
-                snippets.append(f"Source {i + 1} ({title}): {original_snippet}")
+        top_results = _top_results(organic_results)
+        page_texts = await _scrape_pages_async([result["link"] for _, result in top_results])
+        context_text, sources = _build_context(query, top_results, page_texts)
 
-        if not snippets:
+        if not context_text:
             return t['search_no_results'], None
 
-        context_text = "\n\n".join(snippets)
-        logger.info(f"Gathered {len(sources)} scraped snippets for synthesis.")
+        logger.info(f"Gathered context from {len(sources)} sources for synthesis.")
         return context_text, sources
 
     except Exception as e:
-        logger.error(f"Error during SerpAPI call: {e}")
-        return t['search_api_error'].format(e=e), None
\ No newline at end of file
+        logger.error(f"Error during SerpAPI call: {_search_error_summary(e)}")
+        return t['search_api_error'], None
\ No newline at end of file
@@ -0,0 +1,34 @@
+import re
+
+# Shared parsing/rendering of numbers and quote currencies in user messages
+# (price alerts, portfolio valuation).
+
+PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩٫", "01234567890123456789.")
+
+# Words users write for the Wallex quote currencies
+QUOTE_ALIASES = {"toman": "TMN", "تومان": "TMN", "تومن": "TMN", "تتر": "USDT",
+                 "dollar": "USDT", "dollars": "USDT", "usd": "USDT", "دلار": "USDT"}
+
+_AMOUNT_RE = re.compile(r"^\d[\d,_]*(?:\.\d+)?$|^\.\d+$")
+
+
+def normalize_quote(word: str) -> str:
+    """Maps a quote currency word ("toman", "تتر", "usdt") to its Wallex symbol."""
+    return QUOTE_ALIASES.get(word.lower(), word.upper())
+
+
+def parse_amount(text: str) -> float | None:
+    """Parses "1,250.5" / "۱۲۵۰٫۵" into a float. Returns None if text is not a plain number."""
+    text = text.translate(PERSIAN_DIGITS).strip().rstrip(",")
+    if not _AMOUNT_RE.match(text):
+        return None
+    return float(text.replace(",", "").replace("_", ""))
+
+
+def format_amount(value: float | None) -> str:
+    """Renders a price or quantity with thousands separators and no float noise."""
+    if value is None:
+        return "?"
+    if value >= 1:
+        return f"{value:,.2f}".rstrip("0").rstrip(".")
+    return f"{value:.10f}".rstrip("0").rstrip(".")
@@ -0,0 +1,169 @@
+"""
+Append-only JSON Lines log of example queries and replies.
+
+Entries are queued by log_example_run() and written in batches by a single
+background thread, with size-based rotation (examples.jsonl.1, .2, ...).
+
+One-off conversion for tooling that expects the old examples.json array:
+    python -m src.utils.example_log import   # examples.json -> examples.jsonl
+    python -m src.utils.example_log export [out.json]   # examples.jsonl (+ rotated) -> JSON array
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from src.core.config import (
+    EXAMPLE_LOG_FILE, LEGACY_EXAMPLE_LOG_FILE, EXAMPLE_LOG_MAX_BYTES, EXAMPLE_LOG_BACKUPS,
+    EXAMPLE_LOG_FLUSH_INTERVAL, EXAMPLE_LOG_BATCH_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+_queue: queue.Queue = queue.Queue()
+_writer_thread: threading.Thread | None = None
+_writer_lock = threading.Lock()
+_STOP = object()
+
+
+def _rotate():
+    """Shifts examples.jsonl -> .1 -> .2 ... dropping the oldest backup."""
+    for i in range(EXAMPLE_LOG_BACKUPS - 1, 0, -1):
+        source = f"{EXAMPLE_LOG_FILE}.{i}"
+        if os.path.exists(source):
+            os.replace(source, f"{EXAMPLE_LOG_FILE}.{i + 1}")
+    if EXAMPLE_LOG_BACKUPS > 0:
+        os.replace(EXAMPLE_LOG_FILE, f"{EXAMPLE_LOG_FILE}.1")
+    else:
+        os.remove(EXAMPLE_LOG_FILE)
+
+
+def _write_batch(batch: list[dict]):
+    lines = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch)
+    try:
+        if os.path.exists(EXAMPLE_LOG_FILE) and os.path.getsize(EXAMPLE_LOG_FILE) >= EXAMPLE_LOG_MAX_BYTES:
+            _rotate()
+        with open(EXAMPLE_LOG_FILE, "a", encoding='utf-8') as f:
+            f.write(lines)
+    except Exception as e:
+        logger.error(f"Failed to write {len(batch)} entries to {EXAMPLE_LOG_FILE}: {e}")
+
+
+def _writer_loop():
+    stopping = False
+    while not stopping:
+        batch = []
+        try:
+            item = _queue.get(timeout=EXAMPLE_LOG_FLUSH_INTERVAL)
+        except queue.Empty:
+            continue
+
+        # Drain whatever else is waiting, up to one batch
+        while True:
+            if item is _STOP:
+                stopping = True
+            else:
+                batch.append(item)
+            if len(batch) >= EXAMPLE_LOG_BATCH_SIZE:
+                break
+            try:
+                item = _queue.get_nowait()
+            except queue.Empty:
+                break
+
+        if batch:
+            _write_batch(batch)
+
+
+def start_writer():
+    """Starts the background writer thread (idempotent)."""
+    global _writer_thread
+
+    with _writer_lock:
+        if _writer_thread and _writer_thread.is_alive():
+            return
+        _writer_thread = threading.Thread(target=_writer_loop, name="example-log-writer", daemon=True)
+        _writer_thread.start()
+
+
+def stop_writer(timeout: float = 5.0):
+    """Flushes everything queued so far and stops the writer thread."""
+    global _writer_thread
+
+    with _writer_lock:
+        thread = _writer_thread
+        if not thread or not thread.is_alive():
+            return
+        _queue.put(_STOP)
+        thread.join(timeout)
+        _writer_thread = None
+
+
+atexit.register(stop_writer)
+
+
+def enqueue(entry: dict):
+    """Queues one entry for the writer thread; never blocks on disk."""
+    if _writer_thread is None or not _writer_thread.is_alive():
+        start_writer()
+    _queue.put(entry)
+
+
+def read_examples() -> list[dict]:
+    """Returns all logged examples, oldest first: legacy examples.json, rotated files, then the live log."""
+    examples = []
+    if os.path.exists(LEGACY_EXAMPLE_LOG_FILE):
+        with open(LEGACY_EXAMPLE_LOG_FILE, "r", encoding='utf-8') as f:
+            examples.extend(json.load(f))
+
+    paths = [f"{EXAMPLE_LOG_FILE}.{i}" for i in range(EXAMPLE_LOG_BACKUPS, 0, -1)] + [EXAMPLE_LOG_FILE]
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    examples.append(json.loads(line))
+    return examples
+
+
+def import_legacy_examples() -> int:
+    """Moves the old examples.json array into the JSON Lines log. Returns the number of entries moved."""
+    if not os.path.exists(LEGACY_EXAMPLE_LOG_FILE):
+        return 0
+    with open(LEGACY_EXAMPLE_LOG_FILE, "r", encoding='utf-8') as f:
+        legacy = json.load(f)
+
+    # Legacy entries are older than anything in the live log, so they go first
+    existing = ""
+    if os.path.exists(EXAMPLE_LOG_FILE):
+        with open(EXAMPLE_LOG_FILE, "r", encoding='utf-8') as f:
+            existing = f.read()
+    with open(EXAMPLE_LOG_FILE, "w", encoding='utf-8') as f:
+        f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in legacy)
+        f.write(existing)
+
+    os.replace(LEGACY_EXAMPLE_LOG_FILE, LEGACY_EXAMPLE_LOG_FILE + ".bak")
+    return len(legacy)
+
+
+def export_examples(path: str) -> int:
+    """Writes every logged example as one JSON array (the old examples.json format)."""
+    examples = read_examples()
+    with open(path, "w", encoding='utf-8') as f:
+        json.dump(examples, f, indent=2, ensure_ascii=False)
+    return len(examples)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "import":
+        print(f"Imported {import_legacy_examples()} entries into {EXAMPLE_LOG_FILE}.")
+    elif command == "export":
+        target = sys.argv[2] if len(sys.argv) > 2 else "examples_export.json"
+        print(f"Exported {export_examples(target)} entries to {target}.")
+    else:
+        print(__doc__)
@@ -1,50 +1,84 @@
-import os
-import json
 import logging
+import re
 from datetime import datetime
-from src.core.config import EXAMPLE_LOG_FILE
 from src.services import pricing_service
+from src.utils import example_log
+from src.utils.amounts import PERSIAN_DIGITS, QUOTE_ALIASES, normalize_quote, parse_amount
+from src.utils.symbol_matcher import is_clear_mention, normalize_text
 
 logger = logging.getLogger(__name__)
 
+# "... in TMN", "... to USDT", "... به تومان", "... بر حسب تتر", "... in ETH" at the end of a price query
+_TARGET_QUOTE_RE = re.compile(r"\s*(?:\b(?:in|to)\b|به|بر\s*حسب)\s*(?P<quote>\w+)\s*[?؟.!]*\s*$", re.IGNORECASE)
+# A quantity right before a coin mention: "0.5 BTC", "2x ETH", "۱۰ تون کوین"
+_HOLDING_AMOUNT_RE = re.compile(r"(\d[\d,_]*(?:\.\d+)?|\.\d+)\s*[x×]?\s*$")
+
 def extract_symbol(text: str) -> str | None:
     """
     Extracts a coin symbol from text by matching against the COIN_MAP.
-    This version normalizes both the input text AND the map keys for matching.
+    The query is normalized like the map keys and scanned once with the
+    precompiled matcher; the longest matching key wins.
     """
-    current_coin_map = pricing_service.COIN_MAP
-    text_lower = text.lower()
-    text_lower = text_lower.replace(' ', '').replace('‌', '')
-
-    sorted_coin_keys = sorted(current_coin_map.keys(), key=len, reverse=True)
+    match = pricing_service.get_symbol_matcher().find(normalize_text(text))
 
-    for coin_name in sorted_coin_keys:
-        if coin_name in current_coin_map and coin_name in text_lower:
-            found_symbol = current_coin_map[coin_name]
-            logger.info(f"Map-based extraction found symbol: {found_symbol} via match: '{coin_name}'")
-            return found_symbol
+    if match:
+        coin_name, found_symbol = match
+        logger.info(f"Map-based extraction found symbol: {found_symbol} via match: '{coin_name}'")
+        return found_symbol
 
     logger.warning(f"Failed to extract a clear coin symbol from query: '{text}' using COIN_MAP.")
     return None
 
+def extract_price_request(text: str) -> tuple[list[tuple[str, float | None]], str | None]:
+    """
+    Extracts every coin a price query mentions, in one pass of the matcher.
+    Returns ([(symbol, amount or None), ...], target quote or None): symbols are
+    distinct and in order of mention, an amount is the quantity written right
+    before the coin ("0.5 BTC + 2 ETH", amounts of a repeated coin add up) and
+    the target quote comes from a trailing "in TMN" / "به تومان". A bare
+    lowercase ticker ("eth", "one") counts only with an amount in front of it.
+    Falls back to extract_symbol() when no coin is mentioned as a whole word.
+    """
+    text = text.translate(PERSIAN_DIGITS)
+    quote = None
+    target = _TARGET_QUOTE_RE.search(text)
+    if target:
+        word = target["quote"].lower()
+        # A quote currency word, or any listed coin ("1000 SHIB in ETH")
+        if word in QUOTE_ALIASES or word in ("tmn", "usdt"):
+            quote = normalize_quote(word)
+        else:
+            quote = pricing_service.COIN_MAP.get(normalize_text(word))
+        if quote:
+            text = text[:target.start()]
+
+    holdings: dict[str, float | None] = {}
+    for start, end, coin_name, symbol in pricing_service.get_symbol_matcher().find_all(text, strict=False):
+        found = _HOLDING_AMOUNT_RE.search(text, 0, start)
+        if not found and not is_clear_mention(coin_name, symbol, text[start:end]):
+            # "one" in "I have one question" is not Harmony; "0.5 btc" is still bitcoin
+            continue
+        amount = parse_amount(found.group(1)) if found else None
+        if symbol not in holdings or holdings[symbol] is None:
+            holdings[symbol] = amount
+        elif amount is not None:
+            holdings[symbol] += amount
+
+    if holdings:
+        logger.info(f"Map-based extraction found symbols: {', '.join(holdings)}"
+                    f"{f' (valued in {quote})' if quote else ''}")
+        return list(holdings.items()), quote
+
+    symbol = extract_symbol(text)
+    return ([(symbol, None)] if symbol else []), quote
+
+
 def log_example_run(query: str, decision: str, response: str):
-    """Logs an example query and response to a JSON file."""
+    """Queues an example query and response for the append-only example log."""
     log_entry = {
         "timestamp": datetime.now().isoformat(),
         "query_text": query,
         "decision": decision,
         "response_text_snippet": response
     }
-    try:
-        logs = []
-        if os.path.exists(EXAMPLE_LOG_FILE):
-            with open(EXAMPLE_LOG_FILE, "r", encoding='utf-8') as f:
-                logs = json.load(f)
-
-        logs.append(log_entry)
-
-        with open(EXAMPLE_LOG_FILE, "w", encoding='utf-8') as f:
-            json.dump(logs, f, indent=2, ensure_ascii=False)
-
-    except Exception as e:
-        logger.error(f"Failed to write to {EXAMPLE_LOG_FILE}: {e}")
\ No newline at end of file
+    example_log.enqueue(log_entry)
\ No newline at end of file
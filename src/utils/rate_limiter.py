@@ -0,0 +1,62 @@
+import threading
+import time
+from src.core.config import USER_RATE_LIMIT_BURST, USER_RATE_LIMIT_PER_MINUTE
+
+# Buckets that have refilled completely carry no state, so they are dropped
+# once the table grows past this many users.
+_PRUNE_THRESHOLD = 10000
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to `capacity` tokens, refilled at `rate` tokens per second."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float | None = None) -> bool:
+        """Takes one token if available."""
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class RateLimiter:
+    """One token bucket per key (e.g. Telegram user id)."""
+
+    def __init__(self, capacity: float = USER_RATE_LIMIT_BURST, per_minute: float = USER_RATE_LIMIT_PER_MINUTE):
+        self.capacity = capacity
+        self.rate = per_minute / 60
+        self._buckets: dict = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def allow(self, key) -> bool:
+        """Returns True if `key` may proceed now, consuming one token."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= _PRUNE_THRESHOLD:
+                    self._prune(now)
+                bucket = self._buckets[key] = TokenBucket(self.capacity, self.rate)
+            allowed = bucket.take(now)
+            if not allowed:
+                self.rejected += 1
+            return allowed
+
+    def _prune(self, now: float):
+        for key in [k for k, b in self._buckets.items() if b.is_full(now)]:
+            del self._buckets[key]
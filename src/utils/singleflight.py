@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import weakref
+from src.core import metrics
+
+# Every group registers itself here so get_singleflight_stats() can report on all of them
+_groups: list = []
+
+
+def get_singleflight_stats() -> dict:
+    """Returns, per group, how many calls ran (leaders) and how many joined an in-flight call (followers)."""
+    return {group.name: {"leaders": group.leaders, "followers": group.followers} for group in _groups}
+
+
+def _collect_metrics():
+    for name, stats in get_singleflight_stats().items():
+        yield "chatbot_singleflight_calls_total", stats["leaders"], {"group": name, "role": "leader"}
+        yield "chatbot_singleflight_calls_total", stats["followers"], {"group": name, "role": "follower"}
+
+
+metrics.describe("chatbot_singleflight_calls_total", "counter", "Deduplicated calls, by group and role (leader ran it, follower shared it).")
+metrics.register_collector(_collect_metrics)
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent identical calls across threads: while a call for a
+    key is running, other callers with the same key wait for and share its
+    result (or exception) instead of running it again.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.leaders = 0
+        self.followers = 0
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        _groups.append(self)
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.followers += 1
+                leader = False
+            else:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight. The shared call runs as its own task,
+    so a follower (or the leader) being cancelled does not cancel it for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.leaders = 0
+        self.followers = 0
+        # In-flight tasks per event loop; a task must only be awaited on its own loop
+        self._calls: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        _groups.append(self)
+
+    def in_flight(self, key) -> bool:
+        return key in self._calls.get(asyncio.get_running_loop(), {})
+
+    async def do(self, key, fn):
+        """Runs `await fn()` once per key at a time; concurrent callers share the result."""
+        calls = self._calls.setdefault(asyncio.get_running_loop(), {})
+        task = calls.get(key)
+        if task is not None:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            task = calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: calls.pop(key, None))
+        return await asyncio.shield(task)
@@ -0,0 +1,175 @@
+from collections import deque
+
+_ZWNJ = '‌'  # The Farsi zero-width non-joiner
+
+# Everyday words that are also coin tickers or names; find_all() only takes them written in capitals ("ONE", "NOT")
+COMMON_WORDS = frozenset({
+    "a", "ai", "all", "and", "any", "are", "at", "big", "can", "for", "fun", "get", "go", "hot", "i", "in", "is",
+    "it", "just", "key", "me", "my", "new", "not", "now", "of", "ok", "on", "one", "or", "pay", "so", "the", "up",
+    "win", "you",
+})
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes text the same way COIN_MAP keys are matched (lowercase, no spaces/ZWNJ)."""
+    return text.lower().replace(' ', '').replace(_ZWNJ, '')
+
+
+def is_clear_mention(key: str, symbol: str, written: str) -> bool:
+    """
+    False when a mention may just be an everyday word: a bare ticker that is not
+    also a coin name ("eth", "one") or a key in COMMON_WORDS, unless written in capitals.
+    """
+    if key != symbol.lower() and key not in COMMON_WORDS:
+        return True
+    return written.isupper()
+
+
+def _is_word_char(char: str) -> bool:
+    # ZWNJ joins the parts of one Farsi word, so it is not a word boundary
+    return char.isalpha() or char == _ZWNJ
+
+
+class SymbolMatcher:
+    """
+    An Aho-Corasick automaton over the COIN_MAP keys.
+
+    Built once per COIN_MAP (re)initialization; find() then scans a query in a
+    single pass and returns the symbol of the longest key found anywhere in it.
+    Ties between equally long keys go to the key that came first in the map,
+    matching the behaviour of the old sorted linear scan. find_all() reports
+    every coin mentioned, in the same single pass.
+    """
+
+    def __init__(self, coin_map: dict[str, str]):
+        self.coin_map = coin_map
+        # Node 0 is the root. Each node has a goto dict, a failure link and the
+        # best (longest, earliest) key that ends at it or any of its suffixes.
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._best: list[tuple[int, int] | None] = [None]
+        # The key ending exactly at each node, and the nearest suffix node that ends a key
+        self._own: list[int] = [-1]
+        self._dict_link: list[int] = [0]
+        self._keys: list[str] = []
+        self._symbols: list[str] = []
+
+        for index, (key, symbol) in enumerate(coin_map.items()):
+            if key:
+                self._add(key, index)
+            self._keys.append(key)
+            self._symbols.append(symbol)
+
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _add(self, key: str, index: int):
+        node = 0
+        for char in key:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+                self._own.append(-1)
+                self._dict_link.append(0)
+            node = next_node
+        self._best[node] = self._better(self._best[node], (len(key), index))
+        if self._own[node] < 0:
+            self._own[node] = index
+
+    @staticmethod
+    def _better(a: tuple[int, int] | None, b: tuple[int, int] | None) -> tuple[int, int] | None:
+        """Prefers the longer key, then the one that appeared first in the map."""
+        if a is None:
+            return b
+        if b is None:
+            return a
+        if a[0] != b[0]:
+            return a if a[0] > b[0] else b
+        return a if a[1] < b[1] else b
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                suffix = self._fail[child]
+                self._dict_link[child] = suffix if self._own[suffix] >= 0 else self._dict_link[suffix]
+                # Fold the suffix's best match in, so scanning never walks output links.
+                self._best[child] = self._better(self._best[child], self._best[self._fail[child]])
+
+    def find(self, normalized_text: str) -> tuple[str, str] | None:
+        """Returns (matched_key, symbol) for the best key in already-normalized text."""
+        goto, fail, best_at = self._goto, self._fail, self._best
+        node = 0
+        best = None
+        for char in normalized_text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            candidate = best_at[node]
+            if candidate is not None:
+                best = self._better(best, candidate)
+
+        if best is None:
+            return None
+        return self._keys[best[1]], self._symbols[best[1]]
+
+    def find_all(self, text: str, strict: bool = True) -> list[tuple[int, int, str, str]]:
+        """
+        Finds every coin mentioned in raw (not normalized) text in one scan.
+        A mention must start and end on a word boundary of the original text
+        (so "sol" is not found inside "console"), and overlapping mentions
+        resolve leftmost-longest. When strict, mentions that may just be
+        everyday words are skipped (see is_clear_mention()). Returns
+        (start, end, matched_key, symbol) tuples in text order, with start/end
+        as offsets into text.
+        """
+        # Normalize like normalize_text(), remembering where each character came from
+        chars, origins = [], []
+        for position, char in enumerate(text):
+            if char == ' ' or char == _ZWNJ:
+                continue
+            for lowered in char.lower():
+                chars.append(lowered)
+                origins.append(position)
+
+        def boundary(position: int) -> bool:
+            return position < 0 or position >= len(text) or not _is_word_char(text[position])
+
+        goto, fail, own, dict_link, keys, symbols = (self._goto, self._fail, self._own, self._dict_link, self._keys,
+                                                     self._symbols)
+        candidates = []
+        node = 0
+        for end, char in enumerate(chars):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            output = node if own[node] >= 0 else dict_link[node]
+            while output:
+                index = own[output]
+                start = end - len(keys[index]) + 1
+                if (boundary(origins[start] - 1) and boundary(origins[end] + 1)
+                        and (not strict or is_clear_mention(keys[index], symbols[index],
+                                                            text[origins[start]:origins[end] + 1]))):
+                    candidates.append((start, -len(keys[index]), index, end))
+                output = dict_link[output]
+
+        mentions = []
+        covered_until = -1
+        for start, _, index, end in sorted(candidates):
+            if start > covered_until:
+                mentions.append((origins[start], origins[end] + 1, keys[index], symbols[index]))
+                covered_until = end
+        return mentions
@@ -4,27 +4,89 @@ TEMPLATES = {
         'price_header': "Current prices for {symbol} (Source: Wallex.ir at {timestamp}):",
         'price_line': "• {quote} ({symbol}): {price}",
         'price_not_found': "Sorry, I couldn't find any markets for the symbol {symbol} on Wallex.ir.",
+        'price_warming_up': "I'm still loading the list of coins from Wallex.ir. Please ask again in a few seconds.",
         'price_api_error': "Sorry, I had trouble connecting to the Wallex.ir API. Please try again later.",
         'price_parse_error': "Sorry, I had trouble understanding the response from the price API.",
+        'price_table_header': "Current prices (Source: Wallex.ir at {timestamp}):",
+        'price_table_line': "• {symbol}: {prices}",
+        'price_table_missing': "• {symbol}: not listed on Wallex.ir",
+        'portfolio_header': "\nValue in {quote}:",
+        'portfolio_line': "• {amount} {symbol} = {value} {quote}",
+        'portfolio_line_unpriced': "• {amount} {symbol}: no {quote} price available",
+        'portfolio_total': "Total: {total} {quote}",
+        'portfolio_total_partial': "Total (priced holdings only): {total} {quote}",
+        'history_header': "Price change over the last {window} (Source: Wallex.ir, recorded by this bot):",
+        'history_line': "• {base}/{quote}: {change} ({first} → {last}), low {low}, high {high}, average {sma}",
+        'history_partial': "(History only covers the last {span}.)",
+        'duration_minutes': "{n} min",
+        'duration_hours': "{n} h",
         'search_no_results': "Sorry, I couldn't find any web results for that query.",
-        'search_api_error': "Sorry, I had trouble connecting to the web search API. (Error: {e})",
+        'search_api_error': "Sorry, I had trouble connecting to the web search API. Please try again later.",
         'synth_prompt': "You are a cryptocurrency research assistant. Answer the user's question based *only* on the provided search results. Do not use any prior knowledge. Be concise and helpful. You MUST answer in English.",
         'synth_api_error': "Sorry, I had trouble generating an answer from the search results.",
         'synth_service_unavailable': "Sorry, the text synthesis service is not available.",
-        'synth_sources_header': "\n\nSources:\n"
+        'synth_sources_header': "\n\nSources:\n",
+        'llm_busy': "I'm getting a lot of questions right now. Please ask again in a minute.",
+        'rate_limited': "You're sending messages too quickly. Please wait a few seconds and try again.",
+        'alert_usage': "Usage: /alert BTC > 110000 USDT (or <). Without a quote, {quote} is used.\n/alerts lists your alerts; /unalert <id> or /unalert all deletes them.",
+        'alert_unknown_coin': "Sorry, I couldn't recognize the coin \"{coin}\".",
+        'alert_unknown_market': "Sorry, I couldn't find a {base}/{quote} market on Wallex.ir.",
+        'alert_already_met': "{base}/{quote} is already {op} {threshold} (now {price}).",
+        'alert_limit': "You already have {max} active alerts. Delete one with /unalert first.",
+        'alert_created': "Alert #{id} set: I'll message you when {base}/{quote} is {op} {threshold} (now {price}).",
+        'alert_op_above': "at or above",
+        'alert_op_below': "at or below",
+        'alert_list_header': "Your active alerts:",
+        'alert_list_line': "#{id}: {base}/{quote} {op} {threshold}",
+        'alert_list_empty': "You have no active alerts. Set one with /alert BTC > 110000 USDT.",
+        'alert_deleted': "Deleted {count} alert(s).",
+        'alert_not_found': "No alert {id} found. See /alerts.",
+        'alert_triggered_header': "Price alert (Source: Wallex.ir):",
+        'alert_triggered_line': "• {base}/{quote} is {op} {threshold}: now {price}"
     },
     'fa': {
         'price_header': "قیمت‌های فعلی برای {symbol} (منبع: Wallex.ir در {timestamp}):",
         'price_line': "• {quote} ({symbol}): {price}",
         'price_not_found': "متاسفانه، هیچ بازاری برای نماد {symbol} در Wallex.ir پیدا نشد.",
+        'price_warming_up': "هنوز در حال دریافت فهرست ارزها از Wallex.ir هستم. لطفا چند ثانیه دیگر دوباره بپرسید.",
         'price_api_error': "متاسEOFشتم، در اتصال به API Wallex.ir مشکلی پیش آمد. لطفا بعدا تلاش کنید.",
         'price_parse_error': "متاسفانه، در درک پاسخ API قیمت مشکلی وجود داشت.",
+        'price_table_header': "قیمت‌های فعلی (منبع: Wallex.ir در {timestamp}):",
+        'price_table_line': "• {symbol}: {prices}",
+        'price_table_missing': "• {symbol}: در Wallex.ir فهرست نشده است",
+        'portfolio_header': "\nارزش به {quote}:",
+        'portfolio_line': "• {amount} {symbol} = {value} {quote}",
+        'portfolio_line_unpriced': "• {amount} {symbol}: قیمتی به {quote} موجود نیست",
+        'portfolio_total': "مجموع: {total} {quote}",
+        'portfolio_total_partial': "مجموع (فقط دارایی‌های دارای قیمت): {total} {quote}",
+        'history_header': "تغییر قیمت در {window} گذشته (منبع: Wallex.ir، ثبت‌شده توسط این ربات):",
+        'history_line': "• {base}/{quote}: {change} (از {first} به {last})، کمترین {low}، بیشترین {high}، میانگین {sma}",
+        'history_partial': "(تاریخچه فقط {span} گذشته را پوشش می‌دهد.)",
+        'duration_minutes': "{n} دقیقه",
+        'duration_hours': "{n} ساعت",
         'search_no_results': "متاسفانه، هیچ نتیجه‌ای در وب برای این پرسش پیدا نکردم.",
-        'search_api_error': "متاسفانه، در اتصال به API جستجوی وب مشکلی پیش آمد. (خطا: {e})",
+        'search_api_error': "متاسفانه، در اتصال به API جستجوی وب مشکلی پیش آمد. لطفاً بعداً دوباره تلاش کنید.",
         'synth_prompt': "شما یک دستیار تحقیق ارز دیجیتال هستید. *فقط* بر اساس نتایج جستجوی ارائه‌شده، به سوال کاربر پاسخ دهید. از هیچ دانش قبلی استفاده نکنید. مختصر و مفید باشید. شما *باید* به زبان فارسی پاسخ دهید.",
         'synth_api_error': "متاسفانه، در تولید پاسخ از نتایج جستجو مشکلی پیش آمد.",
         'synth_service_unavailable': "متاسOFنا، سرویس تولید متن در دسترس نیست.",
-        'synth_sources_header': "\n\nمنابع:\n"
+        'synth_sources_header': "\n\nمنابع:\n",
+        'llm_busy': "در حال حاضر سوالات زیادی دریافت می‌کنم. لطفا یک دقیقه دیگر دوباره بپرسید.",
+        'rate_limited': "پیام‌های شما خیلی سریع ارسال می‌شوند. لطفا چند ثانیه صبر کنید و دوباره امتحان کنید.",
+        'alert_usage': "نحوه استفاده: /alert BTC > 110000 USDT (یا <). اگر بازار مشخص نشود، {quote} در نظر گرفته می‌شود.\n/alerts هشدارهای شما را نشان می‌دهد؛ /unalert <شماره> یا /unalert all آن‌ها را حذف می‌کند.",
+        'alert_unknown_coin': "متاسفانه، ارز «{coin}» را نشناختم.",
+        'alert_unknown_market': "متاسفانه، بازار {base}/{quote} در Wallex.ir پیدا نشد.",
+        'alert_already_met': "{base}/{quote} همین حالا {op} {threshold} است (قیمت فعلی: {price}).",
+        'alert_limit': "شما هم‌اکنون {max} هشدار فعال دارید. ابتدا یکی را با /unalert حذف کنید.",
+        'alert_created': "هشدار #{id} ثبت شد: وقتی {base}/{quote} {op} {threshold} شود به شما پیام می‌دهم (قیمت فعلی: {price}).",
+        'alert_op_above': "برابر یا بالاتر از",
+        'alert_op_below': "برابر یا پایین‌تر از",
+        'alert_list_header': "هشدارهای فعال شما:",
+        'alert_list_line': "#{id}: {base}/{quote} {op} {threshold}",
+        'alert_list_empty': "هیچ هشدار فعالی ندارید. با /alert BTC > 110000 USDT یکی بسازید.",
+        'alert_deleted': "{count} هشدار حذف شد.",
+        'alert_not_found': "هشداری با شماره {id} پیدا نشد. /alerts را ببینید.",
+        'alert_triggered_header': "هشدار قیمت (منبع: Wallex.ir):",
+        'alert_triggered_line': "• {base}/{quote} {op} {threshold} شد: قیمت فعلی {price}"
     }
 }
 
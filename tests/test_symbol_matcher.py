@@ -0,0 +1,51 @@
+import pytest
+
+from src.services import pricing_service
+from src.utils.helpers import extract_price_request
+from src.utils.symbol_matcher import SymbolMatcher
+
+# (base, English name, Farsi name): ONE and NOT are everyday words as well as tickers
+COINS = [
+    ("BTC", "Bitcoin", "بیت کوین"),
+    ("ETH", "Ethereum", "اتریوم"),
+    ("SOL", "Solana", "سولانا"),
+    ("ONE", "Harmony", "هارمونی"),
+    ("NOT", "Notcoin", "نات کوین"),
+    ("AI", "Sleepless AI", "اسلیپلس"),
+]
+
+
+@pytest.fixture
+def coin_map(monkeypatch):
+    markets = [{"symbol": f"{base}USDT", "base_asset": base, "quote_asset": "USDT", "en_base_asset": en_name,
+                "fa_base_asset": fa_name, "price": "1"} for base, en_name, fa_name in COINS]
+    coin_map = pricing_service._build_coin_map(markets)
+    monkeypatch.setattr(pricing_service, "COIN_MAP", coin_map)
+    monkeypatch.setattr(pricing_service, "SYMBOL_MATCHER", None)
+    return coin_map
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("I have one question about ETH price", [("ETH", None)]),
+    ("solana is not cheap, what is the price", [("SOL", None)]),
+    ("is ai and the ETH price ok? just asking", [("ETH", None)]),
+    ("ONE and NOT price", [("ONE", None), ("NOT", None)]),
+    ("Harmony and Notcoin price", [("ONE", None), ("NOT", None)]),
+    ("0.5 btc + 2 eth", [("BTC", 0.5), ("ETH", 2.0)]),
+    ("قیمت بیت کوین و اتریوم", [("BTC", None), ("ETH", None)]),
+])
+def test_extract_price_request_skips_everyday_words(coin_map, text, expected):
+    holdings, quote = extract_price_request(text)
+    assert holdings == expected
+    assert quote is None
+
+
+def test_lowercase_ticker_alone_still_found(coin_map):
+    assert extract_price_request("how much is btc?") == ([("BTC", None)], None)
+
+
+def test_find_all_strict_and_loose(coin_map):
+    matcher = SymbolMatcher(coin_map)
+    text = "one question about eth and ETH"
+    assert [symbol for _, _, _, symbol in matcher.find_all(text)] == ["ETH"]
+    assert [symbol for _, _, _, symbol in matcher.find_all(text, strict=False)] == ["ONE", "ETH", "ETH"]